@@ -0,0 +1,15 @@
+# __main__.py
+# ----------------------------------------------------------
+# Punto de entrada `python -m ISA` (ver cli.py). Los modulos del simulador se
+# importan sin paquete (from assembler import ...), asi que este directorio
+# se agrega a sys.path antes de cargar la CLI.
+# ----------------------------------------------------------
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from cli import main  # noqa: E402
+
+sys.exit(main())
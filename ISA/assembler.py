@@ -1,3 +1,61 @@
+import re
+
+from object_file import ObjectFile
+
+# Nombres validos para etiquetas y constantes .equ
+SYMBOL_RE = re.compile(r'^[A-Za-z_.][A-Za-z0-9_.]*$')
+
+# Tokenizador: una coincidencia por linea con etiquetas, mnemonico y hasta
+# tres operandos (los comentarios '#' se descartan). Se aplica al texto completo.
+LINE_RE = re.compile(
+    r'^[ \t]*((?:[A-Za-z_.][A-Za-z0-9_.]*[ \t]*:[ \t]*)*)'   # etiquetas
+    r'([^\s#,]*)[ \t,]*'                                      # mnemonico
+    r'([^\s,#]*)[ \t,]*([^\s,#]*)[ \t,]*([^\s,#]*)'          # operandos
+    r'[^\n#]*(?:#.*)?$', re.M)
+
+REGISTERS = {f'x{i}': i for i in range(32)}
+
+# Preprocesador de macros: etiquetas iniciales + resto de la linea, y
+# referencias a parametros (\\nombre) o al contador de expansion (\\@)
+LABEL_PREFIX_RE = re.compile(r'^([ \t]*(?:[A-Za-z_.][A-Za-z0-9_.]*[ \t]*:[ \t]*)*)(.*)$')
+MACRO_ARG_RE = re.compile(r'\\(@|[A-Za-z_][A-Za-z0-9_]*)')
+MAX_MACRO_DEPTH = 32
+
+# Formato de operandos de cada instruccion:
+#   R: rd, rs1, rs2     U: rd, rs1        I: rd, rs1, imm    V: rd, imm
+#   L: rd, off(rs1)     S: rs2, off(rs1)  J: rd, destino     B: rs1, rs2, destino
+#   P: rs1, rs2       Q: rd, rs1 (rd..rd+3)  N: sin operandos
+#   H: rd, imm32      W: rd, imm64 (pseudo-instruccion de una o dos palabras)
+#   M: rd, rs1, rs2 (rs2..rs2+1)
+FORMATS = {
+    'add': 'R', 'sub': 'R', 'mul': 'R', 'and': 'R', 'or': 'R', 'xor': 'R',
+    'not': 'U',
+    'addi': 'I', 'rol': 'I', 'muli': 'I', 'modi': 'I',
+    'lw': 'L', 'sw': 'S',
+    'jal': 'J', 'beq': 'B',
+    'vwr': 'V', 'vinit': 'V',
+    'vsign': 'R',
+    'vwrx': 'P', 'vinitx': 'P', 'vsignx': 'R', 'vsignn': 'M',
+    'mdma': 'Q',
+    'lli': 'H', 'lhi': 'H', 'li64': 'W',
+    'ebreak': 'N',
+}
+
+# Numero minimo de operandos por formato
+MIN_OPERANDS = {'R': 3, 'U': 2, 'I': 3, 'V': 2, 'L': 2, 'S': 2, 'J': 2, 'B': 3, 'P': 2, 'Q': 2, 'H': 2, 'W': 2, 'M': 3, 'N': 0}
+
+
+class AssemblerError(ValueError):
+    """Errores de ensamblado; `errors` contiene todas las lineas invalidas (linea, mensaje)."""
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__("\n".join(f"[line {lineno}] {msg}" for lineno, msg in errors))
+
+
+class _OperandError(Exception):
+    pass
+
 
 class Assembler:
     def __init__(self):
@@ -19,11 +77,20 @@ class Assembler:
             'rol': 0xAA,     # rotar izquierda inmediata
             'muli': 0xAB,    # multiplicar por inmediato
             'modi': 0xAC,     # modulo inmediato
+            'lli': 0xAE,     # carga inmediato de 32 bits (extendido con ceros)
+            'lhi': 0xAF,     # inmediato de 32 bits en la mitad alta (conserva la baja)
 
             # --- Instrucciones de boveda (Vault ISA) ---
             'vwr':   0x90,   # Vault Write Register
             'vinit': 0x91,   # Vault Initialize
-            'vsign': 0x92    # Vault Sign Block
+            'vsign': 0x92,   # Vault Sign Block
+            'vwrx':  0x93,   # Vault Write Key (indice y llave en registros)
+            'vsignx': 0x94,  # Vault Sign Block (indice de llave = valor de rs1)
+            'vsignn': 0x95,  # Vault Sign Region (x[rs2+1] bloques desde x[rs2])
+            'vinitx': 0x96,  # Vault Initialize (indice y valor en registros)
+
+            # Acelerador ToyMDMA
+            'mdma': 0xB5     # ronda del kernel sobre x[rd..rd+3] con el bloque x[rs1]
         }
         
         # Codigos funct3 personalizados
@@ -44,9 +111,16 @@ class Assembler:
             'rol': 0x3,
             'muli': 0x4,
             'modi': 0x5,
+            'lli': 0x6,
+            'lhi': 0x7,
             'vwr': 0x0, 
             'vinit': 0x1, 
-            'vsign': 0x2
+            'vsign': 0x2,
+            'vwrx': 0x3,
+            'vsignx': 0x4,
+            'vsignn': 0x5,
+            'vinitx': 0x6,
+            'mdma': 0x1
         }
         
         # Codigos funct7 personalizados
@@ -60,21 +134,37 @@ class Assembler:
             'not': 0x70,     # NOT extended function
             'vwr': 0x08, 
             'vinit': 0x09, 
-            'vsign': 0x0A
+            'vsign': 0x0A,
+            'vwrx': 0x0B,
+            'vsignx': 0x0C,
+            'vsignn': 0x0E,
+            'vinitx': 0x0F,
+            'mdma': 0x0D
 
         }
 
+        # Tabla de simbolos del ultimo programa ensamblado:
+        # nombre -> {"value": valor, "kind": "label" | "equ", "line": linea}
+        self.symbols = {}
+        # Linea fuente de cada instruccion del ultimo programa ensamblado
+        self.line_map = []
+
+        # Literales numericos ya convertidos (los kernels desenrollados los repiten)
+        self._literals = {}
+        # Codificadores por mnemonico, construidos a partir de las tablas
+        self._encoders = {inst: self._make_encoder(inst, fmt) for inst, fmt in FORMATS.items()}
+
     def parse_register(self, reg_str):
-        if not reg_str or reg_str[0] != 'x':
-            raise ValueError(f"Invalid register: {reg_str}")
-        idx = int(reg_str[1:])
-        if not (0 <= idx < 32):
+        idx = REGISTERS.get(reg_str)
+        if idx is None:
+            if not reg_str or reg_str[0] != 'x':
+                raise ValueError(f"Invalid register: {reg_str}")
             raise ValueError(f"Register out of range: {reg_str}")
         return idx
 
     # Helpers de codificacion para 64 bits - Formato unificado
     # [63-56: opcode] [55-51: rd] [50-46: rs1] [45-41: rs2] [40-38: funct3] [37-31: funct7] [30-0: imm/unused]
-    
+
     def encode_r64(self, funct7, rs2, rs1, funct3, rd, opcode):
         """Codifica instruccion R-type con formato unificado"""
         funct7 &= 0x7F
@@ -88,6 +178,8 @@ class Assembler:
 
     def encode_i64(self, imm, rs1, funct3, rd, opcode):
         """Codifica instruccion I-type con formato unificado (rs2=0 para I-type)"""
+        if not (-(1 << 30) <= imm <= 0x7FFFFFFF):
+            raise ValueError(f"Immediate out of 31-bit range: 0x{imm:X} (use li64 for 64-bit constants)")
         imm &= 0x7FFFFFFF      # 31 bits para inmediato
         rs1 &= 0x1F
         funct3 &= 0x7
@@ -97,128 +189,425 @@ class Assembler:
         instr = (opcode << 56) | (rd << 51) | (rs1 << 46) | (funct3 << 38) | imm
         return instr
 
-    def assemble(self, code):
-        program = []
-        for lineno, line in enumerate(code.strip().split('\n'), 1):
-            line = line.split('#')[0].strip()
-            if not line: continue
-            parts = line.replace(',', ' ').split()
-            inst = parts[0].lower()
-
-            instruction = None
-
-            # Instrucciones R-type
-            if inst in ['add', 'sub', 'mul', 'and', 'or', 'xor', 'not']:
-                if inst == 'not':
-                    if len(parts) < 3:
-                        raise ValueError(f"[line {lineno}] Instruction {inst} missing operands.")
-                    rd = self.parse_register(parts[1])
-                    rs1 = self.parse_register(parts[2])
-                    rs2 = 0
-                else:
-                    if len(parts) < 4:
-                        raise ValueError(f"[line {lineno}] Instruction {inst} missing operands.")
-                    rd = self.parse_register(parts[1])
-                    rs1 = self.parse_register(parts[2])
-                    rs2 = self.parse_register(parts[3])
-                f7 = self.funct7.get(inst, 0)
-                f3 = self.funct3.get(inst, 0)
-                op = self.opcodes[inst]
-                instruction = self.encode_r64(f7, rs2, rs1, f3, rd, op)
-
-            elif inst == 'lw':
-                rd = self.parse_register(parts[1])
-                offset_str, rs1_str = parts[2].split('(')
-                rs1 = self.parse_register(rs1_str[:-1])
-                try:
-                    offset = int(offset_str, 0)
-                except ValueError:
-                    raise ValueError(f"[line {lineno}] Invalid lw offset: {offset_str}")
-                instruction = self.encode_i64(offset, rs1, self.funct3['lw'], rd, self.opcodes['lw'])
-
-            elif inst == 'sw':
-                # Formato: sw rs2, offset(rs1)
-                rs2 = self.parse_register(parts[1])
-                offset_str, rs1_str = parts[2].split('(')
-                rs1 = self.parse_register(rs1_str[:-1])
-                try:
-                    offset = int(offset_str, 0)
-                except ValueError:
-                    raise ValueError(f"[line {lineno}] Invalid sw offset: {offset_str}")
-                # Usamos encode_i64 con rd = rs2 para transportar el registro fuente en campos definidos
-                instruction = self.encode_i64(offset, rs1, self.funct3['sw'], rs2, self.opcodes['sw'])
-
-            elif inst in ['addi', 'rol', 'muli', 'modi']:
-                if len(parts) < 4:
-                    raise ValueError(f"[line {lineno}] Instruction {inst} missing operands.")
-                rd = self.parse_register(parts[1])
-                rs1 = self.parse_register(parts[2])
-                try:
-                    imm = int(parts[3], 0)
-                except ValueError:
-                    raise ValueError(f"[line {lineno}] Invalid immediate value: {parts[3]}")
-                f3 = self.funct3.get(inst, 0)
-                opcode = self.opcodes.get(inst)
-                instruction = self.encode_i64(imm, rs1, f3, rd, opcode)
-
-            elif inst == 'jal':
-                if len(parts) < 3:
-                    raise ValueError(f"[line {lineno}] Instruction {inst} missing operands.")
-                rd = self.parse_register(parts[1])
-                try:
-                    imm = int(parts[2], 0)
-                except ValueError:
-                    raise ValueError(f"[line {lineno}] Invalid immediate value: {parts[2]}")
-                f3 = self.funct3.get(inst, 0)
-                opcode = self.opcodes.get(inst)
-                instruction = self.encode_i64(imm, 0, f3, rd, opcode)
-
-            elif inst == 'beq':
-                if len(parts) < 4:
-                    raise ValueError(f"[line {lineno}] Instruction {inst} missing operands.")
-                rs1 = self.parse_register(parts[1])
-                rs2 = self.parse_register(parts[2])
+    # ----------------------------------------------------------
+    # Codificadores por mnemonico
+    # ----------------------------------------------------------
+    def _make_encoder(self, inst, fmt):
+        """
+        Devuelve una funcion (op1, op2, op3, pc) -> instruccion para `inst`.
+        Los campos fijos (opcode, funct3, funct7) se precalculan una sola vez.
+        """
+        if fmt in ('R', 'U', 'P', 'Q', 'M'):
+            base = self.encode_r64(self.funct7.get(inst, 0), 0, 0, self.funct3.get(inst, 0), 0, self.opcodes[inst])
+        elif fmt == 'W':
+            base = None  # pseudo-instruccion: usa los campos de lli y lhi
+        else:
+            base = self.encode_i64(0, 0, self.funct3.get(inst, 0), 0, self.opcodes[inst])
+        regs = REGISTERS.get
+        reg = self._operand_register
+        imm = self._operand_immediate
+        imm31 = self._operand_imm31
+        mem = self._operand_memory
+        target = self._operand_branch
+
+        if fmt == 'R':
+            def encode(a, b, c, pc):
+                rd, rs1, rs2 = regs(a), regs(b), regs(c)
+                if rd is None or rs1 is None or rs2 is None:
+                    rd, rs1, rs2 = reg(a), reg(b), reg(c)
+                return base | (rd << 51) | (rs1 << 46) | (rs2 << 41)
+        elif fmt == 'U':
+            def encode(a, b, c, pc):
+                rd, rs1 = regs(a), regs(b)
+                if rd is None or rs1 is None:
+                    rd, rs1 = reg(a), reg(b)
+                return base | (rd << 51) | (rs1 << 46)
+        elif fmt == 'I':
+            def encode(a, b, c, pc):
+                rd, rs1 = regs(a), regs(b)
+                if rd is None or rs1 is None:
+                    rd, rs1 = reg(a), reg(b)
+                return base | (rd << 51) | (rs1 << 46) | imm31(c)
+        elif fmt == 'V':
+            def encode(a, b, c, pc):
+                return base | (reg(a) << 51) | imm31(b)
+        elif fmt in ('L', 'S'):
+            # lw rd, off(rs1) / sw rs2, off(rs1): en sw el registro fuente viaja en el campo rd
+            def encode(a, b, c, pc):
+                offset, rs1 = mem(b)
+                return base | (reg(a) << 51) | (rs1 << 46) | offset
+        elif fmt == 'J':
+            def encode(a, b, c, pc):
+                return base | (reg(a) << 51) | (target(b, pc) & 0x7FFFFFFF)
+        elif fmt == 'B':
+            def encode(a, b, c, pc):
+                return base | (reg(a) << 46) | (reg(b) << 41) | (target(c, pc) & 0x7FFFFFFF)
+        elif fmt == 'P':
+            def encode(a, b, c, pc):
+                return base | (reg(a) << 46) | (reg(b) << 41)
+        elif fmt == 'H':
+            # Inmediato de 32 bits en los bits 31-0 (el bit 31 ocupa el lugar del bit 0 de funct7)
+            def encode(a, b, c, pc):
+                return base | (reg(a) << 51) | self._operand_imm32(b)
+        elif fmt == 'W':
+            # li64 rd, imm64 -> lli rd, bajo ; lhi rd, alto
+            lli = self.encode_i64(0, 0, self.funct3['lli'], 0, self.opcodes['lli'])
+            lhi = self.encode_i64(0, 0, self.funct3['lhi'], 0, self.opcodes['lhi'])
+
+            def encode(a, b, c, pc):
+                rd = reg(a) << 51
+                value = imm(b)
+                if not (-(1 << 63) <= value < (1 << 64)):
+                    raise _OperandError(f"Immediate out of 64-bit range: {b}")
+                value &= 0xFFFFFFFFFFFFFFFF
+                return lli | rd | (value & 0xFFFFFFFF), lhi | rd | (value >> 32)
+        elif fmt == 'M':
+            def encode(a, b, c, pc):
+                rd, rs1, rs2 = reg(a), reg(b), reg(c)
+                if rs2 > 30:
+                    raise _OperandError(f"Register pair out of range: {c}..x{rs2 + 1}")
+                return base | (rd << 51) | (rs1 << 46) | (rs2 << 41)
+        elif fmt == 'Q':
+            def encode(a, b, c, pc):
+                rd, rs1 = reg(a), reg(b)
+                if rd > 28:
+                    raise _OperandError(f"Register quad out of range: {a}..x{rd + 3}")
+                return base | (rd << 51) | (rs1 << 46)
+        else:  # 'N'
+            def encode(a, b, c, pc):
+                return base
+        return encode
+
+    def _operand_register(self, token):
+        idx = REGISTERS.get(token)
+        if idx is None:
+            if token[:1] != 'x':
+                raise _OperandError(f"Invalid register: {token}")
+            raise _OperandError(f"Register out of range: {token}")
+        return idx
+
+    def _operand_immediate(self, token):
+        sym = self.symbols.get(token)
+        if sym is not None:
+            return sym["value"]
+        value = self._literals.get(token)
+        if value is None:
+            try:
+                value = int(token, 0)
+            except ValueError:
+                raise _OperandError(f"Invalid immediate value or undefined symbol: {token}") from None
+            if len(self._literals) < 65536:
+                self._literals[token] = value
+        return value
+
+    def _operand_imm31(self, token):
+        """Inmediato del campo de 31 bits, ya codificado (los negativos en complemento a 2)."""
+        value = self._operand_immediate(token)
+        if not (-(1 << 30) <= value <= 0x7FFFFFFF):
+            raise _OperandError(f"Immediate out of 31-bit range: {token} (use li64 for 64-bit constants)")
+        return value & 0x7FFFFFFF
+
+    def _operand_imm32(self, token):
+        value = self._operand_immediate(token)
+        if not (0 <= value <= 0xFFFFFFFF):
+            raise _OperandError(f"Immediate out of 32-bit range: {token}")
+        return value
+
+    def _li64_fits_lli(self, token):
+        """li64 con un valor ya conocido de 32 bits sin signo se reduce a un solo lli."""
+        try:
+            return 0 <= self._operand_immediate(token) <= 0xFFFFFFFF
+        except _OperandError:
+            return False  # simbolo definido mas adelante: se reservan dos palabras
+
+    def _operand_memory(self, token):
+        offset, paren, base = token.partition('(')
+        if not paren or base[-1:] != ')':
+            raise _OperandError(f"Invalid memory operand (expected offset(reg)): {token}")
+        return self._operand_imm31(offset or '0'), self._operand_register(base[:-1])
+
+    def _operand_branch(self, token, pc):
+        sym = self.symbols.get(token)
+        if sym is not None and sym["kind"] == "label":
+            offset = sym["value"] - pc
+        else:
+            offset = self._operand_immediate(token)
+        if not (-(1 << 30) <= offset < (1 << 30)):
+            raise _OperandError(f"Branch offset out of range: {offset}")
+        return offset
+
+    # ----------------------------------------------------------
+    # Resolucion de simbolos (API publica)
+    # ----------------------------------------------------------
+    def resolve_immediate(self, token, lineno):
+        """Resuelve un inmediato: numero literal, constante .equ o direccion de etiqueta."""
+        try:
+            return self._operand_immediate(token)
+        except _OperandError as e:
+            raise AssemblerError([(lineno, str(e))]) from None
+
+    def resolve_branch_offset(self, token, pc, lineno):
+        """
+        Resuelve el desplazamiento de beq/jal. Una etiqueta produce un offset
+        relativo al PC de la instruccion; un numero o constante .equ se usa tal cual.
+        """
+        try:
+            return self._operand_branch(token, pc)
+        except _OperandError as e:
+            raise AssemblerError([(lineno, str(e))]) from None
+
+    def _define_symbol(self, name, value, kind, lineno):
+        if not SYMBOL_RE.match(name):
+            raise _OperandError(f"Invalid symbol name: {name}")
+        if name in REGISTERS:
+            raise _OperandError(f"Symbol name clashes with a register: {name}")
+        if name in self.symbols:
+            raise _OperandError(f"Duplicate symbol: {name} "
+                                f"(first defined at line {self.symbols[name]['line']})")
+        self.symbols[name] = {"value": value, "kind": kind, "line": lineno}
+
+    # ----------------------------------------------------------
+    # Pasadas del ensamblador
+    # ----------------------------------------------------------
+    def first_pass(self, code, errors=None):
+        """
+        Primera pasada: expande macros, registra etiquetas y constantes .equ y
+        devuelve la lista de instrucciones (lineno, pc, mnemonico, op1, op2, op3)
+        pendientes de codificar. Los errores se acumulan en `errors` (o se
+        lanzan juntos al final).
+        """
+        own_errors = errors is None
+        if own_errors:
+            errors = []
+        self.symbols = {}
+        pending = []
+        append = pending.append
+        pc = 0
+        line_numbers = None
+        if '.macro' in code or '.rept' in code:
+            code, line_numbers = self.expand_macros(code, errors)
+        for index, (labels, inst, a, b, c) in enumerate(LINE_RE.findall(code)):
+            lineno = line_numbers[index] if line_numbers else index + 1
+            if labels:
                 try:
-                    imm = int(parts[3], 0)
-                except ValueError:
-                    raise ValueError(f"[line {lineno}] Invalid immediate value: {parts[3]}")
-                f3 = self.funct3.get(inst, 0)
-                opcode = self.opcodes.get(inst)
-                instruction = self.encode_r64(0, rs2, rs1, f3, 0, opcode) | (imm & 0x7FFFFFFF)
-
-            elif inst in ['vwr', 'vinit']:
-                if len(parts) < 3:
-                    raise ValueError(f"[line {lineno}] Instruction {inst} missing operands.")
-                rd = self.parse_register(parts[1])
+                    for label in labels.split(':')[:-1]:
+                        self._define_symbol(label.strip(), pc, "label", lineno)
+                except _OperandError as e:
+                    errors.append((lineno, str(e)))
+            if not inst:
+                continue
+            if inst[0] == '.':
                 try:
-                    imm = int(parts[2], 0)
-                except ValueError:
-                    raise ValueError(f"[line {lineno}] Invalid immediate value: {parts[2]}")
-                f3 = self.funct3.get(inst, 0)
-                opcode = self.opcodes.get(inst)
-                instruction = self.encode_i64(imm, 0, f3, rd, opcode)
-
-            elif inst == 'vsign':
-                if len(parts) < 4:
-                    raise ValueError(f"[line {lineno}] Instruction {inst} missing operands.")
-                rd = self.parse_register(parts[1])
-                rs1 = self.parse_register(parts[2])
-                rs2 = self.parse_register(parts[3])
-                f7 = self.funct7.get(inst, 0)
-                f3 = self.funct3.get(inst, 0)
-                opcode = self.opcodes.get(inst)
-                instruction = self.encode_r64(f7, rs2, rs1, f3, rd, opcode)
-
-            elif inst == 'ebreak':
-                # ebreak no tiene operandos
-                f3 = self.funct3.get(inst, 0)
-                opcode = self.opcodes.get(inst)
-                instruction = self.encode_i64(0, 0, f3, 0, opcode)
-
-            else:
-                raise ValueError(f"[line {lineno}] Unknown instruction: {inst}")
-
-            program.append(instruction & 0xFFFFFFFFFFFFFFFF)
+                    self._directive(inst.lower(), a, b, c, lineno)
+                except _OperandError as e:
+                    errors.append((lineno, str(e)))
+                continue
+            if inst.lower() == 'li64':
+                if self._li64_fits_lli(b):
+                    inst = 'lli'
+                else:
+                    append((lineno, pc, inst, a, b, c))
+                    pc += 16
+                    continue
+            append((lineno, pc, inst, a, b, c))
+            pc += 8
+        if own_errors and errors:
+            raise AssemblerError(errors)
+        return pending
+
+    # ----------------------------------------------------------
+    # Macros y repeticiones (.macro/.endm, .rept/.endr)
+    # ----------------------------------------------------------
+    def expand_macros(self, code, errors=None):
+        """
+        Expande las directivas .macro/.endm y .rept/.endr.
+
+        Dentro del cuerpo de una macro, \\param se sustituye por el argumento
+        correspondiente y \\@ por un contador unico de expansion (util para
+        etiquetas locales). Las lineas generadas por una macro se atribuyen a
+        la linea de la invocacion.
 
+        Returns:
+            tuple: (texto_expandido, lista con la linea fuente de cada linea)
+        """
+        own_errors = errors is None
+        if own_errors:
+            errors = []
+        self.macros = {}
+        self._expansions = 0
+        self._counts = {}
+        source = list(enumerate(code.split('\n'), 1))
+        out = []
+        self._expand_lines(source, out, errors, 0)
+        if own_errors and errors:
+            raise AssemblerError(errors)
+        return '\n'.join(text for _, text in out), [lineno for lineno, _ in out]
+
+    @staticmethod
+    def _split_directive(text):
+        body = text.split('#', 1)[0]
+        labels, rest = LABEL_PREFIX_RE.match(body).groups()
+        parts = rest.split(None, 1)
+        if not parts:
+            return labels, '', ''
+        return labels, parts[0], parts[1].strip() if len(parts) > 1 else ''
+
+    @staticmethod
+    def _split_args(args):
+        if not args:
+            return []
+        if ',' in args:
+            return [a.strip() for a in args.split(',')]
+        return args.split()
+
+    def _collect_block(self, lines, start, open_name, close_name, errors):
+        """Devuelve (cuerpo, indice_siguiente) del bloque que abre en lines[start]."""
+        depth = 1
+        i = start + 1
+        while i < len(lines):
+            name = self._split_directive(lines[i][1])[1].lower()
+            if name == open_name:
+                depth += 1
+            elif name == close_name:
+                depth -= 1
+                if depth == 0:
+                    return lines[start + 1:i], i + 1
+            i += 1
+        errors.append((lines[start][0], f"Missing {close_name} for {open_name}"))
+        return lines[start + 1:], len(lines)
+
+    def _expand_lines(self, lines, out, errors, depth):
+        if depth > MAX_MACRO_DEPTH:
+            errors.append((lines[0][0] if lines else 0, "Macro expansion too deep (recursive macro?)"))
+            return
+        i = 0
+        while i < len(lines):
+            lineno, text = lines[i]
+            labels, name, args = self._split_directive(text)
+            key = name.lower()
+            if key == '.macro':
+                body, i = self._collect_block(lines, i, '.macro', '.endm', errors)
+                header = args.split(None, 1)
+                if not header or not SYMBOL_RE.match(header[0]):
+                    errors.append((lineno, ".macro expects a name"))
+                    continue
+                params = self._split_args(header[1] if len(header) > 1 else '')
+                self.macros[header[0]] = (params, body)
+                continue
+            if key == '.rept':
+                body, i = self._collect_block(lines, i, '.rept', '.endr', errors)
+                if labels.strip():
+                    out.append((lineno, labels))
+                count = self._rept_count(args, lineno, errors)
+                for _ in range(count):
+                    self._expand_lines(body, out, errors, depth + 1)
+                continue
+            if key in ('.endm', '.endr'):
+                errors.append((lineno, f"{key} without matching block"))
+                i += 1
+                continue
+            if key == '.equ':
+                # Se recuerdan los valores numericos para poder usarlos en .rept
+                parts = self._split_args(args)
+                if len(parts) == 2:
+                    try:
+                        self._counts[parts[0]] = int(parts[1], 0)
+                    except ValueError:
+                        if parts[1] in self._counts:
+                            self._counts[parts[0]] = self._counts[parts[1]]
+            macro = self.macros.get(name)
+            if macro is None:
+                out.append((lineno, text))
+                i += 1
+                continue
+            params, body = macro
+            values = self._split_args(args)
+            if len(values) != len(params):
+                errors.append((lineno, f"Macro {name} expects {len(params)} argument(s), got {len(values)}"))
+                i += 1
+                continue
+            if labels.strip():
+                out.append((lineno, labels))
+            self._expansions += 1
+            mapping = dict(zip(params, values))
+            mapping['@'] = str(self._expansions)
+            expanded = []
+            for _, body_text in body:
+                expanded.append((lineno, MACRO_ARG_RE.sub(
+                    lambda m: mapping.get(m.group(1), m.group(0)), body_text)))
+            self._expand_lines(expanded, out, errors, depth + 1)
+            i += 1
+
+    def _rept_count(self, args, lineno, errors):
+        token = args.strip()
+        count = self._counts.get(token)
+        if count is None:
+            try:
+                count = int(token, 0)
+            except ValueError:
+                errors.append((lineno, f"Invalid .rept count: {token}"))
+                return 0
+        if count < 0:
+            errors.append((lineno, f"Invalid .rept count: {token}"))
+            return 0
+        return count
+
+    def _directive(self, name, a, b, c, lineno):
+        if name == '.equ':
+            if not a or not b or c:
+                raise _OperandError(".equ expects a name and a value.")
+            self._define_symbol(a, self._operand_immediate(b), "equ", lineno)
+        else:
+            raise _OperandError(f"Unknown directive: {name}")
+
+    def assemble(self, code):
+        """
+        Ensambla en dos pasadas: la primera resuelve etiquetas y .equ, la segunda
+        codifica. La tabla de simbolos queda disponible en self.symbols.
+        Si hay lineas invalidas se lanza un AssemblerError con todas ellas.
+        """
+        errors = []
+        pending = self.first_pass(code, errors)
+        program = []
+        line_map = []
+        append = program.append
+        encoders = self._encoders
+        for lineno, pc, inst, a, b, c in pending:
+            line_map.append(lineno)
+            encode = encoders.get(inst)
+            if encode is None:
+                inst = inst.lower()
+                encode = encoders.get(inst)
+                if encode is None:
+                    errors.append((lineno, f"Unknown instruction: {inst}"))
+                    continue
+            try:
+                word = encode(a, b, c, pc)
+                if word.__class__ is tuple:  # li64: dos palabras
+                    program.extend(word)
+                    line_map.append(lineno)
+                else:
+                    append(word)
+            except _OperandError as e:
+                # Solo en la ruta de error se distingue un operando faltante
+                given = (a != '') + (b != '') + (c != '')
+                if given < MIN_OPERANDS[FORMATS[inst.lower()]]:
+                    errors.append((lineno, f"Instruction {inst.lower()} missing operands."))
+                else:
+                    errors.append((lineno, str(e)))
+        self.line_map = line_map
+        if errors:
+            errors.sort(key=lambda e: e[0])
+            raise AssemblerError(errors)
         return program
 
+    def assemble_with_symbols(self, code):
+        """Ensambla y devuelve (codigo_maquina, tabla_de_simbolos)."""
+        program = self.assemble(code)
+        return program, dict(self.symbols)
+
+    def assemble_object(self, code):
+        """Ensambla y empaqueta codigo, simbolos y mapa de lineas en un ObjectFile."""
+        program = self.assemble(code)
+        return ObjectFile.from_program(program, dict(self.symbols), self.line_map, source=code)
+
@@ -0,0 +1,58 @@
+# bench_assembler.py
+# ----------------------------------------------------------
+# Benchmark del ensamblador: lineas por segundo
+# ----------------------------------------------------------
+
+import random
+
+from bench_common import make_result, time_call
+from assembler import Assembler
+
+# Plantillas de instrucciones usadas para generar programas sinteticos
+TEMPLATES = [
+    "add x{a}, x{b}, x{c}",
+    "sub x{a}, x{b}, x{c}",
+    "mul x{a}, x{b}, x{c}",
+    "and x{a}, x{b}, x{c}",
+    "or x{a}, x{b}, x{c}",
+    "xor x{a}, x{b}, x{c}",
+    "not x{a}, x{b}",
+    "addi x{a}, x{b}, {imm}",
+    "muli x{a}, x{b}, {imm}",
+    "modi x{a}, x{b}, {imm}",
+    "rol x{a}, x{b}, {sh}",
+    "lw x{a}, {off}(x{b})",
+    "sw x{a}, {off}(x{b})",
+    "beq x{a}, x{b}, 16",
+    "jal x{a}, 8",
+]
+
+
+def generate_program(num_lines, seed=1234):
+    """Genera un programa assembly valido de `num_lines` instrucciones."""
+    rng = random.Random(seed)
+    lines = []
+    for i in range(num_lines):
+        template = TEMPLATES[rng.randrange(len(TEMPLATES))]
+        line = template.format(
+            a=rng.randrange(1, 32), b=rng.randrange(32), c=rng.randrange(32),
+            imm=hex(rng.randrange(1, 0xFFFF)), sh=rng.randrange(64),
+            off=rng.randrange(0, 512, 8),
+        )
+        if i % 10 == 0:
+            line += "    # comentario"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def run(sizes=(1000, 10000), repeat=3):
+    results = []
+    assembler = Assembler()
+    for size in sizes:
+        code = generate_program(size)
+        seconds, _ = time_call(lambda: assembler.assemble(code), repeat=repeat)
+        results.append(make_result(
+            "assembler.assemble", size / seconds, "lines/s",
+            params={"lines": size}, seconds=seconds,
+        ))
+    return results
@@ -0,0 +1,96 @@
+# bench_common.py
+# ----------------------------------------------------------
+# Utilidades compartidas por la suite de benchmarks
+# ----------------------------------------------------------
+
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+# Directorio ISA/ (los modulos del simulador se importan de forma plana)
+ISA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ISA_DIR not in sys.path:
+    sys.path.insert(0, ISA_DIR)
+
+RESULTS_FORMAT_VERSION = 1
+
+
+def time_call(func, repeat=3, min_time=0.2):
+    """
+    Mide el tiempo de una funcion sin argumentos.
+
+    Ejecuta `func` hasta acumular al menos `min_time` segundos por ronda y
+    devuelve el mejor tiempo por llamada de `repeat` rondas.
+
+    Returns:
+        tuple: (segundos_por_llamada, llamadas_por_ronda)
+    """
+    best = None
+    calls = 0
+    for _ in range(repeat):
+        calls = 0
+        start = time.perf_counter()
+        elapsed = 0.0
+        while calls == 0 or elapsed < min_time:
+            func()
+            calls += 1
+            elapsed = time.perf_counter() - start
+        per_call = elapsed / calls
+        if best is None or per_call < best:
+            best = per_call
+    return best, calls
+
+
+def make_result(benchmark, value, unit, params=None, seconds=None):
+    """Construye un registro de resultado con formato uniforme."""
+    return {
+        "benchmark": benchmark,
+        "params": params or {},
+        "value": value,
+        "unit": unit,
+        "seconds": seconds,
+    }
+
+
+def git_revision():
+    """Devuelve el commit actual del repositorio (o None si no hay git)."""
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=ISA_DIR, capture_output=True, text=True, timeout=5,
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    if out.returncode != 0:
+        return None
+    return out.stdout.strip()
+
+
+def host_info():
+    """Informacion del host para comparar resultados entre maquinas y versiones."""
+    return {
+        "hostname": platform.node(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "python_version": platform.python_version(),
+        "python_implementation": platform.python_implementation(),
+        "git_revision": git_revision(),
+    }
+
+
+def write_results(results, output_path):
+    """Escribe los resultados y la informacion del host en formato JSON."""
+    document = {
+        "format_version": RESULTS_FORMAT_VERSION,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "host": host_info(),
+        "results": results,
+    }
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(document, f, indent=2)
+    return document
@@ -0,0 +1,70 @@
+# bench_hash.py
+# ----------------------------------------------------------
+# Benchmark de hashing ToyMDMA y verificacion de archivos firmados
+# ----------------------------------------------------------
+
+import os
+import tempfile
+
+from bench_common import make_result, time_call
+from isa_pipeline_hash import ISAPipelineHashProcessor
+from toymdma_hasher import hash_file_resumable
+from tree_hash import hash_file_tree
+
+KB = 1024
+MB = 1024 * 1024
+
+# Tamanos por defecto (rapidos) y tamanos completos (1 KB - 100 MB)
+DEFAULT_SIZES = (1 * KB, 16 * KB, 64 * KB)
+FULL_SIZES = (1 * KB, 64 * KB, 1 * MB, 10 * MB, 100 * MB)
+
+
+def write_test_file(directory, size):
+    path = os.path.join(directory, f"bench_{size}.bin")
+    with open(path, 'wb') as f:
+        remaining = size
+        while remaining > 0:
+            chunk = min(remaining, 1 * MB)
+            f.write(os.urandom(chunk))
+            remaining -= chunk
+    return path
+
+
+def run_hash(sizes=DEFAULT_SIZES, repeat=3):
+    results = []
+    processors = {"pipeline": ISAPipelineHashProcessor(),
+                  "functional": ISAPipelineHashProcessor(functional=True)}
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            path = write_test_file(tmp, size)
+            # Los archivos grandes tardan minutos: una sola ronda basta
+            rounds = repeat if size <= 64 * KB else 1
+            modes = {mode: processor.calculate_hash_components
+                     for mode, processor in processors.items()}
+            modes["hasher"] = hash_file_resumable
+            # Modo arbol con hojas de 64 KB repartidas entre todos los nucleos
+            modes["tree"] = lambda p: hash_file_tree(p, leaf_size=64 * KB)
+            for mode, hash_file in modes.items():
+                seconds, _ = time_call(lambda: hash_file(path), repeat=rounds, min_time=0.0)
+                results.append(make_result(
+                    "hash.calculate_hash_components", size / seconds / MB, "MB/s",
+                    params={"size_bytes": size, "mode": mode}, seconds=seconds,
+                ))
+            os.remove(path)
+    return results
+
+
+def run_verify(sizes=(1 * KB, 64 * KB), repeat=3):
+    results = []
+    processor = ISAPipelineHashProcessor()
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            path = write_test_file(tmp, size)
+            signed = path + "_signed.bin"
+            processor.create_signed_file(path, signed)
+            seconds, _ = time_call(lambda: processor.verify_signed_file(signed), repeat=repeat)
+            results.append(make_result(
+                "verify.verify_signed_file", 1.0 / seconds, "verify/s",
+                params={"size_bytes": size}, seconds=seconds,
+            ))
+    return results
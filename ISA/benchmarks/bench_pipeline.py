@@ -0,0 +1,134 @@
+# bench_pipeline.py
+# ----------------------------------------------------------
+# Benchmark del pipeline: ciclos simulados por segundo
+# ----------------------------------------------------------
+
+import contextlib
+import io
+import os
+
+from bench_common import ISA_DIR, make_result, time_call
+from assembler import Assembler
+from isa_pipeline_hash import ISAPipelineHashProcessor
+from paged_memory import PagedMemory
+from simple_pipeline import DEFAULT_MDMA_LATENCY, Simple_Pipeline
+
+MAX_STEPS = 100000
+
+
+def run_to_completion(program, setup=None, memory=None):
+    """Ejecuta un programa en un pipeline nuevo y devuelve los ciclos usados."""
+    pipeline = Simple_Pipeline(trace=False, memory=memory)
+    pipeline.load_program(program)
+    if setup is not None:
+        setup(pipeline)
+    steps = 0
+    while pipeline.is_pipeline_active() and steps < MAX_STEPS:
+        pipeline.step()
+        steps += 1
+    return steps
+
+
+def bench_program(name, program, setup=None, repeat=3, memory_factory=None, label=None):
+    def once():
+        memory = memory_factory() if memory_factory is not None else None
+        return run_to_completion(program, setup, memory)
+
+    # Las instrucciones de boveda imprimen trazas de depuracion; se descartan
+    with contextlib.redirect_stdout(io.StringIO()):
+        cycles = once()
+        seconds, _ = time_call(once, repeat=repeat)
+    params = {"program": name, "cycles_per_run": cycles}
+    if label is not None:
+        params["memory"] = label
+    return make_result("pipeline.step", cycles / seconds, "cycles/s", params=params, seconds=seconds)
+
+
+def _slice_read_word(pipeline):
+    """Camino anterior: slice + int.from_bytes en cada acceso (referencia)."""
+    memory = pipeline.memory
+    return lambda addr: int.from_bytes(memory[addr:addr+8], 'little')
+
+
+def bench_word_access(label, read_word, accesses=4096, repeat=3):
+    # Direcciones alineadas a 8 bytes dentro del 1KB inicial
+    addrs = [(i * 8) % 1016 for i in range(accesses)]
+
+    def once():
+        for addr in addrs:
+            read_word(addr)
+
+    seconds, _ = time_call(once, repeat=repeat)
+    return make_result(
+        "memory.read_word", seconds / accesses * 1e9, "ns/access",
+        params={"memory": label, "accesses": accesses}, seconds=seconds,
+    )
+
+
+def run_memory(repeat=3):
+    """Compara los accesos de 64 bits: slice de bytes, vista cast('Q') y memoria paginada."""
+    flat = Simple_Pipeline(trace=False)
+    flat.memory[0:1024] = os.urandom(1024)
+    paged = Simple_Pipeline(trace=False, memory=PagedMemory())
+    paged.memory[0:1024] = flat.memory[0:1024]
+    return [
+        bench_word_access("bytearray-slice", _slice_read_word(flat), repeat=repeat),
+        bench_word_access("bytearray-view", flat.read_word, repeat=repeat),
+        bench_word_access("paged", paged.read_word, repeat=repeat),
+    ]
+
+
+def run_kernels(size=4096, repeat=3):
+    """Kernel desenrollado con instrucciones base, con mdma y con mdma alimentado por DMA."""
+    data = os.urandom(size)
+    blocks = size // 8
+    results = []
+    for fused in (False, True):
+        processor = ISAPipelineHashProcessor()
+        cycles = processor.calculate_hash_unrolled(data, fused=fused)["steps"]
+        seconds, _ = time_call(lambda: processor.calculate_hash_unrolled(data, fused=fused),
+                               repeat=repeat, min_time=0.0)
+        results.append(make_result(
+            "pipeline.kernel", cycles / blocks, "cycles/block",
+            params={"kernel": "mdma" if fused else "base", "size_bytes": size,
+                    "mdma_latency": DEFAULT_MDMA_LATENCY, "blocks_per_s": blocks / seconds},
+            seconds=seconds,
+        ))
+
+    # Con DMA los ciclos incluyen la configuracion y la espera a cada ranura
+    processor = ISAPipelineHashProcessor()
+    result = processor.calculate_hash_dma(data)
+    seconds, _ = time_call(lambda: processor.calculate_hash_dma(data), repeat=repeat, min_time=0.0)
+    results.append(make_result(
+        "pipeline.kernel", result["steps"] / blocks, "cycles/block",
+        params={"kernel": "mdma+dma", "size_bytes": size, "mdma_latency": DEFAULT_MDMA_LATENCY,
+                "dma_stall_cycles": result["dma"]["stall_cycles"], "blocks_per_s": blocks / seconds},
+        seconds=seconds,
+    ))
+    return results
+
+
+def run(repeat=3):
+    assembler = Assembler()
+    results = []
+
+    with open(os.path.join(ISA_DIR, 'program.asm'), 'r', encoding='utf-8') as f:
+        program = assembler.assemble(f.read())
+    results.append(bench_program("program.asm", program, repeat=repeat))
+
+    kernel = assembler.assemble(ISAPipelineHashProcessor().create_toymdata_program())
+
+    def setup_kernel(pipeline):
+        pipeline.registers[1] = 0x0706050403020100
+        pipeline.registers[2] = 0x0123456789ABCDEF
+        pipeline.registers[3] = 0xFEDCBA9876543210
+        pipeline.registers[4] = 0x1111111111111111
+        pipeline.registers[5] = 0x2222222222222222
+
+    results.append(bench_program("toymdma_kernel", kernel, setup_kernel, repeat=repeat,
+                                 label="bytearray"))
+    results.append(bench_program("toymdma_kernel", kernel, setup_kernel, repeat=repeat,
+                                 memory_factory=PagedMemory, label="paged"))
+    results.extend(run_memory(repeat=repeat))
+    results.extend(run_kernels(repeat=repeat))
+    return results
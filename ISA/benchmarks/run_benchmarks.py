@@ -0,0 +1,60 @@
+# run_benchmarks.py
+# ----------------------------------------------------------
+# Ejecuta la suite de benchmarks y guarda resultados en JSON
+#
+# Uso (desde el directorio ISA):
+#   python -m benchmarks.run_benchmarks [--full] [--only hash] [--output resultados.json]
+# ----------------------------------------------------------
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import bench_common  # noqa: E402  (configura sys.path hacia ISA/)
+import bench_assembler  # noqa: E402
+import bench_hash  # noqa: E402
+import bench_pipeline  # noqa: E402
+
+SUITES = ("assembler", "pipeline", "hash", "verify")
+
+
+def run_suite(name, full=False, repeat=3):
+    if name == "assembler":
+        sizes = (1000, 10000, 100000) if full else (1000, 10000)
+        return bench_assembler.run(sizes=sizes, repeat=repeat)
+    if name == "pipeline":
+        return bench_pipeline.run(repeat=repeat)
+    if name == "hash":
+        sizes = bench_hash.FULL_SIZES if full else bench_hash.DEFAULT_SIZES
+        return bench_hash.run_hash(sizes=sizes, repeat=repeat)
+    if name == "verify":
+        return bench_hash.run_verify(repeat=repeat)
+    raise ValueError(f"Unknown benchmark suite: {name}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks del simulador ISA")
+    parser.add_argument("--full", action="store_true",
+                        help="incluir entradas grandes (hash hasta 100 MB, 100K lineas)")
+    parser.add_argument("--only", action="append", choices=SUITES,
+                        help="ejecutar solo la suite indicada (repetible)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", default="benchmark_results.json")
+    args = parser.parse_args(argv)
+
+    results = []
+    for name in args.only or SUITES:
+        print(f"== {name} ==")
+        for result in run_suite(name, full=args.full, repeat=args.repeat):
+            print(f"  {result['benchmark']:<36} {str(result['params']):<44} "
+                  f"{result['value']:>14.2f} {result['unit']}")
+            results.append(result)
+
+    bench_common.write_results(results, args.output)
+    print(f"Resultados guardados en {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,373 @@
+# block_translator.py
+# ----------------------------------------------------------
+# Traductor de bloques basicos (modo funcional del simulador)
+#
+# Cada bloque basico (instrucciones hasta un beq/jal/ebreak) se compila una
+# sola vez a una funcion Python generada que trabaja sobre variables locales
+# y se guarda en cache por su PC inicial. El resultado arquitectonico es el
+# mismo que el del pipeline de 5 etapas de Simple_Pipeline:
+#
+#   - Sin forwarding: una instruccion lee el valor anterior de un registro
+#     escrito por la instruccion inmediatamente previa (distancia 1). Se
+#     modela confirmando el resultado de cada instruccion despues de que la
+#     siguiente haya leido sus operandos.
+#   - sw lee el dato (registro del campo rd) en MEM, por lo que si ve el
+#     resultado de la instruccion previa (la direccion, en EX, no). sw no
+#     escribe registros.
+#   - Un beq tomado o un jal anaden una burbuja: al llegar al destino todas
+#     las escrituras previas ya son visibles.
+#   - lhi solo escribe la mitad alta de rd: se combina al confirmar con el
+#     valor que tenga rd en ese momento (como la escritura parcial en WB).
+#   - vsignn, como sw, lee en MEM el registro de longitud x[rs2+1]; los
+#     ciclos que la boveda retiene MEM dependen de ese valor y se acumulan
+#     en stall_cycles durante la ejecucion.
+#   - Los dispositivos mapeados en memoria (DMA) avanzan al final de cada
+#     bloque, no ciclo a ciclo: un programa que espera sus indicadores de
+#     estado obtiene el mismo resultado, con otro reparto de la espera.
+#   - mdma escribe cuatro registros (rd..rd+3) y ocupa EX mdma_latency
+#     ciclos, que se suman como burbujas. Lee sus operandos en el primero de
+#     esos ciclos, asi que la latencia no cambia el resultado.
+#     Un resultado pendiente de mdma al final de un bloque viaja con
+#     pend_rd = rd + 32.
+#
+# Los ciclos se estiman como instrucciones retiradas + burbujas + 4 (llenado
+# y vaciado del pipeline), que coincide con lo que cuenta step().
+# ----------------------------------------------------------
+
+from simple_pipeline import OP_LHI, OP_LLI, OP_MDMA, OP_VSIGNN, branch_offset
+from toymdma_hasher import toymdma_kernel_block
+
+MASK64 = 0xFFFFFFFFFFFFFFFF
+MAX_BLOCK_INSTRUCTIONS = 64
+
+# Codigo generado ya compilado (fuente -> code object), compartido entre
+# traductores: un pipeline nuevo con el mismo programa no vuelve a compilar
+_compiled_blocks = {}
+
+# Opcodes que terminan un bloque basico
+OP_JAL = 0xD4
+OP_BEQ = 0xE5
+OP_EBREAK = 0x88
+
+
+def _quad(rd):
+    """Registros escritos por mdma rd (los que pasan de x31 no existen)."""
+    return [r for r in range(rd, rd + 4) if r < 32]
+
+
+def _write_quad(R, rd, values):
+    for r, value in enumerate(values, rd):
+        if 0 < r < 32:
+            R[r] = value
+
+
+def _decode(instr):
+    return ((instr >> 56) & 0xFF, (instr >> 51) & 0x1F, (instr >> 46) & 0x1F,
+            (instr >> 41) & 0x1F, (instr >> 38) & 0x7, (instr >> 31) & 0x7F,
+            instr & 0x7FFFFFFF)
+
+
+class BlockTranslator:
+    def __init__(self, pipeline):
+        """
+        Args:
+            pipeline: Simple_Pipeline cuyos registros, memoria y boveda se usan
+        """
+        self.pipeline = pipeline
+        # PC inicial -> (funcion del bloque, PC final exclusivo)
+        self.blocks = {}
+        # Codigo fuente generado por bloque (para depuracion)
+        self.sources = {}
+        # Rango de direcciones traducido: una escritura ahi invalida la cache
+        self.code_low = None
+        self.code_high = 0
+        self.translations = 0
+        # Ciclos extra de MEM de vsignn en la ejecucion actual
+        self.stall_cycles = 0
+
+    # ----------------------------------------------------------
+    # Invalidacion
+    # ----------------------------------------------------------
+    def invalidate(self):
+        self.blocks.clear()
+        self.sources.clear()
+        self.code_low = None
+        self.code_high = 0
+
+    def notify_write(self, addr, length=8):
+        """Invalida la cache si se escribe sobre codigo ya traducido."""
+        if self.code_low is not None and addr < self.code_high and addr + length > self.code_low:
+            self.invalidate()
+
+    # ----------------------------------------------------------
+    # Accesos usados por el codigo generado
+    # ----------------------------------------------------------
+    def _load(self, addr):
+        pipeline = self.pipeline
+        if 0 <= addr and addr + 8 <= len(pipeline.memory):
+            return pipeline.read_word(addr)
+        print(f"[ERROR MEM] lw: direccion fuera de rango addr=0x{addr:X}")
+        return 0
+
+    def _store(self, addr, value):
+        pipeline = self.pipeline
+        if 0 <= addr and addr + 8 <= len(pipeline.memory):
+            pipeline.write_word(addr, value)
+            self.notify_write(addr)
+        else:
+            print(f"[ERROR MEM] sw: direccion o registro fuera de rango addr=0x{addr:X}")
+        return 0
+
+    def _vwr(self, index, value):
+        self.pipeline.vault.write_key(index, value)
+        return 0
+
+    def _vinit(self, index, value):
+        self.pipeline.vault.write_init(index, value)
+        return 0
+
+    def _vwrx(self, index, value):
+        self.pipeline.vault.write_key(index, value)
+        return 0
+
+    def _vsign(self, addr, key_idx):
+        pipeline = self.pipeline
+        if not (0 <= addr and addr + 32 <= len(pipeline.memory)):
+            print(f"[ERROR vsign] memoria fuera de rango addr=0x{addr:X}")
+            return 0
+        if key_idx >= len(pipeline.vault.keys):
+            print(f"[ERROR vsign] clave fuera de rango key_idx={key_idx}")
+            return 0
+        blocks = [pipeline.read_word(addr + i*8) for i in range(4)]
+        for i, val in enumerate(pipeline.vault.sign_block(key_idx, blocks)):
+            pos = addr + 4*8 + i*8
+            if pos + 8 <= len(pipeline.memory):
+                pipeline.write_word(pos, val)
+                self.notify_write(pos)
+        return 1
+
+    def _vsignn(self, addr, key_idx, count):
+        pipeline = self.pipeline
+        self.stall_cycles += max(1, count * pipeline.vsign_block_cycles) - 1
+        # El indice de llave viaja de EX a MEM en el campo imm de 32 bits
+        return pipeline.vault_sign_region(addr, count, min(key_idx, 0xFFFFFFFF))
+
+    # ----------------------------------------------------------
+    # Traduccion
+    # ----------------------------------------------------------
+    def _expression(self, op, rd, rs1, rs2, f3, f7, imm):
+        """Expresion Python del resultado de EX/MEM (instrucciones sin control de flujo)."""
+        a, b = f"r{rs1}", f"r{rs2}"
+        if op == 0xC3:
+            if f3 == 0x1 and f7 == 0x10:
+                return f"({a} + {b}) & {MASK64}"
+            if f3 == 0x2 and f7 == 0x20:
+                return f"({a} - {b}) & {MASK64}"
+            if f3 == 0x3 and f7 == 0x30:
+                return f"({a} * {b}) & {MASK64}"
+        elif op == 0xF6:
+            if f3 == 0x1 and f7 == 0x40:
+                return f"{a} & {b}"
+            if f3 == 0x2 and f7 == 0x50:
+                return f"{a} | {b}"
+        elif op == 0xF7:
+            if f3 == 0x3 and f7 == 0x60:
+                return f"{a} ^ {b}"
+            if f3 == 0x4 and f7 == 0x70:
+                return f"~{a} & {MASK64}"
+        elif op == 0xAA:
+            r = imm & 0x3F
+            return f"(({a} << {r}) | ({a} >> {64 - r})) & {MASK64}"
+        elif op == 0xAB:
+            return f"({a} * {imm}) & {MASK64}"
+        elif op == 0xAC:
+            return "0" if imm == 0 else f"{a} % {imm}"
+        elif op == 0xA1:
+            return f"load(({a} + {imm}) & {MASK64})"
+        elif op == 0xA9:
+            return f"({a} + {imm}) & {MASK64}"
+        elif op == 0x90:
+            return f"vwr({rd & 0x3}, {imm})"
+        elif op == 0x91:
+            return f"vinit({rd & 0x3}, {imm})"
+        elif op == 0x92:
+            return f"vsign({b}, {rs1})"
+        elif op == 0x93:
+            return f"vwrx({a}, {b})"
+        elif op == 0x94:
+            return f"vsign({b}, {a})"
+        elif op == 0x96:
+            return f"vinit({a}, {b})"
+        elif op == OP_LLI:
+            return str(imm | (f7 & 1) << 31)
+        elif op == OP_LHI:
+            return str((imm | (f7 & 1) << 31) << 32)
+        elif op == OP_MDMA:
+            state = ", ".join(f"r{r}" if r < 32 else "0" for r in range(rd, rd + 4))
+            return f"mdma({state}, {a})"
+        return "0"
+
+    def translate(self, pc):
+        """Compila el bloque basico que empieza en `pc` (None si `pc` es el final del programa)."""
+        pipeline = self.pipeline
+        limit = len(pipeline.memory) - 8
+        instrs = []
+        addr = pc
+        while addr < limit and len(instrs) < MAX_BLOCK_INSTRUCTIONS:
+            word = pipeline.read_word(addr)
+            if word == 0:  # NOP: fin del programa
+                break
+            fields = _decode(word)
+            instrs.append((addr, fields))
+            addr += 8
+            if fields[0] in (OP_BEQ, OP_JAL, OP_EBREAK):
+                break
+        if not instrs:
+            return None
+
+        quads = {r for _, f in instrs if f[0] == OP_MDMA for r in _quad(f[1])}
+        lengths = {f[3] + 1 for _, f in instrs if f[0] == OP_VSIGNN and f[3] < 31}
+        used = sorted({r for _, f in instrs for r in (f[1], f[2], f[3])} - {0} | quads - {0} | lengths)
+        written = sorted({f[1] for _, f in instrs if f[0] != 0xB2} - {0} | quads - {0})
+        # Ciclos extra que mdma retiene la etapa EX
+        stalls = sum(f[0] == OP_MDMA for _, f in instrs) * (pipeline.mdma_latency - 1)
+        load_regs = ", ".join(f"r{r}" for r in used)
+        load_vals = ", ".join(f"R[{r}]" for r in used)
+        store_back = [f"R[{r}] = r{r}" for r in written]
+
+        lines = [f"def block_{pc:x}(R, pend_rd, pend_val):", "    r0 = 0"]
+        if used:
+            lines.append(f"    {load_regs}, = {load_vals},")
+
+        def commit_previous(k):
+            # Confirmar el resultado de la instruccion anterior (ya leidos los operandos)
+            if k == 0:
+                lines.append("    if pend_rd:")
+                lines.append("        if pend_rd < 32:")
+                lines.append("            R[pend_rd] = pend_val")
+                lines.append("        else:")
+                lines.append("            write_quad(R, pend_rd - 32, pend_val)")
+                if used:
+                    lines.append(f"        {load_regs}, = {load_vals},")
+            else:
+                prev_op, prev_rd = instrs[k - 1][1][:2]
+                if prev_op == OP_MDMA:
+                    targets = ", ".join(f"r{r}" if 0 < r < 32 else "_" for r in range(prev_rd, prev_rd + 4))
+                    lines.append(f"    {targets} = t{k - 1}")
+                elif prev_op == 0xB2:
+                    pass  # sw no escribe registros
+                elif prev_op == OP_LHI and prev_rd:
+                    lines.append(f"    r{prev_rd} = (r{prev_rd} & 0xFFFFFFFF) | t{k - 1}")
+                elif prev_rd:
+                    lines.append(f"    r{prev_rd} = t{k - 1}")
+
+        def finish(next_pc, pend, bubbles):
+            lines.extend(f"    {line}" for line in store_back)
+            lines.append(f"    return {next_pc}, {pend}, {len(instrs)}, {bubbles + stalls}")
+
+        for k, (ipc, (op, rd, rs1, rs2, f3, f7, imm)) in enumerate(instrs):
+            lines.append(f"    # 0x{ipc:04X}: op=0x{op:02X} rd=x{rd} rs1=x{rs1} rs2=x{rs2} imm=0x{imm:X}")
+            if op == 0xB2:  # sw: direccion en EX, dato (registro del campo rd) en MEM
+                lines.append(f"    a{k} = (r{rs1} + {imm}) & {MASK64}")
+                commit_previous(k)
+                lines.append(f"    t{k} = store(a{k}, r{rd})")
+                if k == len(instrs) - 1:
+                    finish(ipc + 8, "(0, 0)", 0)
+            elif op == OP_VSIGNN:  # direccion e indice de llave en EX, longitud en MEM
+                lines.append(f"    a{k} = r{rs2}")
+                lines.append(f"    s{k} = r{rs1}")
+                commit_previous(k)
+                count = f"r{rs2 + 1}" if rs2 < 31 else "0"
+                lines.append(f"    t{k} = vsignn(a{k}, s{k}, {count})")
+                if k == len(instrs) - 1:
+                    finish(ipc + 8, f"({rd}, t{k})", 0)
+            elif op == OP_BEQ:
+                lines.append(f"    c{k} = r{rs1} == r{rs2}")
+                commit_previous(k)
+                lines.append(f"    t{k} = 0")
+                lines.append(f"    if c{k}:")
+                if rd:
+                    lines.append(f"        r{rd} = 0")
+                for line in store_back:
+                    lines.append(f"        {line}")
+                lines.append(f"        return {ipc + branch_offset(imm)}, (0, 0), {len(instrs)}, {1 + stalls}")
+                finish(ipc + 8, f"({rd}, 0)", 0)
+            elif op == OP_JAL:
+                commit_previous(k)
+                if rd:
+                    lines.append(f"    r{rd} = {(ipc + 8) & MASK64}")
+                finish(ipc + branch_offset(imm), "(0, 0)", 1)
+            else:
+                lines.append(f"    t{k} = {self._expression(op, rd, rs1, rs2, f3, f7, imm)}")
+                commit_previous(k)
+                if k == len(instrs) - 1:
+                    if op == OP_MDMA:
+                        finish(ipc + 8, f"({rd + 32}, t{k})", 0)
+                    elif op == OP_LHI and rd:
+                        # rd aun tiene el valor previo a lhi: se combina ya
+                        finish(ipc + 8, f"({rd}, (r{rd} & 0xFFFFFFFF) | t{k})", 0)
+                    else:
+                        finish(ipc + 8, f"({rd}, t{k})", 0)
+
+        source = "\n".join(lines) + "\n"
+        namespace = {"load": self._load, "store": self._store, "vwr": self._vwr,
+                     "vinit": self._vinit, "vwrx": self._vwrx, "vsign": self._vsign,
+                     "vsignn": self._vsignn, "mdma": toymdma_kernel_block, "write_quad": _write_quad}
+        code = _compiled_blocks.get(source)
+        if code is None:
+            code = _compiled_blocks[source] = compile(source, f"<block 0x{pc:X}>", "exec")
+        exec(code, namespace)
+        func = namespace[f"block_{pc:x}"]
+
+        self.blocks[pc] = (func, addr)
+        self.sources[pc] = source
+        self.code_low = pc if self.code_low is None else min(self.code_low, pc)
+        self.code_high = max(self.code_high, addr)
+        self.translations += 1
+        return func
+
+    # ----------------------------------------------------------
+    # Ejecucion
+    # ----------------------------------------------------------
+    def run(self, max_instructions=1000000):
+        """
+        Ejecuta desde pipeline.pc hasta el NOP final con el pipeline vacio.
+
+        Returns:
+            dict: instrucciones retiradas, burbujas y ciclos equivalentes
+        """
+        pipeline = self.pipeline
+        if pipeline.IF_ID.valid or pipeline.ID_EX.valid or pipeline.EX_MEM.valid or pipeline.MEM_WB.valid:
+            raise RuntimeError("El modo funcional requiere el pipeline vacio")
+
+        R = pipeline.registers
+        blocks = self.blocks
+        devices = pipeline.devices
+        pc = pipeline.pc
+        pend = (0, 0)
+        retired = 0
+        bubbles = 0
+        self.stall_cycles = 0
+        while True:
+            entry = blocks.get(pc)
+            func = entry[0] if entry is not None else self.translate(pc)
+            if func is None:
+                break
+            pc, pend, count, bubble = func(R, pend[0], pend[1])
+            retired += count
+            bubbles += bubble
+            if devices:
+                # Los dispositivos avanzan al final de cada bloque con sus ciclos
+                pipeline.tick_devices(count + bubble)
+            if retired > max_instructions:
+                raise RuntimeError("Modo funcional excedió el limite de instrucciones")
+        if pend[0] >= 32:
+            _write_quad(R, pend[0] - 32, pend[1])
+        elif pend[0]:
+            R[pend[0]] = pend[1]
+
+        bubbles += self.stall_cycles
+        cycles = retired + bubbles + 4 if retired else 0
+        pipeline.pc = pc
+        pipeline.cycle += cycles
+        return {"instructions": retired, "bubbles": bubbles, "cycles": cycles}
@@ -0,0 +1,213 @@
+# checkpoint.py
+# ----------------------------------------------------------
+# Checkpoints en disco del estado completo del simulador
+#
+# Disposicion (little-endian):
+#   Cabecera : magic 'ISAC', version u16, flags u16, pc u64, ciclo u64,
+#              tamano de memoria u64
+#   Registros: 32 x u64
+#   Latches  : IF_ID, ID_EX, EX_MEM, MEM_WB (campos fijos + nombre de etapa
+#              + resultado de 4 registros de mdma), ciclos de EX y de MEM
+#              ocupados u32 (mdma / vsignn)
+#   Boveda   : num_keys u16, num_inits u16, llaves y valores iniciales u64,
+#              nombres de llaves (u32 + JSON UTF-8, como save_keystore)
+#   Regiones : num_regiones u32 y por region -> inicio u64, longitud u64,
+#              desplazamiento en el archivo u64, ruta (u16 + UTF-8)
+#   Memoria  : num_paginas u64 y por pagina -> numero u64 + 4096 bytes
+#
+# Solo se guardan las paginas de 4 KB con datos distintos de cero, por lo que
+# un espacio de varios GB casi vacio ocupa pocos KB en disco. Los archivos
+# mapeados con PagedMemory.map_region(..., source) se guardan como referencia
+# (ruta, desplazamiento, longitud) y se vuelven a mapear al cargar: solo sus
+# paginas privadas (copy-on-write) van al checkpoint.
+# ----------------------------------------------------------
+
+import json
+import mmap
+import os
+import struct
+
+from paged_memory import PAGE_SHIFT, PAGE_SIZE
+from simple_pipeline import PIPELINE_LATCHES, Simple_Pipeline
+
+CHECKPOINT_MAGIC = b'ISAC'
+CHECKPOINT_VERSION = 1
+
+FLAG_PAGED = 0x1   # la memoria era una PagedMemory (si no, bytearray plano)
+FLAG_VAULT = 0x2   # incluye el estado de la boveda
+
+_HEADER = struct.Struct('<4sHHQQQ')
+_REGISTERS = struct.Struct('<32Q')
+_LATCH = struct.Struct('<QQBBBBBBBIQB')
+_QUAD = struct.Struct('<B4Q')
+_STALLS = struct.Struct('<II')
+_VAULT = struct.Struct('<HH')
+_NAMES = struct.Struct('<I')
+_COUNT = struct.Struct('<Q')
+_REGION_COUNT = struct.Struct('<I')
+_REGION = struct.Struct('<QQQH')
+_LATCH_FIELDS = ('instruction', 'pc', 'valid', 'rd', 'rs1', 'rs2', 'funct3', 'funct7',
+                 'opcode', 'imm', 'alu_result')
+
+
+def _flat_pages(memory):
+    view = memoryview(memory)
+    for offset in range(0, len(memory), PAGE_SIZE):
+        chunk = view[offset:offset + PAGE_SIZE]
+        if any(chunk):
+            yield offset >> PAGE_SHIFT, bytes(chunk).ljust(PAGE_SIZE, b'\x00')
+
+
+def save_checkpoint(pipeline, path):
+    """Guarda el estado de `pipeline` en `path` (escritura atomica)."""
+    memory = pipeline.memory
+    paged = hasattr(memory, 'iter_nonzero_pages')
+    vault = pipeline.vault
+    flags = (FLAG_PAGED if paged else 0) | (FLAG_VAULT if vault is not None else 0)
+
+    parts = [_HEADER.pack(CHECKPOINT_MAGIC, CHECKPOINT_VERSION, flags,
+                          pipeline.pc, pipeline.cycle, len(memory)),
+             _REGISTERS.pack(*(r & 0xFFFFFFFFFFFFFFFF for r in pipeline.registers))]
+    for name in PIPELINE_LATCHES:
+        latch = getattr(pipeline, name)
+        stage = latch.stage.encode('ascii')
+        parts.append(_LATCH.pack(*(int(getattr(latch, f)) for f in _LATCH_FIELDS), len(stage)))
+        parts.append(stage)
+        quad = latch.quad
+        parts.append(_QUAD.pack(1, *quad) if quad is not None else _QUAD.pack(0, 0, 0, 0, 0))
+    parts.append(_STALLS.pack(pipeline.ex_stall, pipeline.mem_stall))
+    if vault is not None:
+        parts.append(_VAULT.pack(len(vault.keys), len(vault.inits)))
+        parts.append(struct.pack(f'<{len(vault.keys) + len(vault.inits)}Q', *vault.keys, *vault.inits))
+        names = json.dumps(vault.names, separators=(',', ':')).encode('utf-8') if vault.names else b''
+        parts.append(_NAMES.pack(len(names)))
+        parts.append(names)
+
+    references = []
+    if paged:
+        sources = memory.region_sources
+        references = [(start, end - start, *sources[start]) for start, end, _ in memory.regions
+                      if start in sources]
+        # Las regiones sin archivo de origen (buffers) se guardan por contenido
+        inline = [(start, end) for start, end, _ in memory.regions if start not in sources]
+        pages = memory.iter_nonzero_pages(inline)
+    else:
+        pages = _flat_pages(memory)
+    parts.append(_REGION_COUNT.pack(len(references)))
+    for start, length, source_path, offset in references:
+        raw = os.fsencode(source_path)
+        parts.append(_REGION.pack(start, length, offset, len(raw)))
+        parts.append(raw)
+
+    # Las paginas se escriben a medida que se recorren; el contador se
+    # completa al final
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(b''.join(parts))
+        count_pos = f.tell()
+        f.write(_COUNT.pack(0))
+        num_pages = 0
+        for page_no, data in pages:
+            f.write(_COUNT.pack(page_no))
+            f.write(data)
+            num_pages += 1
+        f.seek(count_pos)
+        f.write(_COUNT.pack(num_pages))
+    os.replace(tmp_path, path)
+
+
+def _map_reference(source_path, offset, length):
+    """Vuelve a mapear (solo lectura) el trozo de archivo de una region."""
+    if os.path.getsize(source_path) < offset + length:
+        raise ValueError(f"El archivo mapeado cambio de tamano: {source_path}")
+    with open(source_path, 'rb') as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return memoryview(mapped)[offset:offset + length]
+
+
+def load_checkpoint(path):
+    """Lee un checkpoint y devuelve un estado aceptado por Simple_Pipeline.restore()."""
+    with open(path, 'rb') as f:
+        data = memoryview(f.read())
+    if data.nbytes < _HEADER.size:
+        raise ValueError("Checkpoint demasiado pequeno")
+    magic, version, flags, pc, cycle, memory_size = _HEADER.unpack_from(data)
+    if magic != CHECKPOINT_MAGIC:
+        raise ValueError("No es un checkpoint del simulador")
+    if version != CHECKPOINT_VERSION:
+        raise ValueError(f"Version de checkpoint no soportada: {version}")
+    pos = _HEADER.size
+
+    registers = list(_REGISTERS.unpack_from(data, pos))
+    pos += _REGISTERS.size
+
+    latches = {}
+    for name in PIPELINE_LATCHES:
+        *values, stage_len = _LATCH.unpack_from(data, pos)
+        pos += _LATCH.size
+        fields = dict(zip(_LATCH_FIELDS, values))
+        fields['valid'] = bool(fields['valid'])
+        fields['stage'] = bytes(data[pos:pos + stage_len]).decode('ascii')
+        pos += stage_len
+        has_quad, *quad = _QUAD.unpack_from(data, pos)
+        pos += _QUAD.size
+        fields['quad'] = tuple(quad) if has_quad else None
+        latches[name] = fields
+
+    ex_stall, mem_stall = _STALLS.unpack_from(data, pos)
+    pos += _STALLS.size
+
+    vault = None
+    if flags & FLAG_VAULT:
+        num_keys, num_inits = _VAULT.unpack_from(data, pos)
+        pos += _VAULT.size
+        values = struct.unpack_from(f'<{num_keys + num_inits}Q', data, pos)
+        pos += 8 * (num_keys + num_inits)
+        (names_size,) = _NAMES.unpack_from(data, pos)
+        pos += _NAMES.size
+        names = json.loads(bytes(data[pos:pos + names_size]).decode('utf-8')) if names_size else {}
+        pos += names_size
+        vault = {"keys": list(values[:num_keys]), "inits": list(values[num_keys:]), "names": names}
+
+    regions = []
+    (num_regions,) = _REGION_COUNT.unpack_from(data, pos)
+    pos += _REGION_COUNT.size
+    for _ in range(num_regions):
+        start, length, offset, path_len = _REGION.unpack_from(data, pos)
+        pos += _REGION.size
+        source_path = os.fsdecode(bytes(data[pos:pos + path_len]))
+        pos += path_len
+        regions.append((start, _map_reference(source_path, offset, length), (source_path, offset)))
+
+    (num_pages,) = _COUNT.unpack_from(data, pos)
+    pos += _COUNT.size
+    pages = {}
+    for _ in range(num_pages):
+        (page_no,) = _COUNT.unpack_from(data, pos)
+        pos += _COUNT.size
+        pages[page_no] = bytes(data[pos:pos + PAGE_SIZE])
+        pos += PAGE_SIZE
+    if pos != data.nbytes:
+        raise ValueError("Checkpoint corrupto")
+
+    if flags & FLAG_PAGED:
+        memory = {"size": memory_size, "pages": pages, "regions": regions}
+    else:
+        flat = bytearray(memory_size)
+        for page_no, page in pages.items():
+            start = page_no << PAGE_SHIFT
+            flat[start:start + PAGE_SIZE] = page[:max(0, memory_size - start)]
+        memory = bytes(flat)
+
+    return {"registers": registers, "pc": pc, "cycle": cycle, "ex_stall": ex_stall, "mem_stall": mem_stall,
+            "latches": latches,
+            "memory": memory, "vault": vault}
+
+
+def restore_checkpoint(path, pipeline=None):
+    """Restaura un checkpoint sobre `pipeline` (o uno nuevo) y lo devuelve."""
+    if pipeline is None:
+        pipeline = Simple_Pipeline(trace=False)
+    pipeline.restore(load_checkpoint(path))
+    return pipeline
+
@@ -0,0 +1,126 @@
+# checkpoint_test_runner.py
+# Runner de prueba para snapshot/restore de PagedMemory y Simple_Pipeline
+# Comprueba que un snapshot fija el estado del momento en que se tomo y que
+# un checkpoint en disco se puede reanudar con el mismo resultado
+
+import os
+import sys
+import tempfile
+from assembler import Assembler
+from checkpoint import restore_checkpoint, save_checkpoint
+from file_loader import FileLoader
+from paged_memory import PagedMemory
+from simple_pipeline import Simple_Pipeline
+
+MEMORY_SIZE = 1 << 20
+MAX_STEPS = 10000
+DATA_BASE = 0x10000
+
+# Lee dos bloques del archivo mapeado, les aplica mdma y escribe sobre el
+# archivo (copy-on-write): el checkpoint se toma con mdma detenido en EX
+ROUND_TRIP_PROGRAM = """
+    lli x10, 0x10000
+    addi x0, x0, 0
+    addi x0, x0, 0
+    lw x1, 0(x10)
+    lw x7, 8(x10)
+    addi x0, x0, 0
+    addi x0, x0, 0
+    mdma x2, x1
+    mdma x2, x7
+    addi x0, x0, 0
+    addi x0, x0, 0
+    addi x0, x0, 0
+    sw x2, 8(x10)
+    addi x0, x0, 0
+"""
+
+
+def check_snapshot_after_unmap():
+    # snapshot -> unmap -> restore: la vista del snapshot no se libera con la region
+    memory = PagedMemory(MEMORY_SIZE)
+    memory.map_region(0x1000, b'ABCDEFGH')
+    state = memory.snapshot()
+    memory.unmap_region(0x1000)
+    first = PagedMemory.from_snapshot(state).read(0x1000, 8)
+    memory.clear()
+    second = PagedMemory.from_snapshot(state).read(0x1000, 8)
+    return first == second == b'ABCDEFGH'
+
+
+def check_snapshot_mutable_buffer():
+    # Un buffer mutable se copia: cambiarlo despues no altera el snapshot
+    buffer = bytearray(b'ABCDEFGH')
+    memory = PagedMemory(MEMORY_SIZE)
+    memory.map_region(0x1000, buffer)
+    state = memory.snapshot()
+    buffer[:] = b'ZZZZZZZZ'
+    return (PagedMemory.from_snapshot(state).read(0x1000, 8) == b'ABCDEFGH'
+            and memory.read(0x1000, 8) == b'ZZZZZZZZ')
+
+
+def _round_trip_pipeline(data_path):
+    pipeline = Simple_Pipeline(trace=False, memory=PagedMemory(MEMORY_SIZE))
+    pipeline.load_program(Assembler().assemble(ROUND_TRIP_PROGRAM))
+    FileLoader(pipeline.memory).map_file(data_path, DATA_BASE)
+    pipeline.registers[2:6] = [0x0123456789ABCDEF, 0xFEDCBA9876543210, 0x1111, 0x2222]
+    pipeline.vault.add_key(0x5555AAAA5555AAAA, name="respaldo")
+    return pipeline
+
+
+def _run(pipeline):
+    steps = 0
+    while pipeline.is_pipeline_active() and steps < MAX_STEPS:
+        pipeline.step()
+        steps += 1
+    return pipeline
+
+
+def check_checkpoint_round_trip():
+    # save -> load a mitad de un mdma detenido: el resultado es el de una
+    # ejecucion sin interrumpir, el archivo mapeado no va al checkpoint
+    with tempfile.TemporaryDirectory() as tmp:
+        data_path = os.path.join(tmp, "datos.bin")
+        with open(data_path, 'wb') as f:
+            f.write(os.urandom(64 * 1024))
+        expected = _run(_round_trip_pipeline(data_path))
+
+        pipeline = _round_trip_pipeline(data_path)
+        while not pipeline.ex_stall:
+            pipeline.step()
+        checkpoint_path = os.path.join(tmp, "estado.isac")
+        save_checkpoint(pipeline, checkpoint_path)
+        restored = _run(restore_checkpoint(checkpoint_path))
+
+        return (os.path.getsize(checkpoint_path) < 16 * 1024
+                and restored.registers == expected.registers
+                and restored.cycle == expected.cycle
+                and restored.memory.read(0, DATA_BASE + 64 * 1024) == expected.memory.read(0, DATA_BASE + 64 * 1024)
+                and restored.vault.index_of("respaldo") == expected.vault.index_of("respaldo")
+                and restored.vault.keys == expected.vault.keys)
+
+
+CASES = [
+    ("snapshot, unmap y restore", check_snapshot_after_unmap),
+    ("snapshot de un buffer mutable", check_snapshot_mutable_buffer),
+    ("checkpoint en disco ida y vuelta", check_checkpoint_round_trip),
+]
+
+
+def main():
+    print("Checkpoint test runner")
+    print("======================")
+
+    failures = 0
+    for name, check in CASES:
+        ok = check()
+        print(f"  {name}: {'OK' if ok else 'FALLO'}")
+        if not ok:
+            failures += 1
+
+    print("Coincide?", "SI" if failures == 0 else f"NO ({failures} fallos)")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
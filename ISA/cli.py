@@ -0,0 +1,225 @@
+# cli.py
+# ----------------------------------------------------------
+# Interfaz de linea de comandos sin interfaz grafica
+#
+# Uso (desde la raiz del repositorio):
+#   python -m ISA hash   archivo1 [archivo2 ...] [--tree] [--workers N] [--json]
+#   python -m ISA sign   archivo1 [archivo2 ...] [--key 0x...] [--tree [--index]]
+#                        [--detached | --in-place [--force]]
+#   python -m ISA verify firmado1 [firmado2 ...] [--key 0x...] [--cache RUTA]
+#   python -m ISA verify --detached original1 [original2 ...]   (usa original.sig)
+#   python -m ISA bench  [argumentos de benchmarks/run_benchmarks.py]
+#
+# Cada subcomando importa solo los modulos que necesita (nunca tkinter), de
+# modo que el arranque es corto: `hash` solo carga toymdma_hasher/tree_hash
+# y el simulador completo solo se importa para firmar o verificar.
+# ----------------------------------------------------------
+
+import argparse
+import os
+import sys
+
+DEFAULT_SUFFIX = '_signed.bin'
+DEFAULT_LEAF_SIZE = 1024 * 1024  # igual que tree_hash.DEFAULT_LEAF_SIZE (sin importarlo)
+
+
+def _parse_int(text):
+    return int(text, 0)
+
+
+# ----------------------------------------------------------
+# Trabajo por archivo (funciones de modulo: se pueden enviar a otros procesos)
+# ----------------------------------------------------------
+def _hash_one(path, mode, leaf_size, workers):
+    if mode == 'tree':
+        from tree_hash import hash_file_tree
+        result = hash_file_tree(path, leaf_size, workers)
+        del result["leaves"]
+    elif mode == 'pipeline':
+        from isa_pipeline_hash import ISAPipelineHashProcessor
+        result = ISAPipelineHashProcessor(functional=True).calculate_hash_components(path)
+    else:
+        from toymdma_hasher import hash_file
+        A, B, C, D = hash_file(path)
+        result = {"final_hash": A ^ B ^ C ^ D, "A": A, "B": B, "C": C, "D": D}
+    return dict(result, path=path)
+
+
+def _sign_one(path, output, key, tree, leaf_size, index, workers, placement='copy', force=False):
+    from isa_pipeline_hash import ISAPipelineHashProcessor
+    processor = ISAPipelineHashProcessor()
+    if placement == 'detached':
+        result = processor.create_detached_signature(path, output, key, tree, leaf_size, workers)
+        return dict(result, path=path, signed_file=result["sig_file"])
+    if placement == 'in-place':
+        result = processor.sign_in_place(path, key, tree, leaf_size, workers, index, force)
+        return dict(result, path=path)
+    if tree:
+        result = processor.create_signed_file_tree(path, output, key, leaf_size, workers, index)
+    else:
+        result = processor.create_signed_file(path, output, key)
+    return dict(result, path=path, signed_file=output)
+
+
+def _verify_one(path, key, cache_path, workers, detached=False):
+    from isa_pipeline_hash import ISAPipelineHashProcessor
+    processor = ISAPipelineHashProcessor()
+    if detached:
+        return dict(processor.verify_detached_signature(path, key=key, workers=workers), path=path)
+    if cache_path:
+        from verification_cache import VerificationCache
+        processor.verification_cache = VerificationCache(cache_path)
+    result = processor.verify_signed_file(path, key, workers=workers)
+    if processor.verification_cache is not None:
+        processor.verification_cache.close()
+    return dict(result, path=path)
+
+
+def _run_many(func, jobs, workers, tree):
+    """
+    Ejecuta `func` sobre cada tupla de `jobs`. Con varios archivos y workers > 1
+    se reparten los archivos entre procesos; en modo arbol los procesos ya se
+    usan dentro de cada archivo, asi que los archivos van en serie.
+    """
+    def safe(job):
+        try:
+            return func(*job)
+        except (OSError, ValueError, RuntimeError) as e:
+            return {"path": job[0], "error": str(e)}
+
+    if workers is None or workers <= 1 or len(jobs) < 2 or tree:
+        return [safe(job) for job in jobs]
+
+    from concurrent.futures import ProcessPoolExecutor
+    results = []
+    with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+        futures = [pool.submit(func, *job) for job in jobs]
+        for job, future in zip(jobs, futures):
+            try:
+                results.append(future.result())
+            except (OSError, ValueError, RuntimeError) as e:
+                results.append({"path": job[0], "error": str(e)})
+    return results
+
+
+# ----------------------------------------------------------
+# Subcomandos
+# ----------------------------------------------------------
+def cmd_hash(args):
+    mode = 'tree' if args.tree else args.mode
+    jobs = [(path, mode, args.leaf_size, args.workers) for path in args.paths]
+    return _run_many(_hash_one, jobs, args.workers, mode == 'tree')
+
+
+def cmd_sign(args):
+    if args.output and len(args.paths) > 1:
+        raise SystemExit("--output solo se puede usar con un archivo")
+    placement = 'detached' if args.detached else 'in-place' if args.in_place else 'copy'
+    if placement == 'copy':
+        outputs = [args.output or f"{path}{args.suffix}" for path in args.paths]
+    else:
+        outputs = [args.output] * len(args.paths)
+    jobs = [(path, output, args.key, args.tree, args.leaf_size, args.index, args.workers, placement,
+             args.force)
+            for path, output in zip(args.paths, outputs)]
+    return _run_many(_sign_one, jobs, args.workers, args.tree)
+
+
+def cmd_verify(args):
+    jobs = [(path, args.key, args.cache, args.workers, args.detached) for path in args.paths]
+    # SQLite no se comparte entre procesos: con cache se verifica en serie
+    return _run_many(_verify_one, jobs, args.workers, bool(args.cache))
+
+
+def _format_text(command, result):
+    path = result["path"]
+    if "error" in result:
+        return f"ERROR  {path}: {result['error']}"
+    if command == 'hash':
+        return f"{result['final_hash']:016X}  {path}"
+    if command == 'sign':
+        signature = ''.join(f"{s:016X}" for s in result["signature"])
+        return f"{signature}  {path} -> {result['signed_file']}"
+    status = 'VALIDA' if result["valid"] else 'INVALIDA'
+    extra = ' (cache)' if result.get("cached") else ''
+    return f"{status:<9}{path}{extra}"
+
+
+def _exit_code(command, results):
+    if any("error" in r for r in results):
+        return 2
+    if command == 'verify' and not all(r["valid"] for r in results):
+        return 1
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m ISA',
+                                     description="Hash, firma y verificacion ToyMDMA sin interfaz grafica")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    def common(p):
+        p.add_argument('paths', nargs='+', help="archivos a procesar")
+        p.add_argument('--workers', type=int, default=None,
+                       help="procesos: por archivo en modo arbol, entre archivos en otro caso")
+        p.add_argument('--json', action='store_true', help="salida JSON (una lista de resultados)")
+
+    p = sub.add_parser('hash', help="hash ToyMDMA de uno o varios archivos")
+    common(p)
+    p.add_argument('--mode', choices=('hasher', 'pipeline', 'tree'), default='hasher',
+                   help="hasher (rapido), pipeline (simulador ISA) o tree (Merkle)")
+    p.add_argument('--tree', action='store_true', help="equivale a --mode tree")
+    p.add_argument('--leaf-size', type=_parse_int, default=DEFAULT_LEAF_SIZE)
+
+    p = sub.add_parser('sign', help="crea <archivo>_signed.bin para cada archivo")
+    common(p)
+    p.add_argument('--key', type=_parse_int, default=None,
+                   help="llave de firma (por defecto la llave local del procesador)")
+    p.add_argument('--output', '-o', default=None, help="ruta del archivo firmado (un solo archivo)")
+    p.add_argument('--suffix', default=DEFAULT_SUFFIX)
+    p.add_argument('--tree', action='store_true', help="firma en modo arbol (Merkle)")
+    p.add_argument('--index', action='store_true', help="con --tree: incluye el indice Merkle")
+    p.add_argument('--leaf-size', type=_parse_int, default=DEFAULT_LEAF_SIZE)
+    placement = p.add_mutually_exclusive_group()
+    placement.add_argument('--detached', action='store_true',
+                           help="escribe solo <archivo>.sig (firma separada) sin copiar el documento")
+    placement.add_argument('--in-place', action='store_true',
+                           help="agrega la firma al final del propio archivo")
+    p.add_argument('--force', action='store_true',
+                   help="con --in-place: firma aunque el archivo ya este firmado")
+
+    p = sub.add_parser('verify', help="verifica uno o varios archivos firmados")
+    common(p)
+    p.add_argument('--key', type=_parse_int, default=None)
+    p.add_argument('--cache', default=None, help="archivo SQLite de cache de verificaciones")
+    p.add_argument('--detached', action='store_true',
+                   help="las rutas son originales con firma separada <archivo>.sig")
+
+    sub.add_parser('bench', help="suite de benchmarks (benchmarks/run_benchmarks.py)",
+                   add_help=False)
+    return parser
+
+
+COMMANDS = {'hash': cmd_hash, 'sign': cmd_sign, 'verify': cmd_verify}
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if argv[:1] == ['bench']:
+        from benchmarks import run_benchmarks
+        return run_benchmarks.main(argv[1:]) or 0
+
+    args = build_parser().parse_args(argv)
+    results = COMMANDS[args.command](args)
+    if args.json:
+        import json
+        print(json.dumps(results, indent=2))
+    else:
+        for result in results:
+            print(_format_text(args.command, result))
+    return _exit_code(args.command, results)
+
+
+if __name__ == '__main__':
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    sys.exit(main())
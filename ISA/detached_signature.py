@@ -0,0 +1,59 @@
+# detached_signature.py
+# ----------------------------------------------------------
+# Firma separada (.sig) para no copiar documentos grandes
+#
+# En lugar de escribir <archivo>_signed.bin (copia completa + firma), la
+# firma se guarda en un archivo pequeno junto al original, que no se toca:
+#
+#   magic 'MDMADSIG', version u16, modo u16 (0 encadenado, 1 arbol),
+#   indice de llave de la boveda i32 (-1 = llave local/explicita),
+#   tamano de hoja u32 (0 en modo encadenado), tamano del documento u64,
+#   firma S0..S3 (4 x u64)
+#
+# Todo little-endian, 60 bytes en total.
+# ----------------------------------------------------------
+
+import os
+import struct
+
+SIG_MAGIC = b'MDMADSIG'
+SIG_VERSION = 1
+
+MODE_CHAINED = 0
+MODE_TREE = 1
+MODE_NAMES = {MODE_CHAINED: 'chained', MODE_TREE: 'tree'}
+
+NO_KEY_INDEX = -1
+
+_SIG = struct.Struct('<8sHHiIQ4Q')
+SIG_FILE_SIZE = _SIG.size
+
+
+def default_sig_path(file_path):
+    return f"{file_path}.sig"
+
+
+def write_sig_file(sig_path, signature, mode, document_size, key_index=NO_KEY_INDEX, leaf_size=0):
+    """Escribe el archivo .sig (escritura atomica)."""
+    data = _SIG.pack(SIG_MAGIC, SIG_VERSION, mode, key_index, leaf_size, document_size, *signature)
+    tmp_path = f"{sig_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, sig_path)
+
+
+def read_sig_file(sig_path):
+    """Contenido de un archivo .sig como dict (ValueError si no es valido)."""
+    with open(sig_path, 'rb') as f:
+        data = f.read(SIG_FILE_SIZE + 1)
+    if len(data) != SIG_FILE_SIZE:
+        raise ValueError("Archivo de firma separada con tamano invalido")
+    magic, version, mode, key_index, leaf_size, size, *signature = _SIG.unpack(data)
+    if magic != SIG_MAGIC:
+        raise ValueError("No es un archivo de firma separada ToyMDMA")
+    if version != SIG_VERSION:
+        raise ValueError(f"Version de firma separada no soportada: {version}")
+    if mode not in MODE_NAMES or (mode == MODE_TREE and (leaf_size <= 0 or leaf_size % 8)):
+        raise ValueError("Archivo de firma separada corrupto")
+    return {"mode": MODE_NAMES[mode], "key_index": key_index, "leaf_size": leaf_size,
+            "document_size": size, "signature": tuple(signature)}
@@ -0,0 +1,263 @@
+# dma_engine.py
+# ----------------------------------------------------------
+# Dispositivo DMA mapeado en memoria para Simple_Pipeline
+#
+# El programa configura el dispositivo con sw/lw sobre sus registros y el
+# DMA copia bloques de una fuente del host (archivo o buffer) a un anillo
+# de la memoria simulada mientras el pipeline sigue ejecutando. El anillo
+# se divide en `RING_SIZE / CHUNK_SIZE` ranuras: al llenarse una ranura se
+# activa su bit en READY; el programa la consume y la libera escribiendo su
+# bit en ACK. Si la siguiente ranura aun no se libero, el DMA espera.
+#
+# Registros (64 bits, desplazamiento desde la base del dispositivo):
+#   0x00 SOURCE      fuente registrada con add_source() (indice)
+#   0x08 SRC_OFFSET  primer byte de la fuente
+#   0x10 DST         direccion del anillo (alineada a 8)
+#   0x18 RING_SIZE   bytes del anillo (multiplo de CHUNK_SIZE)
+#   0x20 CHUNK_SIZE  bytes por ranura (multiplo de 8)
+#   0x28 LENGTH      bytes a transferir (el ultimo bloque se rellena con ceros)
+#   0x30 CTRL        escritura: 1 = iniciar, 2 = detener y limpiar estado
+#   0x38 STATUS      lectura: bit0 ocupado, bit1 terminado, bit2 error
+#   0x40 READY       lectura: ranuras llenas (bit i = ranura i)
+#   0x48 ACK         escritura: libera las ranuras indicadas
+#   0x50 TRANSFERRED lectura: bytes ya escritos en el anillo
+#
+# La transferencia avanza `bytes_per_cycle` bytes por ciclo en palabras de
+# 8 bytes. Simple_Pipeline.step() llama a tick() una vez por ciclo y el modo
+# funcional lo llama al final de cada bloque con los ciclos del bloque.
+# ----------------------------------------------------------
+
+import math
+import os
+
+DMA_WINDOW = 0x60
+DEFAULT_DMA_BASE = 0xFFFF0000  # ultimo segmento de 64 KB de una PagedMemory de 4 GB
+DEFAULT_BYTES_PER_CYCLE = 8
+MAX_SLOTS = 64
+
+REG_SOURCE = 0x00
+REG_SRC_OFFSET = 0x08
+REG_DST = 0x10
+REG_RING_SIZE = 0x18
+REG_CHUNK_SIZE = 0x20
+REG_LENGTH = 0x28
+REG_CTRL = 0x30
+REG_STATUS = 0x38
+REG_READY = 0x40
+REG_ACK = 0x48
+REG_TRANSFERRED = 0x50
+
+CTRL_START = 0x1
+CTRL_RESET = 0x2
+
+STATUS_BUSY = 0x1
+STATUS_DONE = 0x2
+STATUS_ERROR = 0x4
+
+# Registros que el programa puede escribir directamente
+_CONFIG_REGISTERS = (REG_SOURCE, REG_SRC_OFFSET, REG_DST, REG_RING_SIZE, REG_CHUNK_SIZE, REG_LENGTH)
+
+# Bytes que se leen de un archivo fuente por acceso al disco
+_FILE_READ_AHEAD = 1024 * 1024
+
+
+class _FileSource:
+    """Fuente respaldada por un archivo del host, con lectura anticipada."""
+
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        self.size = os.fstat(self.file.fileno()).st_size
+        self.window_start = 0
+        self.window = b''
+
+    def read(self, offset, length):
+        end = offset + length
+        if not (self.window_start <= offset and end <= self.window_start + len(self.window)):
+            self.file.seek(offset)
+            self.window = self.file.read(max(length, _FILE_READ_AHEAD))
+            self.window_start = offset
+        start = offset - self.window_start
+        return self.window[start:start + length]
+
+    def close(self):
+        self.file.close()
+
+
+class _BufferSource:
+    """Fuente respaldada por un buffer en memoria (bytes, mmap, memoryview...)."""
+
+    def __init__(self, buffer):
+        self.view = memoryview(buffer).cast('B')
+        self.size = self.view.nbytes
+
+    def read(self, offset, length):
+        return self.view[offset:offset + length]
+
+    def close(self):
+        self.view.release()
+
+
+class DMAEngine:
+    def __init__(self, base, bytes_per_cycle=DEFAULT_BYTES_PER_CYCLE):
+        """
+        Args:
+            base: Direccion de los registros del dispositivo (alineada a 8)
+            bytes_per_cycle: Ancho de banda de la transferencia (puede ser fraccionario)
+        """
+        if base & 7:
+            raise ValueError("La base del DMA debe estar alineada a 8 bytes")
+        if bytes_per_cycle <= 0:
+            raise ValueError("bytes_per_cycle debe ser positivo")
+        self.base = base
+        self.end = base + DMA_WINDOW
+        self.bytes_per_cycle = bytes_per_cycle
+        self.pipeline = None
+        self.sources = []
+        self.registers = dict.fromkeys(_CONFIG_REGISTERS, 0)
+        # Estadisticas: ciclos transfiriendo y ciclos esperando una ranura libre
+        self.active_cycles = 0
+        self.stall_cycles = 0
+        self._reset_transfer()
+
+    def _reset_transfer(self):
+        self.status = 0
+        self.ready = 0
+        self.transferred = 0
+        self.total = 0
+        self.slot = 0
+        self.slot_fill = 0
+        self._budget = 0
+
+    # ----------------------------------------------------------
+    # Lado del host
+    # ----------------------------------------------------------
+    def add_source(self, source):
+        """Registra un archivo (ruta) o un buffer y devuelve su indice para SOURCE."""
+        if isinstance(source, (str, os.PathLike)):
+            self.sources.append(_FileSource(source))
+        else:
+            self.sources.append(_BufferSource(source))
+        return len(self.sources) - 1
+
+    def attach(self, pipeline):
+        if self.end > len(pipeline.memory):
+            raise ValueError(f"Los registros del DMA (0x{self.base:X}) quedan fuera de la memoria")
+        self.pipeline = pipeline
+
+    def close(self):
+        for source in self.sources:
+            source.close()
+        self.sources.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ----------------------------------------------------------
+    # Registros mapeados en memoria
+    # ----------------------------------------------------------
+    def read_register(self, offset):
+        if offset == REG_STATUS:
+            return self.status
+        if offset == REG_READY:
+            return self.ready
+        if offset == REG_TRANSFERRED:
+            return self.transferred
+        return self.registers.get(offset, 0)
+
+    def write_register(self, offset, value):
+        if offset in self.registers:
+            self.registers[offset] = value
+        elif offset == REG_CTRL:
+            if value & CTRL_RESET:
+                self._reset_transfer()
+            if value & CTRL_START:
+                self._start()
+        elif offset == REG_ACK:
+            self.ready &= ~value
+
+    def _start(self):
+        self._reset_transfer()
+        regs = self.registers
+        dst, ring, chunk = regs[REG_DST], regs[REG_RING_SIZE], regs[REG_CHUNK_SIZE]
+        valid = (regs[REG_SOURCE] < len(self.sources) and not dst & 7
+                 and chunk > 0 and not chunk & 7 and ring > 0 and not ring % chunk
+                 and ring // chunk <= MAX_SLOTS and dst + ring <= len(self.pipeline.memory))
+        if not valid:
+            self.status = STATUS_ERROR
+            return
+        self.total = (regs[REG_LENGTH] + 7) & ~7
+        self.status = STATUS_BUSY if self.total else STATUS_DONE
+
+    # ----------------------------------------------------------
+    # Transferencia
+    # ----------------------------------------------------------
+    def tick(self, cycles=1):
+        """
+        Avanza la transferencia `cycles` ciclos de reloj.
+
+        Un ciclo es activo si la transferencia puede avanzar, aunque con
+        bytes_per_cycle < 8 solo acumule ancho de banda para la siguiente
+        palabra; es de espera si la ranura siguiente aun no se libero. Los
+        ciclos posteriores al final no cuentan. tick(n) equivale a n llamadas
+        a tick(1) mientras el programa no escriba en ACK.
+        """
+        if not self.status & STATUS_BUSY:
+            return
+        regs = self.registers
+        chunk = regs[REG_CHUNK_SIZE]
+        slots = regs[REG_RING_SIZE] // chunk
+        start_budget = self._budget
+        budget = start_budget + cycles * self.bytes_per_cycle
+        moved = 0
+        blocked = False
+        while budget >= 8 and self.transferred < self.total:
+            if self.ready >> self.slot & 1:
+                blocked = True  # ranura aun no liberada por el programa
+                break
+            length = min(int(budget) & ~7, chunk - self.slot_fill, self.total - self.transferred)
+            self._copy(self.slot * chunk + self.slot_fill, self.transferred, length)
+            budget -= length
+            moved += length
+            self.transferred += length
+            self.slot_fill += length
+            if self.slot_fill == chunk or self.transferred == self.total:
+                self.ready |= 1 << self.slot
+                self.slot = (self.slot + 1) % slots
+                self.slot_fill = 0
+
+        done = self.transferred == self.total
+        # Sin presupuesto para otra palabra tambien se espera si la ranura esta ocupada
+        blocked = blocked or (not done and self.ready >> self.slot & 1)
+        if done or blocked:
+            # Ciclo en que se movio la ultima palabra (como con tick(1) repetido)
+            used = min(cycles, max(1, math.ceil((moved - start_budget) / self.bytes_per_cycle))) if moved else 0
+            self.active_cycles += used
+            if blocked:
+                self.stall_cycles += cycles - used
+            # El ancho de banda no usado mientras se espera una ranura no se acumula
+            self._budget = 0
+            if done:
+                self.status = STATUS_DONE
+        else:
+            self.active_cycles += cycles
+            self._budget = budget
+
+    def _copy(self, ring_offset, stream_offset, length):
+        regs = self.registers
+        source = self.sources[regs[REG_SOURCE]]
+        src_offset = regs[REG_SRC_OFFSET] + stream_offset
+        data = bytes(source.read(src_offset, max(0, min(length, source.size - src_offset))))
+        if len(data) < length:
+            data = data.ljust(length, b'\x00')
+        addr = regs[REG_DST] + ring_offset
+        pipeline = self.pipeline
+        pipeline.memory[addr:addr + length] = data
+        if pipeline.translator is not None:
+            pipeline.translator.notify_write(addr, length)
+
+    def stats(self):
+        return {"transferred": self.transferred, "active_cycles": self.active_cycles,
+                "stall_cycles": self.stall_cycles}
@@ -1,6 +1,8 @@
 
+import mmap
 import os
-from simple_pipeline import Simple_Pipeline, PipelinedRegister
+from paged_memory import DEFAULT_MEMORY_SIZE, PagedMemory
+from simple_pipeline import Simple_Pipeline
 
 class FileLoader:
     def __init__(self, memory, base_address=0):
@@ -8,7 +10,7 @@ class FileLoader:
         Inicializa el cargador de archivos
         
         Args:
-            memory: Referencia a la memoria del pipeline (bytearray)
+            memory: Referencia a la memoria del pipeline (bytearray o PagedMemory)
             base_address: Direccion base donde comenzar a cargar archivos
         """
         self.memory = memory
@@ -110,6 +112,43 @@ class FileLoader:
             
         return load_address, num_blocks, file_size
     
+    def map_file(self, file_path, target_address=None):
+        """
+        Mapea un archivo (mmap de solo lectura) como region de la memoria simulada
+        
+        No se copia el contenido: el programa ISA lee el archivo directamente y
+        solo las paginas en las que escribe se copian (copy-on-write). Requiere
+        que la memoria del pipeline sea una PagedMemory.
+        
+        Args:
+            file_path: Ruta al archivo a mapear
+            target_address: Direccion especifica donde mapear (opcional)
+            
+        Returns:
+            tuple: (direccion_inicio, tamano_bytes)
+        """
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(f"Archivo no encontrado: {file_path}")
+        if not hasattr(self.memory, 'map_region'):
+            raise TypeError("El mapeo de archivos requiere una memoria paginada (PagedMemory)")
+            
+        load_address = target_address if target_address is not None else self.current_address
+        file_size = os.path.getsize(file_path)
+        if load_address + file_size > len(self.memory):
+            raise MemoryError("Memoria insuficiente para mapear el archivo")
+            
+        # mmap no admite archivos vacios: no hay nada que adjuntar
+        if file_size > 0:
+            with open(file_path, 'rb') as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self.memory.map_region(load_address, mapped, (os.path.abspath(file_path), 0))
+            
+        if target_address is None:
+            # Mantener alineacion de 8 bytes para el siguiente archivo
+            self.current_address += (file_size + 7) & ~7
+            
+        return load_address, file_size
+    
     def save_memory_to_file(self, start_address, size, output_path):
         """
         Guarda contenido de memoria a un archivo
@@ -167,20 +206,10 @@ class FileLoader:
 
 # Integración con el pipeline existente
 class EnhancedPipeline(Simple_Pipeline):
-    def __init__(self, memory_size=1024 * 1024, trace=False):  # 1MB por defecto
-        # Extender memoria para archivos más grandes
-        self.memory = bytearray(memory_size)
-        self.registers = [0] * 32
-        self.pc = 0
-        self.cycle = 0
-        self.trace = trace
-        
-        # Pipeline registers
-        self.IF_ID = PipelinedRegister()
-        self.ID_EX = PipelinedRegister()
-        self.EX_MEM = PipelinedRegister()
-        self.MEM_WB = PipelinedRegister()
-        
+    def __init__(self, memory_size=DEFAULT_MEMORY_SIZE, trace=False):  # 4GB virtuales por defecto
+        # Memoria paginada: solo las paginas tocadas ocupan RAM
+        super().__init__(trace=trace, memory=PagedMemory(memory_size))
+
         # File loader integrado
         self.file_loader = FileLoader(self.memory, base_address=1024)  # Comenzar después del código
     
@@ -193,6 +222,19 @@ class EnhancedPipeline(Simple_Pipeline):
         """
         return self.file_loader.load_file_in_blocks(file_path, block_size=8, target_address=target_address)
     
+    def map_file_for_hashing(self, file_path, target_address=None):
+        """
+        Igual que load_file_for_hashing pero sin copiar el archivo (mmap)
+        
+        El ultimo bloque parcial se lee relleno con ceros porque la memoria
+        fuera de la region mapeada vale cero.
+        
+        Returns:
+            tuple: (start_address, num_blocks, file_size)
+        """
+        start_address, file_size = self.file_loader.map_file(file_path, target_address)
+        return start_address, (file_size + 7) // 8, file_size
+    
     def save_signed_file(self, original_start, original_size, signature_start, output_path):
         """
         Guarda un archivo firmado (archivo original + firma de 256 bits al final)
@@ -241,7 +283,7 @@ def demo_file_loading():
     """Demostración del uso del cargador de archivos"""
     
     # Crear pipeline mejorado
-    pipeline = EnhancedPipeline(memory_size=2 * 1024 * 1024)  # 2MB
+    pipeline = EnhancedPipeline()  # Espacio virtual de 4GB con memoria paginada
     
     # Crear archivo de prueba
     test_content = b"Este es un documento de prueba para firma digital. " * 10
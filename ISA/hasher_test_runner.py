@@ -0,0 +1,92 @@
+# hasher_test_runner.py
+# Runner de prueba para ToyMDMAHasher (update/copy/digest incremental)
+# Compara A, B, C, D del hasher contra calculate_hash_from_data
+
+import array
+import os
+import random
+import sys
+import tempfile
+from isa_pipeline_hash import ISAPipelineHashProcessor
+from toymdma_hasher import ToyMDMAHasher, hash_file, hash_file_with_prefix
+
+# Longitudes con bloques completos, parciales y bloques en cero
+DATA_LENGTHS = [1, 7, 8, 9, 15, 16, 64, 100, 333, 4096]
+
+
+def make_data(length, seed):
+    data = bytearray(os.urandom(length))
+    if seed % 2 == 0 and length >= 24:
+        data[8:24] = b'\x00' * 16
+    return bytes(data)
+
+
+def feed_in_pieces(hasher, data, rng):
+    """Entrega los datos en trozos aleatorios como vistas sin copia."""
+    view = memoryview(data)
+    pos = 0
+    while pos < len(data):
+        step = rng.randint(0, 19)
+        hasher.update(view[pos:pos + step])
+        pos += step
+
+
+def main():
+    print("ToyMDMAHasher test runner")
+    print("=========================")
+
+    processor = ISAPipelineHashProcessor(functional=True)
+    rng = random.Random(1234)
+    failures = 0
+    tmp_dir = tempfile.TemporaryDirectory()
+    for seed, length in enumerate(DATA_LENGTHS):
+        data = make_data(length, seed)
+        expected = processor.calculate_hash_from_data(data)
+        expected_abcd = tuple(expected[k] for k in ("A", "B", "C", "D"))
+
+        one_shot = ToyMDMAHasher(data)
+        pieces = ToyMDMAHasher()
+        feed_in_pieces(pieces, data, rng)
+
+        # copy(): hashear el prefijo una vez y continuar por separado
+        half = length // 2
+        prefix = ToyMDMAHasher(data[:half])
+        prefix_abcd = prefix.components()
+        forked = prefix.copy()
+        forked.update(data[half:])
+        prefix.update(b'\xff')  # no debe afectar a la copia
+
+        # Desde archivo: hash_file y, en la misma pasada, el prefijo
+        path = os.path.join(tmp_dir.name, f"datos{seed}.bin")
+        with open(path, 'wb') as f:
+            f.write(data)
+        file_prefix, file_abcd = hash_file_with_prefix(path, half)
+
+        checks = {
+            "update unico": one_shot.components(),
+            "trozos": pieces.components(),
+            "copy": forked.components(),
+            "hash_file": hash_file(path),
+            "con prefijo": file_abcd if file_prefix == prefix_abcd else None,
+        }
+        if length % 8 == 0:
+            # Entrada como array de palabras de 64 bits (otro formato de buffer)
+            checks["array('Q')"] = ToyMDMAHasher(array.array('Q', data)).components()
+        for name, got in checks.items():
+            ok = got == expected_abcd
+            print(f"  {length:5d} bytes, {name:<12}: {'OK' if ok else 'FALLO'}")
+            if not ok:
+                failures += 1
+                print(f"    esperado A..D: {[hex(v) for v in expected_abcd]}")
+                print(f"    obtenido A..D: {[hex(v) for v in got]}")
+        if one_shot.final_hash != expected["final_hash"]:
+            failures += 1
+            print(f"  {length:5d} bytes, final_hash: FALLO")
+
+    tmp_dir.cleanup()
+    print("Coincide?", "SI" if failures == 0 else f"NO ({failures} fallos)")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
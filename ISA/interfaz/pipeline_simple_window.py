@@ -4,6 +4,7 @@ import time
 from simple_pipeline import Simple_Pipeline
 from assembler import Assembler
 from isa_pipeline_hash import ISAPipelineHashProcessor
+from program_cache import get_default_cache
 from execution_statistics import ExecutionStatistics
 import os
 
@@ -14,9 +15,10 @@ class Simple_Pipeline_Window:
         self.create_widgets()
         self.segmentado = Simple_Pipeline()
         self.assembler = Assembler()
+        self.program_cache = get_default_cache()
         self.execution_stats = ExecutionStatistics()
-        # Pipeline ToyMDMA para hash
-        self.toymdma_instructions = self.assembler.assemble(ISAPipelineHashProcessor().create_toymdata_program())
+        # Pipeline ToyMDMA para hash (codigo ya codificado, desde la cache)
+        self.toymdma_instructions = self.program_cache.load(ISAPipelineHashProcessor().create_toymdata_program()).code
         self.start_time = None
         self.execution_time = 0
         self.cycle_time_ns = 10  # Suponiendo 10 ns por ciclo
@@ -140,10 +142,10 @@ class Simple_Pipeline_Window:
             self.assembly_text.delete("1.0", tk.END)
             self.assembly_text.insert(tk.END, assembly_code)
 
-            # Ensamblar y cargar programa en pipeline
-            machine_code = self.assembler.assemble(assembly_code)
-            self.segmentado.load_program(machine_code)
-            self.num_instructions = len(machine_code)
+            # Ensamblar (o recuperar de la cache) y cargar programa en pipeline
+            program = self.program_cache.load(assembly_code)
+            self.segmentado.load_program(program.code)
+            self.num_instructions = program.num_instructions
             self.output_text.insert(tk.END, f"Loaded {file_path} ({self.num_instructions} instructions).\n")
 
         except Exception as e:
@@ -1,19 +1,60 @@
 #!/usr/bin/env python3
 
 from assembler import Assembler
+import dma_engine
+from detached_signature import (MODE_CHAINED, MODE_TREE, default_sig_path, read_sig_file,
+                                write_sig_file)
+from paged_memory import PagedMemory
+from program_cache import get_default_cache
+from rekey import rekey_many
 from simple_pipeline import Simple_Pipeline
-from vault import Vault
+from toymdma_hasher import (READ_CHUNK, TOYMDMA_IV, ToyMDMAHasher, hash_file, hash_file_resumable,
+                            hash_file_with_prefix)
+from tree_hash import (DEFAULT_LEAF_SIZE, FLAG_INDEX, SIGNATURE_SIZE, hash_file_tree,
+                       leaves_for_range, merkle_levels, pack_footer, pack_index,
+                       read_footer, read_index, signed_file_size, tree_digest,
+                       _hash_leaf_range)
+from vault import Vault, key_fingerprint
+from verification_cache import NO_VAULT_INDEX, file_identity
 import time
 import os
+import shutil
+import struct
+
+
+DEFAULT_DMA_CHUNK = 1024  # bytes por ranura del anillo del kernel con DMA
 
 
 class ISAPipelineHashProcessor:
-    def __init__(self):
+    def __init__(self, functional=False):
+        """
+        Args:
+            functional: Ejecutar el kernel con bloques traducidos (mismo resultado,
+                        ciclos estimados) en lugar de simular ciclo a ciclo
+        """
         self.assembler = Assembler()
+        self.functional = functional
+        # Programas ya ensamblados (kernel ToyMDMA, reverse_hash.asm)
+        self.program_cache = get_default_cache()
         # default local private key (fallback). If a Vault is attached, prefer Vault keys.
         self.private_key = 0x123456789ABCDEF0
         self.pipeline = Simple_Pipeline(trace=False)
         self.program_loaded = False
+        # Cache opcional de veredictos (verification_cache.VerificationCache)
+        self.verification_cache = None
+
+    def _vault_index(self, key):
+        """
+        Indice de llave de un dict {'use_vault': True, ...}: 'vault_index' o,
+        con un keystore cargado, 'key_name' (busqueda por nombre en la boveda).
+        """
+        name = key.get('key_name')
+        if name is not None:
+            vault = getattr(self.pipeline, 'vault', None)
+            if vault is None or name not in vault.names:
+                raise KeyError(f"La boveda no tiene una llave con nombre '{name}'")
+            return vault.names[name]
+        return key.get('vault_index', 0)
 
     def _resolve_key(self, key):
 
@@ -22,7 +63,7 @@ class ISAPipelineHashProcessor:
 
         # request from vault
         if isinstance(key, dict) and key.get('use_vault', False):
-            vault_index = key.get('vault_index', 0)
+            vault_index = self._vault_index(key)
             if hasattr(self.pipeline, 'vault') and self.pipeline.vault is not None:
                 v = self.pipeline.vault
             else:
@@ -58,19 +99,31 @@ class ISAPipelineHashProcessor:
         data = self.load_file(file_path)
         return self.calculate_hash_from_data(data)
 
-    def calculate_hash_from_data(self, data):
-    # --- REINICIAR PIPELINE PARA VERIFICACION LIMPIA ---
+    def calculate_hash_resumable(self, file_path, state_path=None):
+        """
+        Hash ToyMDMA de archivos grandes que se puede reanudar si se interrumpe:
+        el estado (A, B, C, D, offset) se guarda periodicamente en `state_path`
+        (por defecto <archivo>.mdmastate). Ver toymdma_hasher.py.
+        """
+        return hash_file_resumable(file_path, state_path)
+
+    def _reset_pipeline(self):
+        # --- REINICIAR PIPELINE PARA VERIFICACION LIMPIA ---
         self.program_loaded = False
+        # La boveda (y su keystore) se conserva: solo se reinicia el pipeline
+        vault = self.pipeline.vault
         self.pipeline = Simple_Pipeline(trace=False)
+        if vault is not None:
+            self.pipeline.vault = vault
+
+    def calculate_hash_from_data(self, data):
+        self._reset_pipeline()
 
         blocks = [data[i:i+8] for i in range(0, len(data), 8)]
         if len(blocks[-1]) < 8:
             blocks[-1] = blocks[-1].ljust(8, b'\x00')
 
-        A = 0x0123456789ABCDEF
-        B = 0xFEDCBA9876543210
-        C = 0x1111111111111111
-        D = 0x2222222222222222
+        A, B, C, D = TOYMDMA_IV
 
         block_results = []
 
@@ -94,21 +147,27 @@ class ISAPipelineHashProcessor:
 
     def hash_block_with_isa(self, A, B, C, D, data_block):
         if not self.program_loaded:
-            program = self.assembler.assemble(self.create_toymdata_program())
-            self.pipeline.load_program(program)
+            kernel = self.program_cache.load(self.create_toymdata_program())
+            self.pipeline.load_program(kernel.code)
             self.program_loaded = True
 
+        # Reiniciar el PC al inicio del kernel: sin esto, a partir del segundo
+        # bloque el pipeline queda detenido en el NOP final y no ejecuta nada.
+        self.pipeline.pc = 0
         self.pipeline.registers[1] = data_block
         self.pipeline.registers[2] = A
         self.pipeline.registers[3] = B
         self.pipeline.registers[4] = C
         self.pipeline.registers[5] = D
 
-        steps = 0
         max_steps = 50
-        while self.pipeline.is_pipeline_active() and steps < max_steps:
-            self.pipeline.step()
-            steps += 1
+        if self.functional:
+            steps = self.pipeline.run_functional(max_instructions=max_steps)["cycles"]
+        else:
+            steps = 0
+            while self.pipeline.is_pipeline_active() and steps < max_steps:
+                self.pipeline.step()
+                steps += 1
 
         if steps >= max_steps:
             raise RuntimeError("Pipeline excedió 50 pasos")
@@ -127,11 +186,13 @@ class ISAPipelineHashProcessor:
         addi x7, x0, 0x7F4A
         addi x8, x0, 0xFFFB
         add x2, x2, x1
-        beq x1, x0, 16
+        beq x1, x0, skip_mul
         mul x3, x3, x1
+        skip_mul:
         xor x4, x4, x1
-        beq x5, x0, 16
-        modi x5, x5, 0xFFFFFFFB
+        beq x5, x0, skip_mod
+        modi x5, x5, 0x7FFFFFFB        # 0xFFFFFFFB truncado a 31 bits, como siempre se codifico
+        skip_mod:
         add x2, x2, x6
         xor x3, x3, x2
         add x4, x4, x3
@@ -139,6 +200,302 @@ class ISAPipelineHashProcessor:
         """
         return program
 
+    def create_toymdma_unrolled_program(self, unroll=4):
+        """
+        Kernel ToyMDMA en lazo, desenrollado `unroll` veces con .macro/.rept.
+
+        Convencion de registros (preparados por el llamador):
+          x10 = direccion de los datos, x11 = grupos de `unroll` bloques,
+          x12 = bloques sueltos restantes, x2..x5 = A, B, C, D.
+        Cada bloque ejecuta la misma secuencia que create_toymdata_program
+        (incluidas las lecturas de registro sin adelantamiento del pipeline),
+        por lo que el resultado coincide con el camino bloque a bloque.
+        """
+        program = f"""
+        # ToyMDMA desenrollado {unroll} veces
+        .equ UNROLL, {unroll}
+
+        .macro mdma_block
+            lw x1, 0(x10)
+            addi x10, x10, 8          # avanza el puntero (separa lw de su uso)
+            add x2, x2, x1
+            beq x1, x0, skip_mul\\@
+            mul x3, x3, x1
+        skip_mul\\@:
+            xor x4, x4, x1
+            beq x5, x0, skip_mod\\@
+            modi x5, x5, 0x7FFFFFFB        # 0xFFFFFFFB truncado a 31 bits, como siempre se codifico
+        skip_mod\\@:
+            add x2, x2, x6
+            xor x3, x3, x2
+            add x4, x4, x3
+            xor x5, x5, x4
+        .endm
+
+            addi x6, x0, 0x7C15
+            addi x7, x0, 0x7F4A
+            addi x8, x0, 0xFFFB
+            addi x13, x0, 1
+            beq x11, x0, tail
+        loop:
+        .rept UNROLL
+            mdma_block
+        .endr
+            sub x11, x11, x13
+            addi x0, x0, 0            # separa sub del beq que lee x11
+            beq x11, x0, tail
+            beq x0, x0, loop
+        tail:
+            beq x12, x0, done
+            mdma_block
+            sub x12, x12, x13
+            beq x0, x0, tail
+        done:
+            ebreak
+        """
+        return program
+
+    def create_toymdma_fused_program(self, unroll=4):
+        """
+        Variante del kernel desenrollado que usa la instruccion fusionada
+        `mdma x2, x1`: cada bloque es lw + addi + mdma en lugar de 11-13
+        instrucciones. Misma convencion de registros que
+        create_toymdma_unrolled_program y mismo resultado.
+        """
+        program = f"""
+        # ToyMDMA con la instruccion mdma, desenrollado {unroll} veces
+        .equ UNROLL, {unroll}
+
+        .macro mdma_block
+            lw x1, 0(x10)
+            addi x10, x10, 8          # separa lw de mdma, que lee x1 en EX
+            mdma x2, x1               # x2..x5 = ronda ToyMDMA(x2..x5, x1)
+        .endm
+
+            addi x13, x0, 1
+            beq x11, x0, tail
+        loop:
+        .rept UNROLL
+            mdma_block
+        .endr
+            sub x11, x11, x13
+            addi x0, x0, 0            # separa sub del beq que lee x11
+            beq x11, x0, tail
+            beq x0, x0, loop
+        tail:
+            beq x12, x0, done
+            mdma_block
+            sub x12, x12, x13
+            beq x0, x0, tail
+        done:
+            ebreak
+        """
+        return program
+
+    def calculate_hash_unrolled(self, data, unroll=4, fused=False, mdma_latency=None):
+        """
+        Calcula el hash ToyMDMA ejecutando el kernel desenrollado una sola vez
+        sobre los datos cargados en la memoria del pipeline.
+
+        Args:
+            fused: Usar el kernel con la instruccion mdma (create_toymdma_fused_program)
+            mdma_latency: Ciclos de EX de mdma en el modelo de tiempo (None = por defecto)
+        """
+        # El ultimo bloque parcial se lee relleno con ceros (memoria fuera de la region)
+        num_blocks = (len(data) + 7) // 8
+
+        if fused:
+            source = self.create_toymdma_fused_program(unroll)
+        else:
+            source = self.create_toymdma_unrolled_program(unroll)
+        kernel = self.program_cache.load(source)
+        pipeline = Simple_Pipeline(trace=False, memory=PagedMemory())
+        if mdma_latency is not None:
+            pipeline.mdma_latency = mdma_latency
+        pipeline.load_program(kernel.code)
+        # Datos despues del codigo y del NOP que marca su final, adjuntos sin copia
+        data_base = kernel.code.nbytes + 8
+        pipeline.memory.map_region(data_base, data)
+
+        pipeline.registers[10] = data_base
+        pipeline.registers[11] = num_blocks // unroll
+        pipeline.registers[12] = num_blocks % unroll
+        pipeline.registers[2:6] = TOYMDMA_IV
+
+        max_steps = 64 + num_blocks * (32 + pipeline.mdma_latency)
+        if self.functional:
+            steps = pipeline.run_functional(max_instructions=max_steps)["cycles"]
+        else:
+            steps = 0
+            while pipeline.is_pipeline_active() and steps < max_steps:
+                pipeline.step()
+                steps += 1
+        if steps >= max_steps:
+            raise RuntimeError("Pipeline excedió el limite de pasos del kernel desenrollado")
+
+        A, B, C, D = (r & 0xFFFFFFFFFFFFFFFF for r in pipeline.registers[2:6])
+        return {
+            "final_hash": A ^ B ^ C ^ D,
+            "A": A, "B": B, "C": C, "D": D,
+            "steps": steps,
+        }
+
+    def create_toymdma_dma_program(self, chunk_size=DEFAULT_DMA_CHUNK):
+        """
+        Kernel ToyMDMA alimentado por el DMA (dma_engine.py) con doble buffer.
+
+        El programa configura el DMA para llenar un anillo de dos ranuras de
+        `chunk_size` bytes y consume una ranura mientras el DMA llena la otra.
+        Registros preparados por el llamador:
+          x20 = base del DMA, x19 = anillo, x14 = tamano del anillo,
+          x15 = bytes a leer, x11 = ranuras completas, x12 = bloques de la
+          ultima ranura parcial, x2..x5 = A, B, C, D.
+        Si el DMA rechaza la configuracion (bit de error en STATUS), el
+        programa termina sin hashear nada.
+        """
+        program = f"""
+        # ToyMDMA con entrada por DMA y doble buffer
+        .equ CHUNK, {chunk_size}
+        .equ CHUNK_BLOCKS, {chunk_size // 8}
+        .equ DMA_SOURCE, {dma_engine.REG_SOURCE}
+        .equ DMA_SRC_OFFSET, {dma_engine.REG_SRC_OFFSET}
+        .equ DMA_DST, {dma_engine.REG_DST}
+        .equ DMA_RING_SIZE, {dma_engine.REG_RING_SIZE}
+        .equ DMA_CHUNK_SIZE, {dma_engine.REG_CHUNK_SIZE}
+        .equ DMA_LENGTH, {dma_engine.REG_LENGTH}
+        .equ DMA_CTRL, {dma_engine.REG_CTRL}
+        .equ DMA_STATUS, {dma_engine.REG_STATUS}
+        .equ STATUS_ERROR, {dma_engine.STATUS_ERROR}
+        .equ DMA_READY, {dma_engine.REG_READY}
+        .equ DMA_ACK, {dma_engine.REG_ACK}
+
+        .macro mdma_block
+            lw x1, 0(x10)
+            addi x10, x10, 8          # separa lw de mdma, que lee x1 en EX
+            mdma x2, x1
+        .endm
+
+        # Espera a que la ranura de la mascara x22 este llena
+        .macro wait_slot
+        wait\@:
+            lw x16, DMA_READY(x20)
+            addi x0, x0, 0
+            and x17, x16, x22
+            addi x0, x0, 0
+            beq x17, x0, wait\@
+        .endm
+
+            # Configurar el DMA: fuente 0 desde su primer byte
+            addi x21, x0, CHUNK
+            sw x0, DMA_SOURCE(x20)
+            sw x0, DMA_SRC_OFFSET(x20)
+            sw x19, DMA_DST(x20)
+            sw x14, DMA_RING_SIZE(x20)
+            sw x21, DMA_CHUNK_SIZE(x20)
+            sw x15, DMA_LENGTH(x20)
+            addi x22, x0, 1           # CTRL_START y mascara de la ranura 0
+            addi x23, x0, 3           # xor con 3 alterna las mascaras 1 y 2
+            addi x13, x0, 1
+            sw x22, DMA_CTRL(x20)
+            lw x16, DMA_STATUS(x20)
+            addi x24, x0, STATUS_ERROR
+            addi x10, x19, 0          # puntero de lectura en el anillo
+            and x17, x16, x24
+            addi x0, x0, 0
+            beq x17, x0, started
+            beq x0, x0, done          # configuracion rechazada: ninguna ranura se llenara
+        started:
+            beq x11, x0, last
+        chunk:
+            wait_slot
+        .rept CHUNK_BLOCKS
+            mdma_block
+        .endr
+            sw x22, DMA_ACK(x20)      # libera la ranura: el DMA puede volver a llenarla
+            xor x22, x22, x23
+            sub x11, x11, x13
+            addi x0, x0, 0
+            beq x22, x13, wrap
+            beq x0, x0, next
+        wrap:
+            addi x10, x19, 0          # de vuelta a la ranura 0
+        next:
+            beq x11, x0, last
+            beq x0, x0, chunk
+        last:
+            beq x12, x0, done
+            wait_slot
+        tail:
+            mdma_block
+            sub x12, x12, x13
+            addi x0, x0, 0
+            beq x12, x0, ack_last
+            beq x0, x0, tail
+        ack_last:
+            sw x22, DMA_ACK(x20)
+        done:
+            ebreak
+        """
+        return program
+
+    def calculate_hash_dma(self, source, chunk_size=DEFAULT_DMA_CHUNK,
+                           bytes_per_cycle=dma_engine.DEFAULT_BYTES_PER_CYCLE, mdma_latency=None):
+        """
+        Calcula el hash ToyMDMA de un archivo (ruta) o buffer que el propio
+        programa lee a traves del DMA, sin copiar los datos a la memoria
+        simulada desde Python.
+
+        Returns:
+            dict: A..D, final_hash, steps (ciclos) y estadisticas del DMA
+        """
+        if chunk_size <= 0 or chunk_size % 8:
+            raise ValueError("chunk_size debe ser un multiplo positivo de 8")
+        size = os.path.getsize(source) if isinstance(source, (str, os.PathLike)) else memoryview(source).nbytes
+        num_blocks = (size + 7) // 8
+        chunk_blocks = chunk_size // 8
+
+        kernel = self.program_cache.load(self.create_toymdma_dma_program(chunk_size))
+        pipeline = Simple_Pipeline(trace=False, memory=PagedMemory())
+        if mdma_latency is not None:
+            pipeline.mdma_latency = mdma_latency
+        pipeline.load_program(kernel.code)
+        # El anillo empieza en la primera pagina libre despues del codigo
+        ring = (kernel.code.nbytes + 8 + 4095) & ~4095
+
+        with dma_engine.DMAEngine(dma_engine.DEFAULT_DMA_BASE, bytes_per_cycle) as dma:
+            dma.add_source(source)
+            pipeline.attach_device(dma)
+            pipeline.registers[20] = dma.base
+            pipeline.registers[19] = ring
+            pipeline.registers[14] = 2 * chunk_size
+            pipeline.registers[15] = size
+            pipeline.registers[11] = num_blocks // chunk_blocks
+            pipeline.registers[12] = num_blocks % chunk_blocks
+            pipeline.registers[2:6] = TOYMDMA_IV
+
+            # Cota holgada: la espera activa al DMA tambien consume ciclos
+            max_steps = 256 + num_blocks * (32 + pipeline.mdma_latency + int(64 / bytes_per_cycle))
+            if self.functional:
+                steps = pipeline.run_functional(max_instructions=max_steps)["cycles"]
+            else:
+                steps = 0
+                while pipeline.is_pipeline_active() and steps < max_steps:
+                    pipeline.step()
+                    steps += 1
+            if dma.status & dma_engine.STATUS_ERROR:
+                raise RuntimeError("El DMA rechazo la configuracion de la transferencia (STATUS.error)")
+            if steps >= max_steps:
+                raise RuntimeError("Pipeline excedió el limite de pasos del kernel con DMA")
+            stats = dma.stats()
+
+        A, B, C, D = (r & 0xFFFFFFFFFFFFFFFF for r in pipeline.registers[2:6])
+        return {
+            "final_hash": A ^ B ^ C ^ D,
+            "A": A, "B": B, "C": C, "D": D,
+            "steps": steps,
+            "dma": stats,
+        }
+
     # --- FIRMA ---
     def sign_hash(self, A, B, C, D, key=None):
         k = self._resolve_key(key)
@@ -182,16 +539,13 @@ class ISAPipelineHashProcessor:
                 signature[2] ^ k == C and
                 signature[3] ^ k == D)
 
-    # --- CREAR ARCHIVO FIRMADO ---
-    def create_signed_file(self, original_file, signed_file, key=None):
-        # By default sign with local private_key. If key is a dict with
-        # {'use_vault': True, 'vault_index': n} then request signature from the vault.
-        hash_info = self.calculate_hash_components(original_file)
+    def _sign_components(self, A, B, C, D, key=None):
+        """Firma A..D con la boveda o con la llave local. Devuelve (firma, llave usada)."""
         use_vault = False
         vault_index = 0
         if isinstance(key, dict):
             use_vault = key.get('use_vault', False)
-            vault_index = key.get('vault_index', 0)
+            vault_index = self._vault_index(key)
 
         # If no key specified but a Vault is attached to the pipeline, prefer using the Vault
         if key is None and hasattr(self.pipeline, 'vault') and self.pipeline.vault is not None:
@@ -199,33 +553,388 @@ class ISAPipelineHashProcessor:
             vault_index = 0
 
         if use_vault:
-            signature = self.sign_hash_with_vault(hash_info["A"], hash_info["B"], hash_info["C"], hash_info["D"], vault_index)
-            private_key_used = None
-        else:
-            signature = self.sign_hash(hash_info["A"], hash_info["B"], hash_info["C"], hash_info["D"], key)
-            private_key_used = key if key is not None else self.private_key
-        original_data = self.load_file(original_file)
+            return self.sign_hash_with_vault(A, B, C, D, vault_index), None
+        return self.sign_hash(A, B, C, D, key), key if key is not None else self.private_key
+
+    # --- CREAR ARCHIVO FIRMADO ---
+    def create_signed_file(self, original_file, signed_file, key=None, isa_hash=False):
+        """
+        Crea `signed_file` = documento + firma (32 bytes) en una sola pasada:
+        cada bloque leido se hashea y se copia a un archivo temporal, que se
+        renombra de forma atomica al final. La memoria usada es un buffer de
+        READ_CHUNK bytes, sin importar el tamano del documento.
+
+        La llave se resuelve como en _sign_components (llave local, entero o
+        {'use_vault': True, 'vault_index': n}). Con isa_hash=True los bloques se hashean con el kernel en el pipeline
+        (mismo resultado, mucho mas lento).
+        """
+        hasher = _ISAStreamHasher(self) if isa_hash else ToyMDMAHasher()
+        tmp_path = f"{signed_file}.{os.getpid()}.tmp"
+        try:
+            with open(original_file, 'rb') as src, open(tmp_path, 'wb') as dst:
+                buffer = bytearray(max(1, min(READ_CHUNK, os.fstat(src.fileno()).st_size)))
+                view = memoryview(buffer)
+                file_size = 0
+                while True:
+                    read = src.readinto(buffer)
+                    if not read:
+                        break
+                    hasher.update(view[:read])
+                    dst.write(view[:read])
+                    file_size += read
+                A, B, C, D = hasher.components()
+                signature, private_key_used = self._sign_components(A, B, C, D, key)
+                dst.write(struct.pack('<4Q', *signature))
+            os.replace(tmp_path, signed_file)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+        return {
+            "signed_file": signed_file,
+            "signature": signature,
+            "hash_components": {"A": A, "B": B, "C": C, "D": D},
+            "file_size": file_size,
+            "private_key_used": private_key_used
+        }
 
-        with open(signed_file, 'wb') as f:
-            f.write(original_data)
-            for s in signature:
-                f.write(s.to_bytes(8, 'little'))
+    # --- ROTACION DE LLAVES ---
+    def rekey_many(self, paths, old_index, new_index, workers=None, **options):
+        """
+        Cambia en su lugar la llave de firma de varios archivos, de la llave
+        `old_index` a `new_index` de la boveda (indices o nombres). Solo se
+        reescriben los 32 bytes de la firma; ver rekey.py para el diario y las
+        opciones (journal_path, batch_size, fsync, verify).
+        """
+        vault = getattr(self.pipeline, 'vault', None)
+        if vault is None:
+            raise ValueError("Rotar llaves requiere una boveda en el pipeline")
+        keys = []
+        for index in (old_index, new_index):
+            if isinstance(index, str):
+                index = self._vault_index({'key_name': index})
+            if not 0 <= index < len(vault.keys):
+                raise IndexError(f"Indice de llave fuera de rango: {index}")
+            keys.append(vault.keys[index])
+        return rekey_many(list(paths), keys[0], keys[1], workers=workers, **options)
+
+    # --- MODO ARBOL (MERKLE) ---
+    def create_signed_file_tree(self, original_file, signed_file, key=None,
+                                leaf_size=DEFAULT_LEAF_SIZE, workers=None, index=False):
+        """
+        Firma en modo arbol: las hojas se hashean en paralelo (`workers` procesos)
+        y el archivo lleva un pie 'MDMATREE' que lo distingue del modo encadenado.
+        Con index=True se guardan tras la firma los digests de las hojas para
+        poder verificar rangos con verify_range.
+        """
+        tree = hash_file_tree(original_file, leaf_size, workers)
+        signature, private_key_used = self._sign_components(
+            tree["A"], tree["B"], tree["C"], tree["D"], key)
+
+        # Archivo temporal + rename: una interrupcion no deja un archivo sin pie
+        tmp_path = f"{signed_file}.{os.getpid()}.tmp"
+        try:
+            with open(original_file, 'rb') as src, open(tmp_path, 'wb') as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+                dst.write(self._tree_trailer(signature, tree, index))
+            os.replace(tmp_path, signed_file)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
 
         return {
             "signed_file": signed_file,
             "signature": signature,
-            "hash_components": {"A": hash_info["A"], "B": hash_info["B"], "C": hash_info["C"], "D": hash_info["D"]},
-            "file_size": len(original_data),
+            "hash_components": {"A": tree["A"], "B": tree["B"], "C": tree["C"], "D": tree["D"]},
+            "file_size": tree["size"],
+            "leaf_size": leaf_size,
+            "num_leaves": len(tree["leaves"]),
             "private_key_used": private_key_used
         }
 
+    def _tree_trailer(self, signature, tree, index=False):
+        """Bytes tras el documento en modo arbol: firma, indice opcional y pie."""
+        trailer = struct.pack('<4Q', *signature)
+        if index:
+            trailer += pack_index(tree["leaves"])
+        return trailer + pack_footer(tree["size"], tree["leaf_size"], FLAG_INDEX if index else 0)
+
+    # --- FIRMA SEPARADA (.sig) Y FIRMA EN EL MISMO ARCHIVO ---
+    def _file_components(self, file_path, tree, leaf_size, workers, limit=None):
+        """(A, B, C, D, tamano, arbol o None) del documento, en modo encadenado o arbol."""
+        if tree:
+            result = hash_file_tree(file_path, leaf_size, workers, limit)
+            return result["A"], result["B"], result["C"], result["D"], result["size"], result
+        size = os.path.getsize(file_path) if limit is None else limit
+        return (*hash_file(file_path, limit), size, None)
+
+    def create_detached_signature(self, original_file, sig_path=None, key=None, tree=False,
+                                  leaf_size=DEFAULT_LEAF_SIZE, workers=None):
+        """
+        Firma `original_file` sin copiarlo: la firma, el modo, el indice de llave
+        y el tamano del documento van a un archivo .sig de 60 bytes
+        (por defecto <archivo>.sig). El original no se modifica.
+        """
+        sig_path = sig_path or default_sig_path(original_file)
+        A, B, C, D, size, _ = self._file_components(original_file, tree, leaf_size, workers)
+        signature, private_key_used = self._sign_components(A, B, C, D, key)
+        key_index = self._key_vault_index(key)
+        write_sig_file(sig_path, signature, MODE_TREE if tree else MODE_CHAINED, size,
+                       key_index, leaf_size if tree else 0)
+        return {
+            "sig_file": sig_path,
+            "signature": signature,
+            "hash_components": {"A": A, "B": B, "C": C, "D": D},
+            "file_size": size,
+            "mode": "tree" if tree else "chained",
+            "key_index": key_index,
+            "private_key_used": private_key_used
+        }
+
+    def verify_detached_signature(self, original_file, sig_path=None, key=None, workers=None):
+        """
+        Verifica `original_file` contra su .sig rehasheando el documento. Si no
+        se indica `key` y el .sig registra un indice de la boveda, se usa esa llave.
+        """
+        sig_path = sig_path or default_sig_path(original_file)
+        info = read_sig_file(sig_path)
+        if key is None and info["key_index"] != NO_VAULT_INDEX and getattr(self.pipeline, 'vault', None) is not None:
+            key = {'use_vault': True, 'vault_index': info["key_index"]}
+        result = {
+            "valid": False,
+            "mode": info["mode"],
+            "sig_file": sig_path,
+            "signature": info["signature"],
+            "document_size": info["document_size"],
+            "key_index": info["key_index"],
+        }
+        if os.path.getsize(original_file) != info["document_size"]:
+            result["reason"] = "El tamano del documento no coincide con la firma"
+            return result
+        A, B, C, D, _, _ = self._file_components(original_file, info["mode"] == "tree",
+                                                 info["leaf_size"], workers)
+        result["valid"] = self.verify_signature(info["signature"], A, B, C, D, key)
+        result["hash_components"] = {"A": A, "B": B, "C": C, "D": D}
+        return result
+
+    def sign_in_place(self, file_path, key=None, tree=False, leaf_size=DEFAULT_LEAF_SIZE,
+                      workers=None, index=False, force=False):
+        """
+        Agrega la firma al final de `file_path` (sin copia): el archivo queda
+        igual que un _signed.bin (encadenado, o en modo arbol con su pie) y se
+        verifica con verify_signed_file.
+
+        Un archivo que ya tiene pie MDMATREE o una firma final valida con esta
+        llave se rechaza: firmarlo otra vez firmaria el archivo firmado.
+        force=True lo firma igualmente.
+        """
+        if not force and read_footer(file_path) is not None:
+            raise ValueError("El archivo ya esta firmado en modo arbol (pie MDMATREE)")
+        size = os.path.getsize(file_path)
+        prefix = size - SIGNATURE_SIZE if not force and size >= SIGNATURE_SIZE else None
+        prefix_components = None
+        if tree:
+            A, B, C, D, size, tree_info = self._file_components(file_path, tree, leaf_size, workers)
+            prefix_components = hash_file(file_path, prefix) if prefix is not None else None
+        else:
+            # Encadenado: el prefijo sin la posible firma sale de la misma pasada
+            tree_info = None
+            if prefix is not None:
+                prefix_components, (A, B, C, D) = hash_file_with_prefix(file_path, prefix, size)
+            else:
+                A, B, C, D = hash_file(file_path, size)
+        if prefix_components is not None and self._has_trailing_signature(file_path, prefix, prefix_components, key):
+            raise ValueError("El archivo ya termina en una firma valida con esta llave")
+        signature, private_key_used = self._sign_components(A, B, C, D, key)
+        trailer = (self._tree_trailer(signature, tree_info, index) if tree
+                   else struct.pack('<4Q', *signature))
+        with open(file_path, 'r+b') as f:
+            # Escribir desde el tamano hasheado: si el archivo crecio, se rechaza
+            if os.fstat(f.fileno()).st_size != size:
+                raise ValueError("El archivo cambio mientras se calculaba su firma")
+            f.seek(size)
+            f.write(trailer)
+            f.flush()
+            os.fsync(f.fileno())
+        return {
+            "signed_file": file_path,
+            "signature": signature,
+            "hash_components": {"A": A, "B": B, "C": C, "D": D},
+            "file_size": size,
+            "mode": "tree" if tree else "chained",
+            "private_key_used": private_key_used
+        }
+
+    def _has_trailing_signature(self, file_path, document_size, components, key):
+        """True si los 32 bytes tras `document_size` firman `components` con `key`."""
+        with open(file_path, 'rb') as f:
+            f.seek(document_size)
+            signature = struct.unpack('<4Q', f.read(SIGNATURE_SIZE))
+        if key is None and getattr(self.pipeline, 'vault', None) is not None:
+            key = {'use_vault': True, 'vault_index': 0}
+        return self.verify_signature(signature, *components, key)
+
+    def verify_signed_file_tree(self, signed_file, key=None, workers=None):
+        """Verifica un archivo firmado en modo arbol rehasheando el documento."""
+        footer = read_footer(signed_file)
+        if footer is None:
+            raise ValueError("El archivo no esta firmado en modo arbol (falta el pie MDMATREE)")
+        document_size = footer["document_size"]
+        signature = self._read_tree_signature(signed_file, footer)
+
+        tree = hash_file_tree(signed_file, footer["leaf_size"], workers, limit=document_size)
+        valid = self.verify_signature(signature, tree["A"], tree["B"], tree["C"], tree["D"],
+                                      self._tree_verify_key(key))
+        result = {
+            "valid": valid,
+            "mode": "tree",
+            "signature": signature,
+            "hash_components": {"A": tree["A"], "B": tree["B"], "C": tree["C"], "D": tree["D"]},
+            "document_size": document_size,
+            "leaf_size": footer["leaf_size"],
+            "num_leaves": footer["num_leaves"],
+        }
+        if footer["flags"] & FLAG_INDEX:
+            result["index_valid"] = read_index(signed_file, footer) == tree["leaves"]
+        return result
+
+    def verify_range(self, signed_file, offset, length, key=None):
+        """
+        Verifica solo las hojas que cubren [offset, offset+length) de un archivo
+        firmado en modo arbol con indice Merkle. La firma se comprueba contra la
+        raiz recalculada desde el indice y cada hoja leida contra su entrada.
+        """
+        footer = read_footer(signed_file)
+        if footer is None:
+            raise ValueError("El archivo no esta firmado en modo arbol (falta el pie MDMATREE)")
+        signature = self._read_tree_signature(signed_file, footer)
+        leaves = read_index(signed_file, footer)
+        leaf_size = footer["leaf_size"]
+        document_size = footer["document_size"]
+
+        A, B, C, D = tree_digest(merkle_levels(leaves)[-1][0], document_size, leaf_size)
+        index_valid = self.verify_signature(signature, A, B, C, D, self._tree_verify_key(key))
+
+        checked = leaves_for_range(offset, length, leaf_size, document_size)
+        bad_leaves = []
+        if index_valid and len(checked):
+            digests = _hash_leaf_range(signed_file, leaf_size, checked.start, len(checked),
+                                       document_size)
+            bad_leaves = [i for i, digest in zip(checked, digests) if leaves[i] != digest]
+        return {
+            "valid": index_valid and not bad_leaves,
+            "index_valid": index_valid,
+            "offset": offset,
+            "length": length,
+            "leaves_checked": list(checked),
+            "bad_leaves": bad_leaves,
+            "bytes_hashed": sum(min(leaf_size, document_size - i * leaf_size) for i in checked),
+        }
+
+    def _read_tree_signature(self, signed_file, footer):
+        if signed_file_size(footer) != footer["file_size"]:
+            raise ValueError("Archivo firmado en modo arbol con tamano inconsistente")
+        with open(signed_file, 'rb') as f:
+            f.seek(footer["document_size"])
+            raw = f.read(SIGNATURE_SIZE)
+        return tuple(int.from_bytes(raw[i*8:(i+1)*8], 'little') for i in range(4))
+
+    def _tree_verify_key(self, key):
+        # Misma politica que _sign_components: sin llave se usa la boveda si existe
+        if key is None and hasattr(self.pipeline, 'vault') and self.pipeline.vault is not None:
+            return {'use_vault': True, 'vault_index': 0}
+        return key
+
     # --- VERIFICAR ARCHIVO FIRMADO ---
-    def verify_signed_file(self, signed_file, key=None):
+    def verify_signed_file(self, signed_file, key=None, mode='rehash', workers=None):
         """
         Verifica un archivo firmado. Si `key` es un dict con {'use_vault': True, 'vault_index': n}
-        la verificacion pedira a la boveda que produzca la firma esperada y la comparara.
-        Si no, se usa la llave local (o proporcionada) para invertir la firma y comparar.
+        se usa esa llave de la boveda; si no, la llave local (o proporcionada).
+        Los archivos firmados en modo arbol (pie MDMATREE) se delegan a
+        verify_signed_file_tree, con `workers` procesos.
+
+        mode='rehash' (por defecto) recalcula A..D del documento en una sola
+        pasada en streaming y los compara con la firma invertida. mode='reverse'
+        conserva el programa reverse_hash.asm, que solo recupera A..D de la
+        firma en el pipeline y no lee el documento.
+
+        Con verification_cache asignada, un archivo sin cambios verificado antes
+        con la misma llave devuelve el veredicto guardado (con "cached": True).
+        Ese resultado solo trae valid, document_size, mode y vault_verification:
+        la cache no guarda la llave, la firma ni A..D.
         """
+        cache = self.verification_cache
+        if cache is None or mode != 'rehash':
+            return self._verify_signed_file(signed_file, key, mode, workers)
+        vault_index, fingerprint = self._verification_key(key)
+        result = cache.get(signed_file, vault_index, fingerprint)
+        if result is not None:
+            result["cached"] = True
+            return result
+        # Identidad previa: si el archivo cambia durante el rehash no se guarda
+        try:
+            identity = file_identity(signed_file)
+        except OSError:
+            identity = None
+        result = self._verify_signed_file(signed_file, key, mode, workers)
+        if identity is not None:
+            cache.put(signed_file, vault_index, fingerprint, result, identity)
+        result["cached"] = False
+        return result
+
+    def _key_vault_index(self, key):
+        """Indice de la boveda que usaria `key` (NO_VAULT_INDEX si no usa la boveda)."""
+        if isinstance(key, dict) and key.get('use_vault', False):
+            return self._vault_index(key)
+        if key is None and getattr(self.pipeline, 'vault', None) is not None:
+            return 0
+        return NO_VAULT_INDEX
+
+    def _verification_key(self, key):
+        """(indice de boveda, huella de la llave) con la que se verificaria `key`."""
+        return self._key_vault_index(key), key_fingerprint(self._resolve_key(key))
+
+    def _verify_signed_file(self, signed_file, key=None, mode='rehash', workers=None):
+        if read_footer(signed_file) is not None:
+            return self.verify_signed_file_tree(signed_file, key, workers)
+        if mode == 'rehash':
+            return self._verify_signed_file_rehash(signed_file, key)
+        if mode != 'reverse':
+            raise ValueError(f"Modo de verificacion desconocido: {mode}")
+        return self._verify_signed_file_reverse(signed_file, key)
+
+    def _verify_signed_file_rehash(self, signed_file, key=None):
+        """Rehashea el documento (memoria acotada) y compara con la firma final."""
+        size = os.path.getsize(signed_file)
+        if size < SIGNATURE_SIZE:
+            raise ValueError("Archivo demasiado pequeno para contener firma")
+        document_size = size - SIGNATURE_SIZE
+        with open(signed_file, 'rb') as f:
+            f.seek(document_size)
+            signature = struct.unpack('<4Q', f.read(SIGNATURE_SIZE))
+        # Un error de lectura o un archivo truncado interrumpe el hash de inmediato
+        A, B, C, D = hash_file(signed_file, document_size)
+
+        if key is None and getattr(self.pipeline, 'vault', None) is not None:
+            key = {'use_vault': True, 'vault_index': 0}
+        use_vault = isinstance(key, dict) and key.get('use_vault', False)
+        return {
+            "valid": self.verify_signature(signature, A, B, C, D, key),
+            "signature": signature,
+            "hash_components": {"A": A, "B": B, "C": C, "D": D},
+            "document_size": document_size,
+            "vault_verification": use_vault,
+            "used_key": None if use_vault else (key if key is not None else self.private_key),
+            "mode": "rehash"
+        }
+
+    def _verify_signed_file_reverse(self, signed_file, key=None):
         with open(signed_file, 'rb') as f:
             data = f.read()
 
@@ -249,23 +958,21 @@ class ISAPipelineHashProcessor:
         if not os.path.exists(rev_path):
             raise FileNotFoundError(f"reverse_hash.asm not found at {rev_path}")
 
-        with open(rev_path, 'r', encoding='utf-8') as rf:
-            rev_code = rf.read()
-
         # If caller didn't pass a key but the pipeline has a Vault attached,
         # prefer using the Vault for verification so the reverse program will
         # be provided with the correct key in memory.
         if key is None and hasattr(self.pipeline, 'vault') and self.pipeline.vault is not None:
             key = {'use_vault': True, 'vault_index': 0}
 
-        # Assemble the reverse program and load into pipeline
-        rev_program = self.assembler.assemble(rev_code)
+        # Assemble the reverse program (cached) and load into pipeline
+        rev_program = self.program_cache.load_file(rev_path).code
         # reset pipeline but preserve any existing Vault instance so verification can use same keys
         existing_vault = None
         if hasattr(self.pipeline, 'vault') and self.pipeline.vault is not None:
             existing_vault = self.pipeline.vault
         self.program_loaded = False
-        self.pipeline = Simple_Pipeline(trace=False)
+        # Memoria paginada: las regiones usadas (programa, firma, llave) se reservan al escribirlas
+        self.pipeline = Simple_Pipeline(trace=False, memory=PagedMemory())
         # restore existing vault onto the new pipeline if we had one
         if existing_vault is not None:
             try:
@@ -276,11 +983,6 @@ class ISAPipelineHashProcessor:
 
         # Load the signature into pipeline memory at base 0x400 (as reverse_hash.asm expects)
         base = 0x400
-        # Ensure memory is large enough for base region (we need up to base+72)
-        needed = base + 72
-        if len(self.pipeline.memory) < needed:
-            extra = needed - len(self.pipeline.memory)
-            self.pipeline.memory += bytearray(b'\x00' * extra)
 
         # Note: don't write document_data at address 0 since program is loaded at 0
         # and writing the document would overwrite the reverse program. The reverse
@@ -288,12 +990,12 @@ class ISAPipelineHashProcessor:
 
         # write signature into memory
         for i in range(4):
-            self.pipeline.memory[base + i*8: base + (i+1)*8] = signature[i].to_bytes(8, 'little')
+            self.pipeline.write_word(base + i*8, signature[i])
 
         # If verifying using the vault, ensure the pipeline has a vault instance
         # and write the vault's key into memory at base+64 (reverse_hash.asm will read it there).
         if isinstance(key, dict) and key.get('use_vault', False):
-            vault_index = key.get('vault_index', 0)
+            vault_index = self._vault_index(key)
             # attach or create vault on pipeline
             if not hasattr(self.pipeline, 'vault') or self.pipeline.vault is None:
                 v = Vault()
@@ -301,13 +1003,6 @@ class ISAPipelineHashProcessor:
             else:
                 v = self.pipeline.vault
 
-            # Ensure pipeline memory is large enough to hold base+72 (we need up to base+71)
-            needed = base + 72
-            if len(self.pipeline.memory) < needed:
-                # extend memory with zeros
-                extra = needed - len(self.pipeline.memory)
-                self.pipeline.memory += bytearray(b'\x00' * extra)
-
             # Vault stores keys internally in v.keys; read the key value and write little-endian
             try:
                 key_val = v.keys[vault_index]
@@ -315,7 +1010,7 @@ class ISAPipelineHashProcessor:
                 # If key index invalid, write zeros
                 key_val = 0
 
-            self.pipeline.memory[base + 64: base + 72] = int(key_val & 0xFFFFFFFFFFFFFFFF).to_bytes(8, 'little')
+            self.pipeline.write_word(base + 64, int(key_val))
 
         # Ensure the reverse program sees the expected base register (x20)
         try:
@@ -333,14 +1028,11 @@ class ISAPipelineHashProcessor:
             raise RuntimeError('reverse_hash program exceeded step limit')
 
         # Read recovered components from memory (reverse_hash writes them at base+32..base+56)
-        A = int.from_bytes(self.pipeline.memory[base + 32: base + 40], 'little')
-        B = int.from_bytes(self.pipeline.memory[base + 40: base + 48], 'little')
-        C = int.from_bytes(self.pipeline.memory[base + 48: base + 56], 'little')
-        D = int.from_bytes(self.pipeline.memory[base + 56: base + 64], 'little')
+        A, B, C, D = (self.pipeline.read_word(base + 32 + i*8) for i in range(4))
 
         # If key is a dict and requests vault verification, ask the vault to produce expected signature
         if isinstance(key, dict) and key.get('use_vault', False):
-            vault_index = key.get('vault_index', 0)
+            vault_index = self._vault_index(key)
             # Ensure pipeline has a vault instance
             if not hasattr(self.pipeline, 'vault') or self.pipeline.vault is None:
                 v = Vault()
@@ -362,10 +1054,37 @@ class ISAPipelineHashProcessor:
             "hash_components": {"A": A, "B": B, "C": C, "D": D},
             "document_size": len(document_data),
             "vault_verification": isinstance(key, dict) and key.get('use_vault', False),
-            "used_key": (None if isinstance(key, dict) and key.get('use_vault', False) else used_key)
+            "used_key": (None if isinstance(key, dict) and key.get('use_vault', False) else used_key),
+            "mode": "reverse"
         }
 
 
+class _ISAStreamHasher:
+    """Misma interfaz que ToyMDMAHasher (update/components) pero con el kernel en el pipeline."""
+
+    def __init__(self, processor):
+        self.processor = processor
+        self.state = TOYMDMA_IV
+        self._pending = b''
+        processor._reset_pipeline()
+
+    def update(self, data):
+        data = self._pending + bytes(data)
+        full = len(data) & ~7
+        hash_block = self.processor.hash_block_with_isa
+        A, B, C, D = self.state
+        for (block,) in struct.iter_unpack('<Q', data[:full]):
+            A, B, C, D, _ = hash_block(A, B, C, D, block)
+        self.state = (A, B, C, D)
+        self._pending = data[full:]
+
+    def components(self):
+        if not self._pending:
+            return self.state
+        block = int.from_bytes(self._pending.ljust(8, b'\x00'), 'little')
+        return self.processor.hash_block_with_isa(*self.state, block)[:4]
+
+
 def main():
     processor = ISAPipelineHashProcessor()
     target_file = "file_loader.py"
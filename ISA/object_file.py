@@ -0,0 +1,96 @@
+# object_file.py
+# ----------------------------------------------------------
+# Formato binario de objeto para programas ensamblados
+#
+# Disposicion (little-endian):
+#   Cabecera   : magic 'ISAO', version u16, flags u16, num_instr u32,
+#                num_symbols u32, source_sha256 (32 bytes)
+#   Codigo     : num_instr palabras de 64 bits (listas para copiar a memoria)
+#   Simbolos   : por simbolo -> kind u8, len u8, nombre, valor u64, linea u32
+#                (el valor se guarda como patron de 64 bits: -1 se lee como
+#                0xFFFFFFFFFFFFFFFF)
+#   Mapa lineas: num_instr x u32 (linea fuente de cada instruccion)
+# ----------------------------------------------------------
+
+import hashlib
+import struct
+
+OBJECT_MAGIC = b'ISAO'
+OBJECT_VERSION = 2
+
+_HEADER = struct.Struct('<4sHHII32s')
+_SYMBOL = struct.Struct('<QI')
+_SYMBOL_KINDS = ('label', 'equ')
+
+
+def source_digest(source):
+    """SHA-256 del texto fuente (identifica el programa en cache)."""
+    if isinstance(source, str):
+        source = source.encode('utf-8')
+    return hashlib.sha256(source).digest()
+
+
+class ObjectFile:
+    """Programa ensamblado: codigo, tabla de simbolos y mapa de lineas fuente."""
+
+    def __init__(self, code, symbols=None, line_map=None, source_hash=b'\x00' * 32):
+        self.code = memoryview(code)
+        self.symbols = symbols or {}
+        self.line_map = list(line_map or [])
+        self.source_hash = source_hash
+
+    @property
+    def num_instructions(self):
+        return self.code.nbytes // 8
+
+    @property
+    def program(self):
+        """Codigo como lista de enteros de 64 bits (formato de Assembler.assemble)."""
+        return list(struct.unpack_from(f'<{self.num_instructions}Q', self.code))
+
+    @classmethod
+    def from_program(cls, program, symbols=None, line_map=None, source=None):
+        code = struct.pack(f'<{len(program)}Q', *program)
+        source_hash = source_digest(source) if source is not None else b'\x00' * 32
+        return cls(code, symbols, line_map, source_hash)
+
+    def to_bytes(self):
+        parts = [_HEADER.pack(OBJECT_MAGIC, OBJECT_VERSION, 0, self.num_instructions,
+                              len(self.symbols), self.source_hash),
+                 bytes(self.code)]
+        for name, sym in self.symbols.items():
+            raw = name.encode('utf-8')
+            parts.append(struct.pack('<BB', _SYMBOL_KINDS.index(sym['kind']), len(raw)))
+            parts.append(raw)
+            parts.append(_SYMBOL.pack(sym['value'] & 0xFFFFFFFFFFFFFFFF, sym['line']))
+        parts.append(struct.pack(f'<{len(self.line_map)}I', *self.line_map))
+        return b''.join(parts)
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Lee un objeto sin copiar la seccion de codigo (vista sobre `data`)."""
+        view = memoryview(data)
+        if view.nbytes < _HEADER.size:
+            raise ValueError("Object file too small")
+        magic, version, _flags, num_instr, num_symbols, source_hash = _HEADER.unpack_from(view)
+        if magic != OBJECT_MAGIC:
+            raise ValueError("Not an ISA object file")
+        if version != OBJECT_VERSION:
+            raise ValueError(f"Unsupported object file version: {version}")
+        pos = _HEADER.size
+        code = view[pos:pos + num_instr * 8]
+        pos += num_instr * 8
+        symbols = {}
+        for _ in range(num_symbols):
+            kind, length = struct.unpack_from('<BB', view, pos)
+            pos += 2
+            name = bytes(view[pos:pos + length]).decode('utf-8')
+            pos += length
+            value, line = _SYMBOL.unpack_from(view, pos)
+            pos += _SYMBOL.size
+            symbols[name] = {"value": value, "kind": _SYMBOL_KINDS[kind], "line": line}
+        line_map = list(struct.unpack_from(f'<{num_instr}I', view, pos))
+        pos += num_instr * 4
+        if pos != view.nbytes or code.nbytes != num_instr * 8:
+            raise ValueError("Corrupt object file")
+        return cls(code, symbols, line_map, bytes(source_hash))
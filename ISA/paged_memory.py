@@ -0,0 +1,303 @@
+# paged_memory.py
+# ----------------------------------------------------------
+# Memoria paginada dispersa para el simulador
+#
+# El espacio de direcciones virtual puede ser de varios GB: las paginas de
+# 4 KB solo se reservan la primera vez que se escriben (las no tocadas se
+# leen como ceros). Ofrece la misma interfaz de indexado y slicing que el
+# bytearray usado por Simple_Pipeline, mas accesos rapidos de 8 bytes.
+#
+# Ademas se pueden adjuntar regiones de solo lectura (p. ej. un archivo
+# mapeado con mmap) sin copiarlas: se leen directamente y una pagina solo se
+# copia a RAM privada cuando el programa escribe en ella (copy-on-write).
+# ----------------------------------------------------------
+
+import struct
+import sys
+
+PAGE_SHIFT = 12
+PAGE_SIZE = 1 << PAGE_SHIFT
+PAGE_MASK = PAGE_SIZE - 1
+
+DEFAULT_MEMORY_SIZE = 1 << 32  # 4 GB de espacio virtual
+
+_WORD = struct.Struct('<Q')
+# Las vistas cast('Q') usan el orden nativo: solo valen como little-endian en hosts LE
+_NATIVE_LE = sys.byteorder == 'little'
+
+
+class PagedMemory:
+    def __init__(self, size=DEFAULT_MEMORY_SIZE):
+        """
+        Args:
+            size: Tamano del espacio de direcciones virtual en bytes
+        """
+        self.size = size
+        # Tabla de paginas: numero de pagina -> bytearray(PAGE_SIZE)
+        self.pages = {}
+        # Vistas de 64 bits de cada pagina (accesos alineados sin struct)
+        self._words = {}
+        # Regiones adjuntas sin copia: (inicio, fin, memoryview de solo lectura)
+        self.regions = []
+        # Origen de las regiones que vienen de un archivo: inicio -> (ruta, desplazamiento)
+        self.region_sources = {}
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def resident_bytes(self):
+        """Bytes de RAM realmente reservados (paginas tocadas)."""
+        return len(self.pages) * PAGE_SIZE
+
+    def _check_range(self, addr, length):
+        if addr < 0 or addr + length > self.size:
+            raise IndexError(f"Memory access out of range: addr=0x{addr:X} len={length}")
+
+    def _page_for_write(self, page_no):
+        page = self.pages.get(page_no)
+        if page is None:
+            page = self._install_page(page_no, bytearray(PAGE_SIZE))
+            if self.regions:
+                # Copy-on-write: la pagina privada parte del contenido mapeado
+                page_addr = page_no << PAGE_SHIFT
+                self._copy_from_regions(page_addr, page, 0, PAGE_SIZE)
+        return page
+
+    def _install_page(self, page_no, page):
+        self.pages[page_no] = page
+        if _NATIVE_LE:
+            self._words[page_no] = memoryview(page).cast('Q')
+        return page
+
+    # ----------------------------------------------------------
+    # Regiones mapeadas (sin copia)
+    # ----------------------------------------------------------
+    def map_region(self, addr, buffer, source=None):
+        """
+        Adjunta `buffer` (bytes, mmap, memoryview...) en `addr` sin copiarlo.
+
+        La operacion es de tiempo constante: las lecturas acceden al buffer
+        directamente y las escrituras copian solo la pagina afectada.
+        `source` = (ruta, desplazamiento) indica que el buffer es ese trozo de
+        un archivo; los checkpoints guardan entonces la referencia y no el
+        contenido.
+        """
+        view = memoryview(buffer).cast('B')
+        length = view.nbytes
+        self._check_range(addr, length)
+        end = addr + length
+        if self._overlaps_region(addr, end):
+            raise ValueError(f"Region overlaps an existing mapping at 0x{addr:X}")
+        self.regions.append((addr, end, view.toreadonly()))
+        if source is not None:
+            self.region_sources[addr] = source
+        # Las paginas privadas ya existentes tienen prioridad en las lecturas:
+        # se copia en ellas la parte que cubre la region (coste segun paginas residentes)
+        first, last = addr >> PAGE_SHIFT, (end - 1) >> PAGE_SHIFT
+        for page_no, page in self.pages.items():
+            if first <= page_no <= last:
+                self._copy_from_regions(page_no << PAGE_SHIFT, page, 0, PAGE_SIZE, self.regions[-1:])
+        return addr, length
+
+    def unmap_region(self, addr):
+        """Quita la region mapeada en `addr` (las paginas ya copiadas se conservan)."""
+        for i, (start, _, view) in enumerate(self.regions):
+            if start == addr:
+                del self.regions[i]
+                self.region_sources.pop(addr, None)
+                view.release()
+                return
+        raise ValueError(f"No mapped region at 0x{addr:X}")
+
+    def _find_region(self, addr):
+        for start, end, view in self.regions:
+            if start <= addr < end:
+                return view, addr - start
+        return None
+
+    def _copy_from_regions(self, addr, out, out_pos, length, regions=None):
+        """Copia en out[out_pos:] los bytes mapeados que caen en [addr, addr+length)."""
+        end = addr + length
+        for start, region_end, view in regions or self.regions:
+            lo = max(addr, start)
+            hi = min(end, region_end)
+            if lo < hi:
+                out[out_pos + lo - addr:out_pos + hi - addr] = view[lo - start:hi - start]
+
+    def _overlaps_region(self, addr, end):
+        return any(addr < region_end and start < end for start, region_end, _ in self.regions)
+
+    # ----------------------------------------------------------
+    # Accesos de 64 bits (camino rapido de lw/sw/fetch)
+    # ----------------------------------------------------------
+    def read_word(self, addr):
+        """Lee 8 bytes little-endian en `addr` como entero sin signo."""
+        if not addr & 7 and 0 <= addr and addr + 8 <= self.size:
+            words = self._words.get(addr >> PAGE_SHIFT)
+            if words is not None:
+                return words[(addr & PAGE_MASK) >> 3]
+        offset = addr & PAGE_MASK
+        if offset <= PAGE_SIZE - 8 and 0 <= addr and addr + 8 <= self.size:
+            page = self.pages.get(addr >> PAGE_SHIFT)
+            if page is not None:
+                return _WORD.unpack_from(page, offset)[0]
+            if not self.regions:
+                return 0
+            hit = self._find_region(addr)
+            if hit is not None and hit[1] + 8 <= hit[0].nbytes:
+                return _WORD.unpack_from(hit[0], hit[1])[0]
+            if hit is None and not self._overlaps_region(addr, addr + 8):
+                return 0
+        return int.from_bytes(self.read(addr, 8), 'little')
+
+    def write_word(self, addr, value):
+        """Escribe `value` como 8 bytes little-endian en `addr`."""
+        if not addr & 7 and 0 <= addr and addr + 8 <= self.size:
+            words = self._words.get(addr >> PAGE_SHIFT)
+            if words is not None:
+                words[(addr & PAGE_MASK) >> 3] = value & 0xFFFFFFFFFFFFFFFF
+                return
+        offset = addr & PAGE_MASK
+        if offset <= PAGE_SIZE - 8 and 0 <= addr and addr + 8 <= self.size:
+            _WORD.pack_into(self._page_for_write(addr >> PAGE_SHIFT), offset,
+                            value & 0xFFFFFFFFFFFFFFFF)
+            return
+        self.write(addr, (value & 0xFFFFFFFFFFFFFFFF).to_bytes(8, 'little'))
+
+    # ----------------------------------------------------------
+    # Accesos de bloques de bytes
+    # ----------------------------------------------------------
+    def read(self, addr, length):
+        """Devuelve `length` bytes a partir de `addr`."""
+        self._check_range(addr, length)
+        out = bytearray(length)
+        pos = 0
+        while pos < length:
+            page_no = (addr + pos) >> PAGE_SHIFT
+            offset = (addr + pos) & PAGE_MASK
+            chunk = min(length - pos, PAGE_SIZE - offset)
+            page = self.pages.get(page_no)
+            if page is not None:
+                out[pos:pos + chunk] = page[offset:offset + chunk]
+            elif self.regions:
+                self._copy_from_regions(addr + pos, out, pos, chunk)
+            pos += chunk
+        return bytes(out)
+
+    def write(self, addr, data):
+        """Copia `data` (bytes-like) a partir de `addr`, reservando paginas al vuelo."""
+        view = memoryview(data).cast('B')
+        length = view.nbytes
+        self._check_range(addr, length)
+        pos = 0
+        while pos < length:
+            page_no = (addr + pos) >> PAGE_SHIFT
+            offset = (addr + pos) & PAGE_MASK
+            chunk = min(length - pos, PAGE_SIZE - offset)
+            segment = view[pos:pos + chunk]
+            page = self.pages.get(page_no)
+            page_addr = page_no << PAGE_SHIFT
+            if page is None:
+                if not any(segment) and not self._overlaps_region(page_addr, page_addr + PAGE_SIZE):
+                    # Escribir ceros en una pagina no tocada no requiere reservarla
+                    pos += chunk
+                    continue
+                page = self._page_for_write(page_no)
+            page[offset:offset + chunk] = segment
+            pos += chunk
+
+    # ----------------------------------------------------------
+    # Compatibilidad con la interfaz de bytearray
+    # ----------------------------------------------------------
+    def _slice_bounds(self, key):
+        if key.step not in (None, 1):
+            raise ValueError("PagedMemory does not support extended slices")
+        start, stop, _ = key.indices(self.size)
+        return start, max(start, stop)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop = self._slice_bounds(key)
+            return self.read(start, stop - start)
+        if key < 0:
+            key += self.size
+        self._check_range(key, 1)
+        page = self.pages.get(key >> PAGE_SHIFT)
+        if page is not None:
+            return page[key & PAGE_MASK]
+        hit = self._find_region(key) if self.regions else None
+        return 0 if hit is None else hit[0][hit[1]]
+
+    def __setitem__(self, key, value):
+        if isinstance(key, slice):
+            start, stop = self._slice_bounds(key)
+            if memoryview(value).nbytes != stop - start:
+                raise ValueError("PagedMemory slice assignment cannot change the memory size")
+            self.write(start, value)
+            return
+        if key < 0:
+            key += self.size
+        self._check_range(key, 1)
+        self._page_for_write(key >> PAGE_SHIFT)[key & PAGE_MASK] = value
+
+    # ----------------------------------------------------------
+    # Snapshots (checkpoint/restore)
+    # ----------------------------------------------------------
+    def snapshot(self):
+        """
+        Copia del estado: paginas privadas copiadas. Las regiones de un archivo
+        o de un buffer inmutable se comparten con una vista propia del
+        snapshot, que sigue siendo valida despues de unmap_region() o clear();
+        las de un buffer mutable se copian para fijar su contenido actual.
+        """
+        regions = []
+        for start, _, view in self.regions:
+            source = self.region_sources.get(start)
+            shared = source is not None or isinstance(view.obj, bytes)
+            regions.append((start, view[:] if shared else bytes(view), source))
+        return {
+            "size": self.size,
+            "pages": {page_no: bytes(page) for page_no, page in self.pages.items()},
+            "regions": regions,
+        }
+
+    @classmethod
+    def from_snapshot(cls, state):
+        memory = cls(state["size"])
+        # Primero las regiones: las paginas privadas (copy-on-write) tienen prioridad
+        for start, view, *source in state.get("regions", ()):
+            memory.map_region(start, view, *source)
+        for page_no, data in state["pages"].items():
+            memory._install_page(page_no, bytearray(data))
+        return memory
+
+    def iter_nonzero_pages(self, regions=None):
+        """
+        Numero y contenido de cada pagina con datos, en orden.
+
+        Se recorren las paginas privadas y las de las regiones indicadas en
+        `regions` (pares inicio, fin; por defecto todas las mapeadas). Una
+        pagina privada que tapa una region se devuelve aunque sea cero, porque
+        oculta el contenido mapeado.
+        """
+        if regions is None:
+            regions = [(start, end) for start, end, _ in self.regions]
+        page_nos = set(self.pages)
+        for start, end in regions:
+            if end > start:
+                page_nos.update(range(start >> PAGE_SHIFT, ((end - 1) >> PAGE_SHIFT) + 1))
+        for page_no in sorted(page_nos):
+            data = self.read(page_no << PAGE_SHIFT, PAGE_SIZE)
+            if any(data) or (page_no in self.pages and self.regions
+                             and self._overlaps_region(page_no << PAGE_SHIFT, (page_no + 1) << PAGE_SHIFT)):
+                yield page_no, data
+
+    def clear(self):
+        """Libera todas las paginas y regiones (la memoria vuelve a leerse como ceros)."""
+        self._words.clear()
+        self.pages.clear()
+        for _, _, view in self.regions:
+            view.release()
+        self.regions.clear()
+        self.region_sources.clear()
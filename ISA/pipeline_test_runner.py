@@ -0,0 +1,221 @@
+# pipeline_test_runner.py
+# Runner de prueba de regresion para Simple_Pipeline
+# Ejecuta programas cortos en modo paso a paso y en modo funcional y
+# compara registros y memoria contra los valores esperados
+
+import sys
+import dma_engine
+from assembler import Assembler, AssemblerError
+from paged_memory import PagedMemory
+from simple_pipeline import Simple_Pipeline
+from isa_pipeline_hash import ISAPipelineHashProcessor
+from toymdma_hasher import ToyMDMAHasher
+
+MAX_STEPS = 100000
+
+
+def run_program(source, functional=False, setup=None, **options):
+    """Ensambla y ejecuta `source` en un pipeline nuevo y lo devuelve."""
+    pipeline = Simple_Pipeline(trace=False, **options)
+    pipeline.load_program(Assembler().assemble(source))
+    if setup is not None:
+        setup(pipeline)
+    if functional:
+        pipeline.run_functional()
+    else:
+        steps = 0
+        while pipeline.is_pipeline_active() and steps < MAX_STEPS:
+            pipeline.step()
+            steps += 1
+    return pipeline
+
+
+# sw guarda su registro fuente (campo rd) y no lo modifica
+SW_PROGRAM = """
+    addi x5, x0, 0x200
+    addi x6, x0, 77
+    addi x0, x0, 0
+    sw x6, 0(x5)
+    addi x0, x0, 0
+    lw x7, 0(x5)
+    addi x0, x0, 0
+"""
+
+
+def check_sw(functional):
+    pipeline = run_program(SW_PROGRAM, functional)
+    stored = pipeline.read_word(0x200)
+    return stored == 77 and pipeline.registers[6] == 77 and pipeline.registers[7] == 77
+
+
+def check_large_program(functional):
+    # Mas de 1 KB de codigo: la memoria por defecto (bytearray de 1 KB) crece
+    source = "".join(f"addi x{1 + i % 8}, x0, {i}\n" for i in range(200))
+    pipeline = run_program(source, functional)
+    return pipeline.registers[1:9] == list(range(192, 200)) and len(pipeline.memory) > 1024
+
+
+# mdma justo despues de escribir su bloque: lee el valor anterior de x1
+MDMA_PROGRAM = """
+    addi x1, x0, 99
+    mdma x2, x1
+    addi x0, x0, 0
+    addi x0, x0, 0
+"""
+
+
+def check_mdma_latency(functional):
+    def setup(pipeline):
+        pipeline.registers[1] = 7
+        pipeline.registers[2:6] = [0x0123456789ABCDEF, 0xFEDCBA9876543210, 0x1111, 0x2222]
+
+    # La latencia solo cambia los ciclos: los registros deben ser identicos
+    results = [run_program(MDMA_PROGRAM, functional, setup, mdma_latency=latency).registers
+               for latency in (1, 2, 4, 9)]
+    return all(r == results[0] for r in results)
+
+
+def check_dma_stats(functional):
+    # Con menos de 8 B/ciclo los ciclos que acumulan ancho de banda son activos:
+    # active_cycles = bytes / bytes_per_cycle aunque haya esperas por ranuras
+    data = bytes(range(256)) * 20
+    expected = ToyMDMAHasher(data).components()
+    for bytes_per_cycle in (0.5, 2, 8):
+        result = ISAPipelineHashProcessor(functional=functional).calculate_hash_dma(
+            data, chunk_size=512, bytes_per_cycle=bytes_per_cycle)
+        stats = result["dma"]
+        if (result["A"], result["B"], result["C"], result["D"]) != expected:
+            return False
+        if stats["transferred"] != len(data) or stats["active_cycles"] != len(data) / bytes_per_cycle:
+            return False
+    return True
+
+
+def check_dma_error(functional):
+    # Configuracion rechazada (anillo no alineado): el kernel ve el bit de
+    # error de STATUS y termina en vez de esperar ranuras para siempre
+    processor = ISAPipelineHashProcessor()
+    dma = dma_engine.DMAEngine(dma_engine.DEFAULT_DMA_BASE)
+    dma.add_source(bytes(256))
+
+    def setup(pipeline):
+        pipeline.attach_device(dma)
+        pipeline.registers[20] = dma.base
+        pipeline.registers[19] = 0x10004
+        pipeline.registers[14] = 128
+        pipeline.registers[15] = 256
+        pipeline.registers[11] = 4
+
+    with dma:
+        pipeline = run_program(processor.create_toymdma_dma_program(64), functional, setup,
+                               memory=PagedMemory())
+    return dma.status == dma_engine.STATUS_ERROR and pipeline.cycle < 1000
+
+
+# li64 de una etiqueta posterior reserva dos palabras aunque quepa en 32 bits:
+# `far` queda en la palabra 9 (2 + 2 + 1 + 1 + 1 + 2)
+LI64_PROGRAM = """
+    li64 x4, far
+    li64 x1, 0x123456789ABCDEF0
+    lli x2, 0xFFFFFFFF
+    lhi x2, 0x80000001
+    li64 x3, 5
+    addi x0, x0, 0
+    addi x0, x0, 0
+far:
+    addi x0, x0, 0
+"""
+
+
+def check_li64(functional):
+    assembler = Assembler()
+    words = len(assembler.assemble(LI64_PROGRAM))
+    far = assembler.symbols["far"]["value"]
+    pipeline = run_program(LI64_PROGRAM, functional)
+    return (words == 10 and far == 9 * 8
+            and pipeline.registers[1:5] == [0x123456789ABCDEF0, 0x80000001FFFFFFFF, 5, far])
+
+
+def check_immediate_range(functional):
+    # Un inmediato que no cabe en el campo de 31 bits es un error, no se trunca
+    for line in ("vwr x0, 0x123456789ABCDEF0", "vinit x1, 0x0123456789ABCDEF",
+                 "addi x1, x0, 0x80000000", "lw x1, 0x80000000(x2)", "lli x1, 0x100000000",
+                 "li64 x1, 0x10000000000000000"):
+        try:
+            Assembler().assemble(line)
+        except AssemblerError as e:
+            if line.startswith(("vwr", "vinit", "addi", "lw")) and "li64" not in str(e):
+                return False
+        else:
+            return False
+    # Los limites del campo siguen siendo validos
+    pipeline = run_program("addi x1, x0, 0x7FFFFFFF\nmodi x2, x1, 0x7FFFFFFB\naddi x0, x0, 0", functional)
+    return pipeline.registers[1] == 0x7FFFFFFF
+
+
+# vsignn retiene MEM vsign_block_cycles ciclos por bloque; el lw siguiente
+# espera detras y lee la firma ya escrita tras la region
+VSIGNN_PROGRAM = """
+    vsignn x7, x1, x5
+    lw x9, 0x280(x0)
+    addi x0, x0, 0
+    addi x0, x0, 0
+"""
+VSIGNN_KEY = 0x0F1E2D3C4B5A6978
+
+
+def check_vsignn_stall(functional):
+    blocks = [(i * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF for i in range(16)]
+
+    def run(count, block_cycles):
+        def setup(pipeline):
+            pipeline.vault.write_key(0, VSIGNN_KEY)
+            for i, block in enumerate(blocks):
+                pipeline.write_word(0x200 + 8 * i, block)
+            pipeline.registers[5:7] = [0x200, count]
+        return run_program(VSIGNN_PROGRAM, functional, setup, vsign_block_cycles=block_cycles)
+
+    expected = list(run(16, 1).vault.sign_stream(0, blocks))
+    results = {(count, block_cycles): run(count, block_cycles)
+               for count in (8, 16) for block_cycles in (1, 3)}
+    full = [results[16, c] for c in (1, 3)]
+    signature = [[p.read_word(0x280 + 8 * i) for i in range(4)] for p in full]
+    # El modelo de tiempo solo cambia los ciclos: 16 bloques x 2 ciclos extra
+    return (signature[0] == signature[1] == expected
+            and full[0].registers == full[1].registers
+            and full[0].registers[7] == 1 and full[0].registers[9] == expected[0]
+            and full[1].cycle - full[0].cycle == 16 * 2
+            and results[16, 3].cycle - results[8, 3].cycle == 8 * 3)
+
+
+CASES = [
+    ("sw guarda el registro fuente", check_sw),
+    ("programa de mas de 1 KB", check_large_program),
+    ("mdma no depende de la latencia", check_mdma_latency),
+    ("estadisticas del DMA", check_dma_stats),
+    ("error de configuracion del DMA", check_dma_error),
+    ("li64, lli y lhi", check_li64),
+    ("inmediatos fuera de rango", check_immediate_range),
+    ("vsignn detiene MEM segun la longitud", check_vsignn_stall),
+]
+
+
+def main():
+    print("Simple_Pipeline test runner")
+    print("===========================")
+
+    failures = 0
+    for name, check in CASES:
+        for functional in (False, True):
+            ok = check(functional)
+            mode = "funcional" if functional else "paso a paso"
+            print(f"  {name} ({mode}): {'OK' if ok else 'FALLO'}")
+            if not ok:
+                failures += 1
+
+    print("Coincide?", "SI" if failures == 0 else f"NO ({failures} fallos)")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
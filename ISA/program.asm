@@ -53,7 +53,8 @@ rol x19, x18, 1          # x19 = rotar x18 una posicion a la izquierda
 
 # === INSTRUCCIONES DE MEMORIA ===
 # Preparar datos para memoria
-addi x20, x0, 0x200      # x20 = direccion base de memoria (512)
+.equ DATA_BASE, 0x200    # constante simbolica para la direccion base
+addi x20, x0, DATA_BASE  # x20 = direccion base de memoria (512)
 addi x21, x0, 0xDEAD     # x21 = datos a almacenar (0xDEAD)
 
 # Prueba SW - Store Word (guardar en memoria)
@@ -100,7 +101,7 @@ vsign x0, x29, x28       # Firmar bloques usando clave 0 de boveda
 # Prueba BEQ - Branch if Equal (salto condicional si igual)
 addi x1, x0, 5           # Restablecer x1 = 5
 addi x2, x0, 5           # x2 = 5 (igual a x1)
-beq x1, x2, 4            # Si x1 == x2, saltar 4 instrucciones adelante
+beq x1, x2, beq_target   # Si x1 == x2, saltar las 4 instrucciones siguientes
 
 # Estas instrucciones se saltaran si la condicion es verdadera
 addi x1, x0, 999         # Esta no se ejecutara (se salta)
@@ -109,17 +110,19 @@ addi x3, x0, 999         # Esta no se ejecutara (se salta)
 addi x4, x0, 999         # Esta no se ejecutara (se salta)
 
 # Destino del salto - continua aqui
+beq_target:
 addi x5, x0, 200         # x5 = 200 (confirma que el salto funciono)
 
 # === PRUEBA DE JAL - Jump and Link ===
 # JAL guarda PC+4 en registro destino y salta
-jal x6, 8               # Saltar 8 bytes adelante, guardar direccion de retorno en x6
+jal x6, jal_target       # Saltar a jal_target, guardar direccion de retorno en x6
 
 # Estas instrucciones se saltaran
 addi x7, x0, 777         # No se ejecutara
 addi x8, x0, 888         # No se ejecutara
 
 # Destino del salto JAL
+jal_target:
 addi x9, x0, 300         # x9 = 300 (confirma que JAL funciono)
 
 # === PRUEBAS ADICIONALES DE COHERENCIA ===
@@ -0,0 +1,120 @@
+# program_cache.py
+# ----------------------------------------------------------
+# Cache de programas ensamblados (en memoria y en disco)
+#
+# La clave es el SHA-256 del texto fuente junto con la version del formato
+# de objeto y del propio ensamblador, de modo que un cambio en assembler.py
+# invalida automaticamente las entradas anteriores.
+# ----------------------------------------------------------
+
+import hashlib
+import os
+import struct
+
+import assembler as assembler_module
+from assembler import Assembler
+from object_file import OBJECT_VERSION, ObjectFile
+
+DEFAULT_CACHE_DIR = os.environ.get(
+    'ISA_ASM_CACHE', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.asm_cache'))
+
+
+def _assembler_fingerprint():
+    try:
+        with open(assembler_module.__file__, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        return 'unknown'
+
+
+_ASSEMBLER_FINGERPRINT = _assembler_fingerprint()
+
+
+class ProgramCache:
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, assembler=None):
+        """
+        Args:
+            cache_dir: Directorio de la cache en disco (None desactiva el disco)
+            assembler: Ensamblador a usar cuando la entrada no esta en cache
+        """
+        self.cache_dir = cache_dir
+        self.assembler = assembler or Assembler()
+        self._memory = {}
+        self.hits = 0
+        self.misses = 0
+
+    def cache_key(self, source):
+        h = hashlib.sha256()
+        h.update(f"v{OBJECT_VERSION}:{_ASSEMBLER_FINGERPRINT}:".encode('ascii'))
+        h.update(source.encode('utf-8'))
+        return h.hexdigest()
+
+    def _path_for(self, key):
+        return os.path.join(self.cache_dir, f"{key}.isao")
+
+    def load(self, source):
+        """Devuelve el ObjectFile de `source`, ensamblando solo si no esta en cache."""
+        key = self.cache_key(source)
+        obj = self._memory.get(key)
+        if obj is not None:
+            self.hits += 1
+            return obj
+
+        obj = self._read_disk(key)
+        if obj is None:
+            self.misses += 1
+            obj = self.assembler.assemble_object(source)
+            self._write_disk(key, obj)
+        else:
+            self.hits += 1
+        self._memory[key] = obj
+        return obj
+
+    def load_file(self, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return self.load(f.read())
+
+    def _read_disk(self, key):
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self._path_for(key), 'rb') as f:
+                return ObjectFile.from_bytes(f.read())
+        except (OSError, ValueError):
+            return None
+
+    def _write_disk(self, key, obj):
+        if not self.cache_dir:
+            return
+        path = self._path_for(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            data = obj.to_bytes()
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except (OSError, struct.error):
+            # La cache en disco es opcional: si no se puede escribir se sigue en memoria
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+    def clear(self):
+        self._memory.clear()
+        if self.cache_dir and os.path.isdir(self.cache_dir):
+            for name in os.listdir(self.cache_dir):
+                if name.endswith('.isao'):
+                    os.remove(os.path.join(self.cache_dir, name))
+
+
+_default_cache = None
+
+
+def get_default_cache():
+    """Cache compartida por el procesador de hash y la interfaz."""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ProgramCache()
+    return _default_cache
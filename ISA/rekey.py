@@ -0,0 +1,205 @@
+# rekey.py
+# ----------------------------------------------------------
+# Rotacion de llaves en archivos firmados sin rehashear el documento
+#
+# La firma es S = (A ^ K, B ^ K, C ^ K, D ^ K), asi que pasar de la llave K1 a
+# K2 solo requiere aplicar XOR con K1 ^ K2 a las cuatro palabras de la firma.
+# Cada archivo se modifica en su lugar escribiendo solo esos 32 bytes.
+#
+# Seguridad ante caidas: antes de tocar un lote de archivos se escribe en un
+# diario (JSON por linea) la ruta, el desplazamiento y la firma anterior y
+# nueva de cada uno, y se hace fsync. Al terminar el lote se anota
+# {"commit": n}. recover_rekey() rehace los lotes sin commit: cada entrada es
+# idempotente (solo se escribe si el archivo tiene la firma anterior o ya la
+# nueva). Los fsync de los archivos se agrupan por lote.
+#
+# Por defecto cada documento se rehashea antes de escribir: si la firma no
+# corresponde a la llave anterior, el archivo se informa como fallido y no se
+# toca (con una llave anterior equivocada el XOR lo dejaria invalido con
+# ambas llaves). verify=False es el camino rapido sin esa comprobacion.
+# ----------------------------------------------------------
+
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from toymdma_hasher import ToyMDMAHasher
+from tree_hash import SIGNATURE_SIZE, hash_file_tree, read_footer
+
+MASK64 = 0xFFFFFFFFFFFFFFFF
+DEFAULT_BATCH = 64
+
+
+def default_journal_path():
+    return os.path.join(os.getcwd(), '.rekey_journal')
+
+
+def signature_offset(path):
+    """Posicion de la firma: tras el documento en modo arbol, al final en el encadenado."""
+    footer = read_footer(path)
+    if footer is not None:
+        return footer["document_size"], footer
+    size = os.path.getsize(path)
+    if size < SIGNATURE_SIZE:
+        raise ValueError("Archivo demasiado pequeno para contener firma")
+    return size - SIGNATURE_SIZE, None
+
+
+def _document_components(path, offset, footer):
+    if footer is not None:
+        tree = hash_file_tree(path, footer["leaf_size"], workers=1, limit=offset)
+        return tree["A"], tree["B"], tree["C"], tree["D"]
+    hasher = ToyMDMAHasher()
+    with open(path, 'rb') as f:
+        remaining = offset
+        while remaining:
+            chunk = f.read(min(remaining, 1024 * 1024))
+            if not chunk:
+                raise ValueError("Archivo truncado")
+            hasher.update(chunk)
+            remaining -= len(chunk)
+    return hasher.components()
+
+
+def _prepare(path, old_key, new_key, verify):
+    """
+    Lee la firma actual y calcula la nueva (sin modificar el archivo). Con
+    `verify`, un archivo ya firmado con `new_key` devuelve {"skip": True}.
+    """
+    offset, footer = signature_offset(path)
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        old = f.read(SIGNATURE_SIZE)
+    if len(old) != SIGNATURE_SIZE:
+        raise ValueError("Firma truncada")
+    words = [int.from_bytes(old[i:i + 8], 'little') for i in range(0, SIGNATURE_SIZE, 8)]
+    if verify:
+        components = tuple(_document_components(path, offset, footer))
+        if tuple(w ^ old_key for w in words) != components:
+            if tuple(w ^ new_key for w in words) == components:
+                return {"path": os.path.abspath(path), "skip": True}
+            raise ValueError("La firma no corresponde a la llave anterior")
+    delta = (old_key ^ new_key) & MASK64
+    new = b''.join((w ^ delta).to_bytes(8, 'little') for w in words)
+    return {"path": os.path.abspath(path), "offset": offset, "old": old.hex(), "new": new.hex()}
+
+
+def _apply(entry, fsync):
+    """Escribe la firma nueva si el archivo tiene la anterior (o ya la nueva)."""
+    old, new = bytes.fromhex(entry["old"]), bytes.fromhex(entry["new"])
+    fd = os.open(entry["path"], os.O_RDWR)
+    try:
+        current = os.pread(fd, SIGNATURE_SIZE, entry["offset"])
+        if current == new:
+            return False
+        if current != old:
+            raise ValueError("La firma cambio desde que se registro en el diario")
+        os.pwrite(fd, new, entry["offset"])
+        if fsync:
+            os.fsync(fd)
+        return True
+    finally:
+        os.close(fd)
+
+
+def _journal_append(journal, records):
+    for record in records:
+        journal.write(json.dumps(record) + "\n")
+    journal.flush()
+    os.fsync(journal.fileno())
+
+
+def rekey_many(paths, old_key, new_key, workers=None, journal_path=None,
+               batch_size=DEFAULT_BATCH, fsync=True, verify=True):
+    """
+    Cambia la llave de firma de `paths` de `old_key` a `new_key` en su lugar.
+
+    Args:
+        workers: Hilos para leer y escribir firmas (E/S; por defecto 8)
+        journal_path: Diario de recuperacion (se elimina al terminar bien)
+        batch_size: Archivos por lote (un fsync del diario por lote)
+        fsync: fsync de cada archivo antes de confirmar el lote
+        verify: Rehashea cada documento y comprueba la firma con `old_key`
+            antes de reescribirla; los que no coinciden van a `failed`.
+            False omite el rehash (solo para llaves anteriores ya comprobadas)
+
+    Returns:
+        dict: rekeyed, skipped (ya tenian la llave nueva), failed [(ruta, error)]
+    """
+    journal_path = journal_path or default_journal_path()
+    if os.path.exists(journal_path):
+        raise RuntimeError(f"Existe un diario pendiente en {journal_path}: ejecute recover_rekey primero")
+    summary = {"rekeyed": 0, "skipped": 0, "failed": []}
+    if (old_key ^ new_key) & MASK64 == 0:
+        summary["skipped"] = len(paths)
+        return summary
+
+    def prepare(path):
+        try:
+            return _prepare(path, old_key, new_key, verify)
+        except (OSError, ValueError) as e:
+            return {"path": path, "error": str(e)}
+
+    def apply(entry):
+        try:
+            return _apply(entry, fsync)
+        except (OSError, ValueError) as e:
+            return e
+
+    with ThreadPoolExecutor(max_workers=workers or 8) as pool, \
+            open(journal_path, 'a', encoding='utf-8') as journal:
+        for batch_no, start in enumerate(range(0, len(paths), batch_size)):
+            entries = []
+            for entry in pool.map(prepare, paths[start:start + batch_size]):
+                if "error" in entry:
+                    summary["failed"].append((entry["path"], entry["error"]))
+                elif entry.get("skip"):
+                    summary["skipped"] += 1
+                else:
+                    entries.append(entry)
+            if not entries:
+                continue
+            _journal_append(journal, [dict(entry, batch=batch_no) for entry in entries])
+            for entry, outcome in zip(entries, pool.map(apply, entries)):
+                if isinstance(outcome, Exception):
+                    summary["failed"].append((entry["path"], str(outcome)))
+                elif outcome:
+                    summary["rekeyed"] += 1
+                else:
+                    summary["skipped"] += 1
+            _journal_append(journal, [{"commit": batch_no}])
+    os.remove(journal_path)
+    return summary
+
+
+def recover_rekey(journal_path=None, fsync=True):
+    """
+    Completa un rekey_many interrumpido: rehace las entradas de los lotes sin
+    commit y elimina el diario. Devuelve el mismo resumen que rekey_many.
+    """
+    journal_path = journal_path or default_journal_path()
+    summary = {"rekeyed": 0, "skipped": 0, "failed": []}
+    if not os.path.exists(journal_path):
+        return summary
+    pending = {}
+    with open(journal_path, 'r', encoding='utf-8') as journal:
+        for line in journal:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break  # ultima linea escrita a medias: su lote no tiene commit
+            if "commit" in record:
+                pending.pop(record["commit"], None)
+            else:
+                pending.setdefault(record["batch"], []).append(record)
+    for entries in pending.values():
+        for entry in entries:
+            try:
+                if _apply(entry, fsync):
+                    summary["rekeyed"] += 1
+                else:
+                    summary["skipped"] += 1
+            except (OSError, ValueError) as e:
+                summary["failed"].append((entry["path"], str(e)))
+    os.remove(journal_path)
+    return summary
@@ -0,0 +1,151 @@
+# rekey_test_runner.py
+# Runner de prueba para rekey.py (rotacion de llaves con diario)
+# Simula caidas entre el diario y el commit de un lote y comprueba que
+# recover_rekey deja todos los archivos firmados con la llave nueva
+
+import os
+import sys
+import tempfile
+import rekey
+from isa_pipeline_hash import ISAPipelineHashProcessor
+
+OLD_KEY = 0x1111222233334444
+NEW_KEY = 0x5555666677778888
+NUM_FILES = 5
+
+
+class _Crash(Exception):
+    """Caida simulada: no la capturan rekey_many ni sus hilos."""
+
+
+def make_signed_files(directory, key=OLD_KEY, count=NUM_FILES):
+    processor = ISAPipelineHashProcessor()
+    paths = []
+    for i in range(count):
+        document = os.path.join(directory, f"doc{i}.bin")
+        with open(document, 'wb') as f:
+            f.write(os.urandom(1000 + 77 * i))
+        signed = f"{document}_signed.bin"
+        processor.create_signed_file(document, signed, key)
+        paths.append(signed)
+    return processor, paths
+
+
+def valid_with(processor, paths, key):
+    return all(processor.verify_signed_file(path, key)["valid"] for path in paths)
+
+
+def crash_after(real_apply, writes):
+    """_apply que escribe `writes` firmas y luego simula la caida."""
+    done = []
+
+    def apply(entry, fsync):
+        if len(done) >= writes:
+            raise _Crash()
+        done.append(entry["path"])
+        return real_apply(entry, fsync)
+    return apply
+
+
+def run_with_crash(paths, journal, writes):
+    real_apply = rekey._apply
+    rekey._apply = crash_after(real_apply, writes)
+    try:
+        rekey.rekey_many(paths, OLD_KEY, NEW_KEY, workers=1, journal_path=journal, fsync=False)
+    except _Crash:
+        return True
+    finally:
+        rekey._apply = real_apply
+    return False
+
+
+def check_recover_before_writes():
+    # Caida tras escribir el diario y antes de tocar ningun archivo
+    with tempfile.TemporaryDirectory() as tmp:
+        processor, paths = make_signed_files(tmp)
+        journal = os.path.join(tmp, "diario")
+        crashed = run_with_crash(paths, journal, 0)
+        untouched = valid_with(processor, paths, OLD_KEY)
+        summary = rekey.recover_rekey(journal, fsync=False)
+        return (crashed and untouched and summary == {"rekeyed": NUM_FILES, "skipped": 0, "failed": []}
+                and not os.path.exists(journal) and valid_with(processor, paths, NEW_KEY))
+
+
+def check_recover_mid_batch():
+    # Caida con parte del lote escrito: esas entradas se cuentan como ya hechas
+    with tempfile.TemporaryDirectory() as tmp:
+        processor, paths = make_signed_files(tmp)
+        journal = os.path.join(tmp, "diario")
+        crashed = run_with_crash(paths, journal, 2)
+        summary = rekey.recover_rekey(journal, fsync=False)
+        return (crashed and summary == {"rekeyed": NUM_FILES - 2, "skipped": 2, "failed": []}
+                and valid_with(processor, paths, NEW_KEY))
+
+
+def check_recover_torn_journal():
+    # Ultima linea del diario escrita a medias: su lote no tiene commit y se rehace
+    with tempfile.TemporaryDirectory() as tmp:
+        processor, paths = make_signed_files(tmp)
+        journal = os.path.join(tmp, "diario")
+        run_with_crash(paths, journal, 0)
+        with open(journal, 'a', encoding='utf-8') as f:
+            f.write('{"commit": ')
+        summary = rekey.recover_rekey(journal, fsync=False)
+        return summary["rekeyed"] == NUM_FILES and valid_with(processor, paths, NEW_KEY)
+
+
+def check_pending_journal_blocks_rekey():
+    # Con un diario pendiente rekey_many no empieza otra rotacion
+    with tempfile.TemporaryDirectory() as tmp:
+        processor, paths = make_signed_files(tmp, count=1)
+        journal = os.path.join(tmp, "diario")
+        run_with_crash(paths, journal, 0)
+        try:
+            rekey.rekey_many(paths, OLD_KEY, NEW_KEY, journal_path=journal)
+        except RuntimeError:
+            return valid_with(processor, paths, OLD_KEY)
+        return False
+
+
+def check_wrong_old_key():
+    # Llave anterior equivocada: el archivo va a `failed` y no se modifica
+    with tempfile.TemporaryDirectory() as tmp:
+        processor, paths = make_signed_files(tmp, count=2)
+        with open(paths[0], 'rb') as f:
+            before = f.read()
+        journal = os.path.join(tmp, "diario")
+        summary = rekey.rekey_many(paths[:1], OLD_KEY ^ 1, NEW_KEY, journal_path=journal, fsync=False)
+        with open(paths[0], 'rb') as f:
+            after = f.read()
+        mixed = rekey.rekey_many(paths, OLD_KEY, NEW_KEY, journal_path=journal, fsync=False)
+        return (summary["rekeyed"] == 0 and [p for p, _ in summary["failed"]] == paths[:1]
+                and before == after and not os.path.exists(journal)
+                and mixed == {"rekeyed": 2, "skipped": 0, "failed": []})
+
+
+CASES = [
+    ("caida antes de escribir firmas", check_recover_before_writes),
+    ("caida a mitad del lote", check_recover_mid_batch),
+    ("diario con la ultima linea a medias", check_recover_torn_journal),
+    ("diario pendiente bloquea rekey_many", check_pending_journal_blocks_rekey),
+    ("llave anterior equivocada", check_wrong_old_key),
+]
+
+
+def main():
+    print("Rekey test runner")
+    print("=================")
+
+    failures = 0
+    for name, check in CASES:
+        ok = check()
+        print(f"  {name}: {'OK' if ok else 'FALLO'}")
+        if not ok:
+            failures += 1
+
+    print("Coincide?", "SI" if failures == 0 else f"NO ({failures} fallos)")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
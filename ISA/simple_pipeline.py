@@ -1,5 +1,24 @@
+import struct
+import sys
+
+from paged_memory import PagedMemory
+from toymdma_hasher import toymdma_kernel_block
 from vault import Vault
 
+OP_MDMA = 0xB5
+OP_LLI = 0xAE  # lli rd, imm32: rd = imm32
+OP_LHI = 0xAF  # lhi rd, imm32: rd[63:32] = imm32 (la mitad baja se conserva en WB)
+DEFAULT_MDMA_LATENCY = 4  # ciclos que mdma ocupa la etapa EX
+OP_VSIGNN = 0x95
+DEFAULT_VSIGN_BLOCK_CYCLES = 1  # ciclos de MEM por bloque firmado con vsignn
+
+
+def branch_offset(imm):
+    """Extiende el signo del inmediato de 31 bits de beq/jal (permite saltos hacia atras)."""
+    if imm & 0x40000000:
+        return imm - 0x80000000
+    return imm
+
 class PipelinedRegister:
     def __init__(self):
         self.instruction = 0
@@ -13,11 +32,18 @@ class PipelinedRegister:
         self.imm = 0
         self.opcode = 0
         self.alu_result = 0
+        # Resultado de 4 registros (mdma): se escribe en rd..rd+3 en WB
+        self.quad = None
         self.stage = ""
 
+PIPELINE_LATCHES = ('IF_ID', 'ID_EX', 'EX_MEM', 'MEM_WB')
+
+
 class Simple_Pipeline:
-    def __init__(self, trace=False):
-        self.memory = bytearray(1024)  # 1KB
+    def __init__(self, trace=False, memory=None, mdma_latency=DEFAULT_MDMA_LATENCY,
+                 vsign_block_cycles=DEFAULT_VSIGN_BLOCK_CYCLES):
+        # Por defecto 1KB plano; se puede pasar una PagedMemory para espacios grandes
+        self.memory = bytearray(1024) if memory is None else memory
         self.registers = [0] * 32
         self.pc = 0
         self.cycle = 0
@@ -39,14 +65,154 @@ class Simple_Pipeline:
         self.vault_keys = [0] * 4
         self.vault_inits = [0] * 4
 
+        # Traductor de bloques del modo funcional (se crea al usar run_functional)
+        self.translator = None
+
+        # Modelo de tiempo del acelerador mdma: ciclos restantes en EX
+        self.mdma_latency = mdma_latency
+        self.ex_stall = 0
+        # Modelo de tiempo de vsignn: MEM ocupado proporcional a la longitud
+        self.vsign_block_cycles = vsign_block_cycles
+        self.mem_stall = 0
+
+        # Dispositivos mapeados en memoria (p. ej. dma_engine.DMAEngine)
+        self.devices = []
+
+    @property
+    def mdma_latency(self):
+        return self._mdma_latency
+
+    @mdma_latency.setter
+    def mdma_latency(self, latency):
+        if latency < 1:
+            raise ValueError("La latencia de mdma debe ser de al menos 1 ciclo")
+        self._mdma_latency = latency
+        # Los bloques traducidos llevan las burbujas de mdma ya calculadas
+        if getattr(self, 'translator', None) is not None:
+            self.translator.invalidate()
+
+    @property
+    def memory(self):
+        return self._memory
+
+    @memory.setter
+    def memory(self, memory):
+        """Asocia la memoria y selecciona los accesos de 8 bytes mas rapidos disponibles."""
+        self._memory = memory
+        if getattr(self, 'translator', None) is not None:
+            self.translator.invalidate()
+        self._words = None
+        self._words_end = 0
+        if hasattr(memory, 'read_word'):
+            # PagedMemory: accesos sin slicing ni int.from_bytes
+            self.read_word = memory.read_word
+            self.write_word = memory.write_word
+        else:
+            self._bind_words()
+            self.read_word = self._read_word_bytes
+            self.write_word = self._write_word_bytes
+        # Accesos a la memoria en si (los dispositivos mapeados los envuelven)
+        self._memory_read_word, self._memory_write_word = self.read_word, self.write_word
+        if getattr(self, 'devices', None):
+            self._install_mmio()
+
+    def attach_device(self, device):
+        """
+        Conecta un dispositivo con registros en [device.base, device.end).
+        Los accesos de 8 bytes a ese rango (lw, sw) van a sus registros y
+        device.tick() se llama una vez por ciclo.
+        """
+        device.attach(self)
+        self.devices.append(device)
+        self._install_mmio()
+
+    def _install_mmio(self):
+        """Envuelve read_word/write_word para desviar los rangos de los dispositivos."""
+        read_memory, write_memory = self._memory_read_word, self._memory_write_word
+        devices = tuple(self.devices)
+
+        def read_word(addr):
+            for device in devices:
+                if device.base <= addr < device.end:
+                    return device.read_register(addr - device.base)
+            return read_memory(addr)
+
+        def write_word(addr, value):
+            for device in devices:
+                if device.base <= addr < device.end:
+                    device.write_register(addr - device.base, value & 0xFFFFFFFFFFFFFFFF)
+                    return
+            write_memory(addr, value)
+
+        self.read_word = read_word
+        self.write_word = write_word
+
+    def tick_devices(self, cycles=1):
+        for device in self.devices:
+            device.tick(cycles)
+
+    def _bind_words(self):
+        memory = self._memory
+        if sys.byteorder == 'little' and len(memory) >= 8:
+            # Vista de palabras de 64 bits (orden nativo == little-endian) para
+            # accesos alineados sin crear objetos bytes intermedios
+            self._words = memoryview(memory)[:len(memory) & ~7].cast('Q')
+            self._words_end = len(memory) & ~7
+
+    def _store_bytes(self, addr, data):
+        """
+        Escribe `data` en memoria a partir de `addr`. Un bytearray con la vista
+        de palabras exportada no puede cambiar de tamano: si la escritura lo
+        agranda, la vista se libera antes y se rehace despues.
+        """
+        end = addr + memoryview(data).nbytes
+        words = self._words
+        if words is not None and end > len(self._memory):
+            words.release()
+            self._words = None
+            self._memory[addr:end] = data
+            self._bind_words()
+        else:
+            self._memory[addr:end] = data
+
+    def _read_word_bytes(self, addr):
+        words = self._words
+        if words is not None and not addr & 7 and 0 <= addr < self._words_end:
+            return words[addr >> 3]
+        return int.from_bytes(self._memory[addr:addr+8], 'little')
+
+    def _write_word_bytes(self, addr, value):
+        words = self._words
+        if words is not None and not addr & 7 and 0 <= addr < self._words_end:
+            words[addr >> 3] = value & 0xFFFFFFFFFFFFFFFF
+            return
+        self._store_bytes(addr, value.to_bytes(8, 'little'))
+
     def load_program(self, program):
-        for i, instr in enumerate(program):
-            self.memory[i*8:(i+1)*8] = instr.to_bytes(8, 'little')
+        """
+        Carga un programa en memoria a partir de la direccion 0.
+
+        `program` puede ser una lista de instrucciones de 64 bits o el codigo
+        ya codificado (bytes/memoryview, p. ej. ObjectFile.code), que se copia
+        de una sola vez sin decodificar.
+        """
+        if isinstance(program, (bytes, bytearray, memoryview)):
+            code = memoryview(program)
+            end_addr = code.nbytes
+            self._store_bytes(0, code)
+        else:
+            for i, instr in enumerate(program):
+                self.write_word(i*8, instr)
+            end_addr = len(program) * 8
         self.pc = 0
-        # Marcar el final del programa con una instruccion especial (NOP)
-        end_addr = len(program) * 8
-        if end_addr < len(self.memory):
-            self.memory[end_addr:end_addr+8] = (0).to_bytes(8, 'little')
+        if self.translator is not None:
+            self.translator.invalidate()
+        # Marcar el final del programa con una instruccion especial (NOP); la
+        # memoria plana crece si el programa la llena
+        if isinstance(self._memory, bytearray):
+            self._store_bytes(end_addr, bytes(8))
+        elif end_addr < len(self.memory):
+            self.write_word(end_addr, 0)
 
     def is_pipeline_active(self):
         # Verificar si hay actividad en el pipeline y que el PC no haya llegado al final
@@ -55,7 +221,7 @@ class Simple_Pipeline:
         
         # Verificar si encontramos una instruccion NOP (0x0) que indica fin del programa
         if pc_in_bounds and self.pc < len(self.memory) - 8:
-            current_instr = int.from_bytes(self.memory[self.pc:self.pc+8], 'little')
+            current_instr = self.read_word(self.pc)
             if current_instr == 0:  # NOP indica fin del programa
                 return has_valid_stages  # Solo continuar si hay etapas validas
         
@@ -66,7 +232,7 @@ class Simple_Pipeline:
     # -------------------------
     def IF_stage(self):
         if self.pc < len(self.memory) - 8:  # Asegurar que no leamos fuera de memoria
-            current_instr = int.from_bytes(self.memory[self.pc:self.pc+8], 'little')
+            current_instr = self.read_word(self.pc)
             
             # Si encontramos una instruccion NOP (0x0), detener el fetch
             if current_instr == 0:
@@ -100,11 +266,27 @@ class Simple_Pipeline:
         self.ID_EX.stage = "ID"
         self.IF_ID.valid = False
 
+    def _mdma_round(self):
+        """Ronda ToyMDMA de la mdma en ID_EX con los registros actuales."""
+        rd = self.ID_EX.rd
+        state = [self.registers[r] if r < 32 else 0 for r in range(rd, rd + 4)]
+        return toymdma_kernel_block(*state, self.registers[self.ID_EX.rs1])
+
     def EX_stage(self):
         if not self.ID_EX.valid:
             return
 
         op = self.ID_EX.opcode
+        if op == OP_MDMA and self._mdma_latency > 1:
+            # El acelerador retiene la instruccion en EX durante mdma_latency ciclos.
+            # Los operandos se leen en el primero, como con latencia 1: la latencia
+            # solo cambia los ciclos, nunca el resultado
+            if not self.ex_stall:
+                self.ex_stall = self._mdma_latency
+                self.ID_EX.quad = self._mdma_round()
+            self.ex_stall -= 1
+            if self.ex_stall:
+                return
         # Validar acceso a registros para evitar index out of range
         if self.ID_EX.rs1 >= len(self.registers):
             self.ID_EX.rs1 = 0
@@ -114,6 +296,7 @@ class Simple_Pipeline:
         rs2_val = self.registers[self.ID_EX.rs2]
 
         alu_result = 0
+        quad = None
         # R-type con nuevos opcodes personalizados
         if op == 0xC3:  # add/sub/mul con nuevo opcode
             if self.ID_EX.funct3 == 0x1 and self.ID_EX.funct7 == 0x10:   # add
@@ -147,6 +330,11 @@ class Simple_Pipeline:
                 alu_result = 0
             else:
                 alu_result = rs1_val % imm
+        # Inmediatos de 32 bits (bits 31-0 de la instruccion, sin funct7)
+        elif op == OP_LLI:  # lli rd, imm32
+            alu_result = self.ID_EX.instruction & 0xFFFFFFFF
+        elif op == OP_LHI:  # lhi rd, imm32
+            alu_result = (self.ID_EX.instruction & 0xFFFFFFFF) << 32
         # I-type lw con nuevo opcode
         elif op == 0xA1:  # lw
             alu_result = rs1_val + self.ID_EX.imm
@@ -161,7 +349,7 @@ class Simple_Pipeline:
             # Store return address (PC + 4) in rd, jump to PC + imm
             alu_result = self.ID_EX.pc + 8  # Return address (next instruction)
             # Jump to target address
-            jump_target = self.ID_EX.pc + self.ID_EX.imm
+            jump_target = self.ID_EX.pc + branch_offset(self.ID_EX.imm)
             self.pc = jump_target
             # Invalidate pipeline stages after this instruction
             self.IF_ID.valid = False
@@ -170,7 +358,7 @@ class Simple_Pipeline:
             # Branch if rs1 == rs2
             if rs1_val == rs2_val:
                 # Take branch
-                branch_target = self.ID_EX.pc + self.ID_EX.imm
+                branch_target = self.ID_EX.pc + branch_offset(self.ID_EX.imm)
                 self.pc = branch_target
                 # Invalidate pipeline stages after this instruction
                 self.IF_ID.valid = False
@@ -195,6 +383,24 @@ class Simple_Pipeline:
             print(f"[DEBUG EX_stage vsign] rs2 (x{self.ID_EX.rs2}) value: 0x{self.registers[self.ID_EX.rs2]:X}")
             alu_result = self.registers[self.ID_EX.rs2]
 
+        elif op == 0x93:  # vwrx rs1, rs2 -> llave[x[rs1]] = x[rs2] (cualquier indice, 64 bits)
+            self.vault.write_key(rs1_val, rs2_val)
+            alu_result = 0
+
+        elif op == 0x96:  # vinitx rs1, rs2 -> inicial[x[rs1]] = x[rs2] (64 bits)
+            self.vault.write_init(rs1_val, rs2_val)
+            alu_result = 0
+
+        elif op == 0x94 or op == OP_VSIGNN:  # vsignx/vsignn: indice de llave = x[rs1]
+            alu_result = rs2_val
+
+        # Acelerador ToyMDMA
+        elif op == OP_MDMA:  # mdma rd, rs1 -> ronda del kernel sobre x[rd..rd+3] con bloque x[rs1]
+            # Con latencia > 1 el resultado se calculo en el primer ciclo de EX
+            quad = self.ID_EX.quad if self.ID_EX.quad is not None else self._mdma_round()
+            self.ID_EX.quad = None
+            alu_result = quad[0]
+
         # ensure 64-bit wraparound for any result
         alu_result &= 0xFFFFFFFFFFFFFFFF
 
@@ -213,6 +419,10 @@ class Simple_Pipeline:
         self.EX_MEM.rs1 = self.ID_EX.rs1
         self.EX_MEM.rs2 = self.ID_EX.rs2
         self.EX_MEM.imm = self.ID_EX.imm
+        self.EX_MEM.quad = quad
+        if op == 0x94 or op == OP_VSIGNN:
+            # El indice de llave leido en EX viaja a MEM en el campo imm (32 bits)
+            self.EX_MEM.imm = rs1_val if rs1_val <= 0xFFFFFFFF else 0xFFFFFFFF
         self.EX_MEM.valid = True
         self.EX_MEM.stage = "EX"
         self.ID_EX.valid = False
@@ -226,17 +436,20 @@ class Simple_Pipeline:
             addr = self.EX_MEM.alu_result
             # Validar acceso a memoria
             if 0 <= addr and addr + 8 <= len(self.memory):
-                self.MEM_WB.alu_result = int.from_bytes(self.memory[addr:addr+8], 'little')
+                self.MEM_WB.alu_result = self.read_word(addr)
             else:
                 print(f"[ERROR MEM] lw: direccion fuera de rango addr=0x{addr:X}")
                 self.MEM_WB.alu_result = 0
         elif op == 0xB2:  # sw con nuevo opcode personalizado
             addr = self.EX_MEM.alu_result
-            if 0 <= addr and addr + 8 <= len(self.memory) and self.EX_MEM.rs2 < len(self.registers):
-                data = self.registers[self.EX_MEM.rs2]
-                self.memory[addr:addr+8] = data.to_bytes(8, 'little')
+            # sw rs2, off(rs1): el ensamblador codifica el registro fuente en el campo rd
+            if 0 <= addr and addr + 8 <= len(self.memory):
+                data = self.registers[self.EX_MEM.rd]
+                self.write_word(addr, data)
+                if self.translator is not None:
+                    self.translator.notify_write(addr)
             else:
-                print(f"[ERROR MEM] sw: direccion o registro fuera de rango addr=0x{addr:X} rs2={self.EX_MEM.rs2}")
+                print(f"[ERROR MEM] sw: direccion fuera de rango addr=0x{addr:X}")
             self.MEM_WB.alu_result = 0
 
         # Instrucciones de bóveda
@@ -250,9 +463,9 @@ class Simple_Pipeline:
             value = self.EX_MEM.imm
             self.vault.write_init(key_index, value)
             self.MEM_WB.alu_result = 0
-        elif op == 0x92:  # vsign idx, addr
+        elif op == 0x92 or op == 0x94:  # vsign idx, addr / vsignx (indice desde registro)
             addr = self.EX_MEM.alu_result
-            key_idx = self.EX_MEM.rs1
+            key_idx = self.EX_MEM.rs1 if op == 0x92 else self.EX_MEM.imm
             # Validar rango de memoria e indice de clave
             if not (0 <= addr and addr + 32 <= len(self.memory)):
                 print(f"[ERROR vsign] memoria fuera de rango addr=0x{addr:X}")
@@ -261,7 +474,7 @@ class Simple_Pipeline:
                 print(f"[ERROR vsign] clave fuera de rango key_idx={key_idx}")
                 self.MEM_WB.alu_result = 0
             else:
-                blocks = [int.from_bytes(self.memory[addr + i*8: addr + (i+1)*8], 'little') for i in range(4)]
+                blocks = [self.read_word(addr + i*8) for i in range(4)]
                 print(f"[DEBUG vsign] addr: 0x{addr:X}")
                 print(f"[DEBUG vsign] blocks: {[hex(b) for b in blocks]}")
                 S = self.vault.sign_block(key_idx, blocks)
@@ -269,24 +482,69 @@ class Simple_Pipeline:
                 for i, val in enumerate(S):
                     pos = addr + 4*8 + i*8
                     if 0 <= pos and pos + 8 <= len(self.memory):
-                        self.memory[pos:pos+8] = val.to_bytes(8, 'little')
+                        self.write_word(pos, val)
+                        if self.translator is not None:
+                            self.translator.notify_write(pos)
                 self.MEM_WB.alu_result = 1
 
+        elif op == OP_VSIGNN:  # vsignn rd, rs1, rs2 -> firma x[rs2+1] bloques desde x[rs2]
+            # Como sw, el registro de longitud se lee en MEM
+            count_reg = self.EX_MEM.rs2 + 1
+            count = self.registers[count_reg] if count_reg < 32 else 0
+            cycles = max(1, count * self.vsign_block_cycles)
+            if cycles > 1:
+                # La boveda retiene la instruccion en MEM mientras recorre la region
+                if not self.mem_stall:
+                    self.mem_stall = cycles
+                self.mem_stall -= 1
+                if self.mem_stall:
+                    return
+            self.MEM_WB.alu_result = self.vault_sign_region(self.EX_MEM.alu_result, count, self.EX_MEM.imm)
+
         else:  # R-type (opcodes 0xC3 y 0xF6)
             self.MEM_WB.alu_result = self.EX_MEM.alu_result
 
         self.MEM_WB.rd = self.EX_MEM.rd
+        self.MEM_WB.quad = self.EX_MEM.quad
         self.MEM_WB.opcode = op
         self.MEM_WB.valid = True
         self.MEM_WB.stage = "MEM"
         self.EX_MEM.valid = False
 
+    def vault_sign_region(self, addr, count, key_idx):
+        """
+        vsignn: la boveda recorre `count` bloques desde `addr` con ToyMDMA y
+        escribe una sola firma (S0..S3) justo despues de la region. Devuelve 1
+        si se firmo y 0 si la region o la llave no son validas.
+        """
+        end = addr + count * 8
+        if not (0 <= addr and end + 32 <= len(self.memory)):
+            print(f"[ERROR vsignn] region fuera de rango addr=0x{addr:X} bloques={count}")
+            return 0
+        if key_idx >= len(self.vault.keys):
+            print(f"[ERROR vsignn] clave fuera de rango key_idx={key_idx}")
+            return 0
+        blocks = (word for (word,) in struct.iter_unpack('<Q', self.memory[addr:end]))
+        for i, val in enumerate(self.vault.sign_stream(key_idx, blocks)):
+            self.write_word(end + i*8, val)
+        if self.translator is not None:
+            self.translator.notify_write(end, 32)
+        return 1
+
     def WB_stage(self):
         if not self.MEM_WB.valid:
             return
 
-        if self.MEM_WB.rd != 0:  # x0 nunca cambia
-            self.registers[self.MEM_WB.rd] = self.MEM_WB.alu_result
+        if self.MEM_WB.quad is not None:  # mdma: x[rd..rd+3]
+            for r, value in enumerate(self.MEM_WB.quad, self.MEM_WB.rd):
+                if 0 < r < 32:
+                    self.registers[r] = value
+        elif self.MEM_WB.rd != 0 and self.MEM_WB.opcode != 0xB2:  # x0 nunca cambia; sw no escribe
+            if self.MEM_WB.opcode == OP_LHI:
+                # Escritura parcial: la mitad baja es la del banco de registros en WB
+                self.registers[self.MEM_WB.rd] = (self.registers[self.MEM_WB.rd] & 0xFFFFFFFF) | self.MEM_WB.alu_result
+            else:
+                self.registers[self.MEM_WB.rd] = self.MEM_WB.alu_result
 
         self.MEM_WB.valid = False
         self.MEM_WB.stage = "WB"
@@ -297,10 +555,66 @@ class Simple_Pipeline:
     def step(self):
         self.WB_stage()
         self.MEM_stage()
-        self.EX_stage()
-        self.ID_stage()
-        self.IF_stage()
+        if not self.EX_MEM.valid:  # MEM ocupado por vsignn: EX se detiene
+            self.EX_stage()
+        if not self.ID_EX.valid:  # EX ocupado (mdma o vsignn): ID e IF se detienen
+            self.ID_stage()
+            self.IF_stage()
+        if self.devices:
+            self.tick_devices()
 
         self.cycle += 1
+
+    # -------------------------
+    # Checkpoint / restore
+    # -------------------------
+    def snapshot(self):
+        """
+        Copia en memoria del estado completo: registros, PC, ciclo, latches,
+        memoria y boveda. Sirve para reanudar o bifurcar una ejecucion.
+        """
+        memory = self.memory
+        return {
+            "registers": list(self.registers),
+            "pc": self.pc,
+            "cycle": self.cycle,
+            "ex_stall": self.ex_stall,
+            "mem_stall": self.mem_stall,
+            "latches": {name: dict(vars(getattr(self, name))) for name in PIPELINE_LATCHES},
+            "memory": memory.snapshot() if hasattr(memory, 'snapshot') else bytes(memory),
+            "vault": self.vault.snapshot() if self.vault is not None else None,
+        }
+
+    def restore(self, state):
+        """Restablece un estado obtenido con snapshot() (o de un checkpoint en disco)."""
+        self.registers[:] = state["registers"]
+        self.pc = state["pc"]
+        self.cycle = state["cycle"]
+        self.ex_stall = state.get("ex_stall", 0)
+        self.mem_stall = state.get("mem_stall", 0)
+        for name in PIPELINE_LATCHES:
+            latch = PipelinedRegister()
+            vars(latch).update(state["latches"][name])
+            setattr(self, name, latch)
+        memory = state["memory"]
+        self.memory = PagedMemory.from_snapshot(memory) if isinstance(memory, dict) else bytearray(memory)
+        if state.get("vault") is not None:
+            if self.vault is None:
+                self.vault = Vault()
+            self.vault.restore(state["vault"])
+
+    # -------------------------
+    # Modo funcional
+    # -------------------------
+    def run_functional(self, max_instructions=1000000):
+        """
+        Ejecuta hasta el final del programa con bloques basicos traducidos a
+        funciones Python (ver block_translator.py). El estado final de
+        registros y memoria es el mismo que con step(); los ciclos se estiman.
+        """
+        if self.translator is None:
+            from block_translator import BlockTranslator
+            self.translator = BlockTranslator(self)
+        return self.translator.run(max_instructions)
     
 
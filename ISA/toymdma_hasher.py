@@ -0,0 +1,237 @@
+# toymdma_hasher.py
+# ----------------------------------------------------------
+# Hash ToyMDMA incremental y reanudable
+#
+# El estado de ToyMDMA son cuatro palabras de 64 bits (A, B, C, D) mas la
+# cantidad de bytes ya procesados, asi que el hash se puede continuar en
+# cualquier frontera de 8 bytes. toymdma_kernel_block reproduce el efecto
+# arquitectonico del kernel ensamblado de ISAPipelineHashProcessor (incluidas
+# las lecturas sin forwarding del pipeline), por lo que los resultados
+# coinciden con calculate_hash_from_data.
+# ----------------------------------------------------------
+
+import json
+import os
+import struct
+
+MASK64 = 0xFFFFFFFFFFFFFFFF
+
+# Valores iniciales (A, B, C, D) del hash ToyMDMA
+TOYMDMA_IV = (0x0123456789ABCDEF, 0xFEDCBA9876543210, 0x1111111111111111, 0x2222222222222222)
+
+# Inmediatos del kernel tal como quedan codificados (31 bits)
+KERNEL_ADD = 0x7C15
+KERNEL_MOD = 0xFFFFFFFB & 0x7FFFFFFF
+
+STATE_VERSION = 1
+DEFAULT_CHECKPOINT_BYTES = 64 * 1024 * 1024
+READ_CHUNK = 1024 * 1024
+
+
+def toymdma_kernel_block(A, B, C, D, block):
+    """Un bloque de 64 bits del kernel ToyMDMA (mismo resultado que en el pipeline)."""
+    A = (A + block) & MASK64
+    if block:
+        B = (B * block) & MASK64
+    C ^= block
+    D %= KERNEL_MOD
+    # Estas lecturas ven el valor anterior del registro escrito justo antes
+    return (A + KERNEL_ADD) & MASK64, B ^ A, (C + B) & MASK64, D ^ C
+
+
+class ToyMDMAHasher:
+    """Hasher incremental al estilo de hashlib: update() por partes y digest() al final."""
+
+    name = 'toymdma'
+    digest_size = 32
+    block_size = 8
+
+    def __init__(self, data=None, state=TOYMDMA_IV, offset=0):
+        """
+        Args:
+            data: Datos iniciales opcionales (equivale a llamar update)
+            state: (A, B, C, D) desde el que continuar
+            offset: Bytes ya procesados hasta `state` (multiplo de 8)
+        """
+        if offset % 8:
+            raise ValueError("El estado ToyMDMA solo se puede reanudar en fronteras de 8 bytes")
+        self.A, self.B, self.C, self.D = state
+        self.offset = offset
+        self._pending = b''
+        if data is not None:
+            self.update(data)
+
+    def update(self, data):
+        """
+        Procesa `data` (cualquier objeto bytes-like). Los bloques completos se
+        leen directamente del buffer, sin concatenar ni copiar la entrada; solo
+        se guardan los (<8) bytes finales de un bloque incompleto.
+        """
+        view = memoryview(data).cast('B')
+        size = view.nbytes
+        pos = 0
+        A, B, C, D = self.A, self.B, self.C, self.D
+        if self._pending:
+            need = 8 - len(self._pending)
+            if size < need:
+                self._pending += bytes(view)
+                return
+            block = int.from_bytes(self._pending + bytes(view[:need]), 'little')
+            A, B, C, D = toymdma_kernel_block(A, B, C, D, block)
+            self.offset += 8
+            self._pending = b''
+            pos = need
+        full = (size - pos) & ~7
+        kernel_block = toymdma_kernel_block
+        for (block,) in struct.iter_unpack('<Q', view[pos:pos + full]):
+            A, B, C, D = kernel_block(A, B, C, D, block)
+        self.A, self.B, self.C, self.D = A, B, C, D
+        self.offset += full
+        self._pending = bytes(view[pos + full:])
+
+    def copy(self):
+        """Copia independiente del estado (p. ej. para hashear prefijos comunes una vez)."""
+        other = ToyMDMAHasher.__new__(ToyMDMAHasher)
+        other.A, other.B, other.C, other.D = self.A, self.B, self.C, self.D
+        other.offset = self.offset
+        other._pending = self._pending
+        return other
+
+    def components(self):
+        """(A, B, C, D) finales: el bloque parcial pendiente se rellena con ceros."""
+        if not self._pending:
+            return self.A, self.B, self.C, self.D
+        block = int.from_bytes(self._pending.ljust(8, b'\x00'), 'little')
+        return toymdma_kernel_block(self.A, self.B, self.C, self.D, block)
+
+    def digest(self):
+        """A, B, C, D little-endian (32 bytes, mismo orden que la firma)."""
+        return struct.pack('<4Q', *self.components())
+
+    def hexdigest(self):
+        return self.digest().hex()
+
+    @property
+    def final_hash(self):
+        A, B, C, D = self.components()
+        return A ^ B ^ C ^ D
+
+    def state(self):
+        """Estado reanudable (solo bloques completos; los bytes pendientes no se incluyen)."""
+        return {"A": self.A, "B": self.B, "C": self.C, "D": self.D, "offset": self.offset}
+
+
+def hash_file(file_path, limit=None):
+    """
+    (A, B, C, D) de los primeros `limit` bytes de un archivo (todo si es None),
+    leyendo en bloques de READ_CHUNK sobre un buffer reutilizado.
+    """
+    return _hash_file(file_path, limit, None)[1]
+
+
+def hash_file_with_prefix(file_path, prefix, limit=None):
+    """
+    Como hash_file, pero en la misma pasada obtiene tambien los componentes
+    de los primeros `prefix` bytes. Devuelve (componentes del prefijo,
+    componentes).
+    """
+    return _hash_file(file_path, limit, prefix)
+
+
+def _hash_file(file_path, limit, prefix):
+    with open(file_path, 'rb') as f:
+        remaining = os.fstat(f.fileno()).st_size if limit is None else limit
+        buffer = bytearray(max(1, min(READ_CHUNK, remaining)))
+        view = memoryview(buffer)
+        hasher = ToyMDMAHasher()
+        pos = 0
+        at_prefix = hasher.components() if prefix == 0 else None
+        while remaining:
+            want = min(remaining, len(buffer))
+            if prefix is not None and pos < prefix:
+                want = min(want, prefix - pos)
+            read = f.readinto(view[:want])
+            if not read:
+                raise ValueError("Archivo truncado durante el hash")
+            hasher.update(view[:read])
+            remaining -= read
+            pos += read
+            if pos == prefix:
+                at_prefix = hasher.components()
+    return at_prefix, hasher.components()
+
+
+# ----------------------------------------------------------
+# Hash de archivos reanudable (estado en un archivo auxiliar)
+# ----------------------------------------------------------
+def default_state_path(file_path):
+    return f"{file_path}.mdmastate"
+
+
+def _file_identity(file_path):
+    st = os.stat(file_path)
+    return {"path": os.path.abspath(file_path), "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns, "dev": st.st_dev, "ino": st.st_ino}
+
+
+def save_hash_state(state_path, identity, hasher):
+    record = dict(identity, version=STATE_VERSION, **hasher.state())
+    tmp_path = f"{state_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(record, f)
+    os.replace(tmp_path, state_path)
+
+
+def load_hash_state(state_path, identity):
+    """Devuelve un hasher desde el estado guardado, o None si no aplica a este archivo."""
+    try:
+        with open(state_path, 'r', encoding='utf-8') as f:
+            record = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if record.get("version") != STATE_VERSION:
+        return None
+    if any(record.get(k) != identity[k] for k in ("path", "size", "mtime_ns", "dev", "ino")):
+        return None
+    if not 0 <= record["offset"] <= identity["size"]:
+        return None
+    return ToyMDMAHasher(state=(record["A"], record["B"], record["C"], record["D"]),
+                         offset=record["offset"])
+
+
+def hash_file_resumable(file_path, state_path=None, checkpoint_bytes=DEFAULT_CHECKPOINT_BYTES):
+    """
+    Calcula el hash ToyMDMA de un archivo guardando el estado intermedio cada
+    `checkpoint_bytes`. Si se interrumpe, la siguiente llamada continua desde
+    el ultimo estado guardado (siempre que el archivo no haya cambiado).
+
+    Returns:
+        dict: final_hash, A, B, C, D, resumed_from (bytes que no se rehasharon)
+    """
+    state_path = state_path or default_state_path(file_path)
+    identity = _file_identity(file_path)
+    hasher = load_hash_state(state_path, identity) or ToyMDMAHasher()
+    resumed_from = hasher.offset
+
+    buffer = bytearray(max(1, min(READ_CHUNK, identity["size"] - hasher.offset)))
+    view = memoryview(buffer)
+    with open(file_path, 'rb') as f:
+        f.seek(hasher.offset)
+        since_checkpoint = 0
+        while True:
+            read = f.readinto(buffer)
+            if not read:
+                break
+            hasher.update(view[:read])
+            since_checkpoint += read
+            if since_checkpoint >= checkpoint_bytes:
+                save_hash_state(state_path, identity, hasher)
+                since_checkpoint = 0
+
+    A, B, C, D = hasher.components()
+    try:
+        os.remove(state_path)
+    except OSError:
+        pass
+    return {"final_hash": A ^ B ^ C ^ D, "A": A, "B": B, "C": C, "D": D,
+            "resumed_from": resumed_from}
@@ -0,0 +1,216 @@
+# tree_hash.py
+# ----------------------------------------------------------
+# Modo arbol (Merkle) de ToyMDMA para archivos grandes
+#
+# El modo encadenado procesa los bloques de 8 bytes uno tras otro, asi que un
+# archivo nunca usa mas de un nucleo. En modo arbol el documento se divide en
+# hojas de tamano fijo que se hashean de forma independiente con el mismo
+# kernel (ToyMDMAHasher) y se combinan por pares hasta la raiz:
+#
+#   hoja  = ToyMDMA(LEAF_TAG || datos de la hoja)
+#   nodo  = ToyMDMA(NODE_TAG || A..D izquierdo || A..D derecho)
+#   final = ToyMDMA(ROOT_TAG || tamano || tamano de hoja || A..D raiz)
+#
+# Un nodo sin pareja sube sin cambios al siguiente nivel. Las etiquetas
+# separan hojas, nodos y raiz para que no se puedan confundir entre si.
+#
+# Archivo firmado en modo arbol:
+#   documento | firma (32 bytes) | [indice] | pie (32 bytes)
+#   pie    = magic 'MDMATREE', version u16, flags u16, tamano de hoja u32,
+#            tamano del documento u64, numero de hojas u64
+#   indice = A..D de cada hoja (32 bytes por hoja), presente si FLAG_INDEX.
+#            Permite verificar solo las hojas de un rango (verify_range).
+# ----------------------------------------------------------
+
+import os
+import struct
+
+from toymdma_hasher import ToyMDMAHasher
+
+TREE_MAGIC = b'MDMATREE'
+TREE_VERSION = 1
+DEFAULT_LEAF_SIZE = 1024 * 1024
+
+LEAF_TAG = 0x4D444D414C454146   # 'MDMALEAF'
+NODE_TAG = 0x4D444D414E4F4445   # 'MDMANODE'
+ROOT_TAG = 0x4D444D41524F4F54   # 'MDMAROOT'
+
+FLAG_INDEX = 0x1
+
+SIGNATURE_SIZE = 32
+INDEX_ENTRY_SIZE = 32
+_FOOTER = struct.Struct('<8sHHIQQ')
+FOOTER_SIZE = _FOOTER.size
+
+# Hojas por tarea enviada a cada proceso (reduce el coste de IPC)
+LEAVES_PER_TASK = 16
+
+
+def leaf_digest(data):
+    """A..D de una hoja (acepta cualquier objeto bytes-like)."""
+    hasher = ToyMDMAHasher(struct.pack('<Q', LEAF_TAG))
+    hasher.update(data)
+    return hasher.components()
+
+
+def node_digest(left, right):
+    return ToyMDMAHasher(struct.pack('<9Q', NODE_TAG, *left, *right)).components()
+
+
+def merkle_levels(leaves):
+    """Todos los niveles del arbol, de las hojas (nivel 0) a la raiz."""
+    levels = [list(leaves)]
+    while len(levels[-1]) > 1:
+        level = levels[-1]
+        parents = [node_digest(level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+        if len(level) % 2:
+            parents.append(level[-1])
+        levels.append(parents)
+    return levels
+
+
+def tree_digest(root, size, leaf_size):
+    """A..D final: la raiz ligada al tamano del documento y de las hojas."""
+    return ToyMDMAHasher(struct.pack('<7Q', ROOT_TAG, size, leaf_size, *root)).components()
+
+
+def num_leaves(size, leaf_size):
+    # Un documento vacio tiene una hoja vacia
+    return max(1, (size + leaf_size - 1) // leaf_size)
+
+
+def _hash_leaf_range(path, leaf_size, first, count, limit):
+    """Hashea `count` hojas desde la hoja `first` sin pasar del byte `limit`."""
+    digests = []
+    buffer = bytearray(leaf_size)
+    view = memoryview(buffer)
+    with open(path, 'rb') as f:
+        f.seek(first * leaf_size)
+        for index in range(first, first + count):
+            want = max(0, min(leaf_size, limit - index * leaf_size))
+            read = f.readinto(view[:want]) if want else 0
+            digests.append(leaf_digest(view[:read]))
+    return digests
+
+
+def hash_leaves(path, leaf_size=DEFAULT_LEAF_SIZE, workers=None, limit=None):
+    """
+    Digests de las hojas de los primeros `limit` bytes de `path`.
+
+    Con workers > 1 las hojas se reparten entre procesos (cada uno abre el
+    archivo y lee solo su rango).
+    """
+    if leaf_size <= 0 or leaf_size % 8:
+        raise ValueError("El tamano de hoja debe ser un multiplo positivo de 8")
+    size = os.path.getsize(path) if limit is None else limit
+    total = num_leaves(size, leaf_size)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1 or total < 2:
+        return _hash_leaf_range(path, leaf_size, 0, total, size), size
+
+    # Importado aqui: concurrent.futures es costoso de importar y solo hace falta en paralelo
+    from concurrent.futures import ProcessPoolExecutor
+
+    tasks = [(first, min(LEAVES_PER_TASK, total - first))
+             for first in range(0, total, LEAVES_PER_TASK)]
+    digests = []
+    with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+        futures = [pool.submit(_hash_leaf_range, path, leaf_size, first, count, size)
+                   for first, count in tasks]
+        for future in futures:
+            digests.extend(future.result())
+    return digests, size
+
+
+def hash_file_tree(path, leaf_size=DEFAULT_LEAF_SIZE, workers=None, limit=None):
+    """
+    Hash ToyMDMA en modo arbol de un archivo (o de sus primeros `limit` bytes).
+
+    Returns:
+        dict: final_hash, A, B, C, D, size, leaf_size, leaves (digests de hojas)
+    """
+    leaves, size = hash_leaves(path, leaf_size, workers, limit)
+    A, B, C, D = tree_digest(merkle_levels(leaves)[-1][0], size, leaf_size)
+    return {"final_hash": A ^ B ^ C ^ D, "A": A, "B": B, "C": C, "D": D,
+            "size": size, "leaf_size": leaf_size, "leaves": leaves}
+
+
+def hash_data_tree(data, leaf_size=DEFAULT_LEAF_SIZE):
+    """Igual que hash_file_tree para datos en memoria (secuencial)."""
+    view = memoryview(data).cast('B')
+    size = view.nbytes
+    leaves = [leaf_digest(view[i * leaf_size:(i + 1) * leaf_size])
+              for i in range(num_leaves(size, leaf_size))]
+    A, B, C, D = tree_digest(merkle_levels(leaves)[-1][0], size, leaf_size)
+    return {"final_hash": A ^ B ^ C ^ D, "A": A, "B": B, "C": C, "D": D,
+            "size": size, "leaf_size": leaf_size, "leaves": leaves}
+
+
+# ----------------------------------------------------------
+# Pie del archivo firmado en modo arbol
+# ----------------------------------------------------------
+def pack_footer(size, leaf_size, flags=0):
+    return _FOOTER.pack(TREE_MAGIC, TREE_VERSION, flags, leaf_size, size,
+                        num_leaves(size, leaf_size))
+
+
+def signed_file_size(footer):
+    """Tamano esperado del archivo firmado segun su pie."""
+    index_size = footer["num_leaves"] * INDEX_ENTRY_SIZE if footer["flags"] & FLAG_INDEX else 0
+    return footer["document_size"] + SIGNATURE_SIZE + index_size + FOOTER_SIZE
+
+
+def read_footer(path):
+    """Pie de un archivo firmado en modo arbol, o None si el archivo no lo es."""
+    file_size = os.path.getsize(path)
+    if file_size < SIGNATURE_SIZE + FOOTER_SIZE:
+        return None
+    with open(path, 'rb') as f:
+        f.seek(file_size - FOOTER_SIZE)
+        raw = f.read(FOOTER_SIZE)
+    magic, version, flags, leaf_size, size, leaves = _FOOTER.unpack(raw)
+    if magic != TREE_MAGIC:
+        return None
+    if version != TREE_VERSION:
+        raise ValueError(f"Version de archivo firmado en modo arbol no soportada: {version}")
+    if leaf_size <= 0 or leaf_size % 8 or leaves != num_leaves(size, leaf_size):
+        raise ValueError("Pie de archivo firmado en modo arbol corrupto")
+    return {"version": version, "flags": flags, "leaf_size": leaf_size,
+            "document_size": size, "num_leaves": leaves, "file_size": file_size}
+
+
+def is_tree_signed_file(path):
+    try:
+        return read_footer(path) is not None
+    except ValueError:
+        return True
+
+
+# ----------------------------------------------------------
+# Indice Merkle (digests de las hojas)
+# ----------------------------------------------------------
+def pack_index(leaves):
+    return b''.join(struct.pack('<4Q', *leaf) for leaf in leaves)
+
+
+def read_index(path, footer):
+    """Digests de las hojas guardados en el indice de un archivo firmado."""
+    if not footer["flags"] & FLAG_INDEX:
+        raise ValueError("El archivo firmado no incluye indice Merkle")
+    with open(path, 'rb') as f:
+        f.seek(footer["document_size"] + SIGNATURE_SIZE)
+        raw = f.read(footer["num_leaves"] * INDEX_ENTRY_SIZE)
+    if len(raw) != footer["num_leaves"] * INDEX_ENTRY_SIZE:
+        raise ValueError("Indice Merkle truncado")
+    return list(struct.iter_unpack('<4Q', raw))
+
+
+def leaves_for_range(offset, length, leaf_size, size):
+    """Indices de las hojas que cubren [offset, offset+length) dentro del documento."""
+    if offset < 0 or length < 0:
+        raise ValueError("Rango invalido")
+    end = min(offset + length, size)
+    if offset >= end:
+        return range(0)
+    return range(offset // leaf_size, (end - 1) // leaf_size + 1)
@@ -0,0 +1,107 @@
+# tree_test_runner.py
+# Runner de prueba para verify_range (modo arbol con indice Merkle)
+# Altera hojas dentro y fuera del rango, una entrada del indice, y pide
+# rangos que pasan el final del documento
+
+import os
+import sys
+import tempfile
+from isa_pipeline_hash import ISAPipelineHashProcessor
+from tree_hash import INDEX_ENTRY_SIZE, SIGNATURE_SIZE
+
+KEY = 0x0F1E2D3C4B5A6978
+LEAF_SIZE = 4096
+DOCUMENT_SIZE = 10 * LEAF_SIZE + 1000  # 11 hojas, la ultima parcial
+
+
+def make_signed(directory):
+    document = os.path.join(directory, "doc.bin")
+    with open(document, 'wb') as f:
+        f.write(os.urandom(DOCUMENT_SIZE))
+    signed = document + "_signed.bin"
+    ISAPipelineHashProcessor().create_signed_file_tree(document, signed, KEY,
+                                                       leaf_size=LEAF_SIZE, index=True)
+    return signed
+
+
+def flip_byte(path, offset):
+    with open(path, 'r+b') as f:
+        f.seek(offset)
+        value = f.read(1)[0]
+        f.seek(offset)
+        f.write(bytes([value ^ 0xFF]))
+
+
+def verify_range(offset, length, tamper=None):
+    with tempfile.TemporaryDirectory() as tmp:
+        signed = make_signed(tmp)
+        if tamper is not None:
+            flip_byte(signed, tamper)
+        return ISAPipelineHashProcessor().verify_range(signed, offset, length, KEY)
+
+
+def check_intact():
+    result = verify_range(LEAF_SIZE + 10, 2 * LEAF_SIZE)
+    return (result["valid"] and result["index_valid"] and result["leaves_checked"] == [1, 2, 3]
+            and result["bad_leaves"] == [] and result["bytes_hashed"] == 3 * LEAF_SIZE)
+
+
+def check_tampered_inside():
+    # Un byte cambiado en la hoja 2, dentro del rango pedido
+    result = verify_range(LEAF_SIZE, 3 * LEAF_SIZE, tamper=2 * LEAF_SIZE + 7)
+    return not result["valid"] and result["index_valid"] and result["bad_leaves"] == [2]
+
+
+def check_tampered_outside():
+    # El cambio en la hoja 8 no se ve al verificar solo las hojas 0 y 1
+    result = verify_range(0, 2 * LEAF_SIZE, tamper=8 * LEAF_SIZE)
+    return result["valid"] and result["leaves_checked"] == [0, 1]
+
+
+def check_tampered_index():
+    # Una entrada del indice alterada cambia la raiz: la firma ya no coincide
+    entry = DOCUMENT_SIZE + SIGNATURE_SIZE + 5 * INDEX_ENTRY_SIZE
+    result = verify_range(0, LEAF_SIZE, tamper=entry)
+    return not result["valid"] and not result["index_valid"] and result["bad_leaves"] == []
+
+
+def check_partly_past_end():
+    # Solo se verifican las hojas que existen; la ultima es parcial
+    result = verify_range(9 * LEAF_SIZE, 4 * LEAF_SIZE)
+    return (result["valid"] and result["leaves_checked"] == [9, 10]
+            and result["bytes_hashed"] == LEAF_SIZE + 1000)
+
+
+def check_wholly_past_end():
+    result = verify_range(DOCUMENT_SIZE + 8, LEAF_SIZE)
+    return (result["valid"] and result["index_valid"] and result["leaves_checked"] == []
+            and result["bytes_hashed"] == 0)
+
+
+CASES = [
+    ("rango intacto", check_intact),
+    ("hoja alterada dentro del rango", check_tampered_inside),
+    ("hoja alterada fuera del rango", check_tampered_outside),
+    ("indice alterado", check_tampered_index),
+    ("rango que pasa el final", check_partly_past_end),
+    ("rango despues del final", check_wholly_past_end),
+]
+
+
+def main():
+    print("verify_range test runner")
+    print("========================")
+
+    failures = 0
+    for name, check in CASES:
+        ok = check()
+        print(f"  {name}: {'OK' if ok else 'FALLO'}")
+        if not ok:
+            failures += 1
+
+    print("Coincide?", "SI" if failures == 0 else f"NO ({failures} fallos)")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,60 @@
+# unroll_test_runner.py
+# Runner de prueba para el kernel ToyMDMA desenrollado (.macro/.rept)
+# Compara A, B, C, D del kernel desenrollado (y de su variante con la
+# instruccion fusionada mdma, y del kernel alimentado por DMA) contra el
+# camino bloque a bloque
+
+import os
+import sys
+from isa_pipeline_hash import ISAPipelineHashProcessor
+
+# Longitudes que cubren bloques completos, bloques parciales, restos del
+# desenrollado y bloques en cero (saltos tomados en el kernel)
+DATA_LENGTHS = [1, 8, 15, 32, 64, 100, 333]
+UNROLL_FACTORS = [1, 2, 4, 8]
+# Ranuras pequenas para ejercitar la vuelta del anillo y la ranura parcial
+DMA_CHUNK_SIZES = [16, 64]
+
+
+def make_data(length, seed):
+    data = bytearray(os.urandom(length))
+    # Insertar bloques en cero para ejercitar los beq del kernel
+    if seed % 2 == 0 and length >= 16:
+        data[0:16] = b'\x00' * 16
+    return bytes(data)
+
+
+def main():
+    print("ToyMDMA unroll test runner")
+    print("==========================")
+
+    processor = ISAPipelineHashProcessor()
+    failures = 0
+    for seed, length in enumerate(DATA_LENGTHS):
+        data = make_data(length, seed)
+        expected = processor.calculate_hash_from_data(data)
+        for unroll, fused in ((u, f) for u in UNROLL_FACTORS for f in (False, True)):
+            result = processor.calculate_hash_unrolled(data, unroll=unroll, fused=fused)
+            same = all(result[k] == expected[k] for k in ("A", "B", "C", "D"))
+            status = "OK" if same else "FALLO"
+            kernel = "mdma" if fused else "base"
+            print(f"  {length:4d} bytes, unroll={unroll}, {kernel}: {status} "
+                  f"(A=0x{result['A']:016X}, pasos={result['steps']})")
+            if not same:
+                failures += 1
+                print(f"    esperado A..D: {[hex(expected[k]) for k in ('A', 'B', 'C', 'D')]}")
+                print(f"    obtenido A..D: {[hex(result[k]) for k in ('A', 'B', 'C', 'D')]}")
+        for chunk_size in DMA_CHUNK_SIZES:
+            result = processor.calculate_hash_dma(data, chunk_size=chunk_size)
+            same = all(result[k] == expected[k] for k in ("A", "B", "C", "D"))
+            print(f"  {length:4d} bytes, dma chunk={chunk_size}: {'OK' if same else 'FALLO'} "
+                  f"(A=0x{result['A']:016X}, pasos={result['steps']})")
+            if not same:
+                failures += 1
+
+    print("Coincide?", "SI" if failures == 0 else f"NO ({failures} fallos)")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
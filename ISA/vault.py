@@ -1,8 +1,41 @@
 # vault.py
 # ----------------------------------------------------------
 # Simulacion de la boveda segura para la ISA personalizada
+#
+# La boveda puede actuar como almacen de llaves (keystore): miles de llaves
+# numeradas, con nombre opcional y huella, que se cargan de un archivo
+# compacto. Desde la ISA se accede a cualquiera con un indice en registro
+# (vwrx / vsignx), no solo con el campo de 2 bits de vwr.
+#
+# Archivo de keystore (little-endian):
+#   cabecera : magic 'VKST', version u16, reservado u16, num_llaves u32,
+#              bytes de nombres u32
+#   inits    : 4 x u64 (A, B, C, D)
+#   llaves   : num_llaves x u64
+#   nombres  : JSON {nombre: indice} en UTF-8 (puede estar vacio)
 # ----------------------------------------------------------
 
+import hashlib
+import json
+import os
+import struct
+import sys
+from array import array
+
+KEYSTORE_MAGIC = b'VKST'
+KEYSTORE_VERSION = 1
+# Limite de llaves: el checkpoint del simulador guarda la cantidad en 16 bits
+MAX_KEYS = 0xFFFF
+
+_KEYSTORE_HEADER = struct.Struct('<4sHHII')
+
+
+def key_fingerprint(value):
+    """Huella corta de una llave (identifica la llave sin exponer su valor)."""
+    data = b'toymdma-key:' + (value & 0xFFFFFFFFFFFFFFFF).to_bytes(8, 'little')
+    return hashlib.sha256(data).hexdigest()[:16]
+
+
 def rol64(x, r):
     """Rotación a la izquierda de 64 bits."""
     x &= 0xFFFFFFFFFFFFFFFF
@@ -40,10 +73,16 @@ class Vault:
     - Solo las instrucciones autorizadas (vwr, vinit, vsign) pueden operar con ellas.
     """
     def __init__(self, num_keys=4):
-        # Cuatro llaves privadas (K0–K3)
+        if not 0 < num_keys <= MAX_KEYS:
+            raise ValueError(f"La boveda admite entre 1 y {MAX_KEYS} llaves")
+        # Llaves privadas (K0–K3 por defecto; miles si se usa como keystore)
         self.keys = [0] * num_keys
         # Cuatro valores iniciales para el hash (A,B,C,D)
-        self.inits = [0] * num_keys
+        self.inits = [0] * 4
+        # Nombre -> indice de llave (opcional, busqueda O(1))
+        self.names = {}
+        # Huella -> indice, construido al pedirlo y descartado al cambiar una llave
+        self._fingerprints = None
 
     # ----------------------------------------------------------
     # Métodos de escritura segura
@@ -52,12 +91,69 @@ class Vault:
         """Guarda una llave privada en la boveda."""
         if 0 <= index < len(self.keys):
             self.keys[index] = value & 0xFFFFFFFFFFFFFFFF
+            self._fingerprints = None
 
     def write_init(self, index, value):
         """Guarda un valor inicial (A/B/C/D) para el hash."""
         if 0 <= index < len(self.inits):
             self.inits[index] = value & 0xFFFFFFFFFFFFFFFF
 
+    def key_fingerprint(self, index):
+        """Huella de la llave `index` (None si el indice no existe)."""
+        if 0 <= index < len(self.keys):
+            return key_fingerprint(self.keys[index])
+        return None
+
+    # ----------------------------------------------------------
+    # Keystore: llaves numeradas y con nombre
+    # ----------------------------------------------------------
+    def add_key(self, value, name=None):
+        """Agrega una llave al final de la boveda y devuelve su indice."""
+        if len(self.keys) >= MAX_KEYS:
+            raise ValueError(f"La boveda ya tiene el maximo de {MAX_KEYS} llaves")
+        if name is not None and name in self.names:
+            raise ValueError(f"Ya existe una llave con nombre '{name}'")
+        index = len(self.keys)
+        self.keys.append(value & 0xFFFFFFFFFFFFFFFF)
+        if name is not None:
+            self.names[name] = index
+        self._fingerprints = None
+        return index
+
+    def name_key(self, index, name):
+        """Asocia `name` a la llave `index` (reemplaza un nombre anterior igual)."""
+        if not 0 <= index < len(self.keys):
+            raise IndexError(f"Indice de llave fuera de rango: {index}")
+        self.names[name] = index
+
+    def index_of(self, name):
+        """Indice de la llave con nombre `name` (KeyError si no existe)."""
+        return self.names[name]
+
+    def index_for_fingerprint(self, fingerprint):
+        """Indice de la primera llave con esa huella, o None."""
+        if self._fingerprints is None:
+            table = {}
+            for index, value in enumerate(self.keys):
+                table.setdefault(key_fingerprint(value), index)
+            self._fingerprints = table
+        return self._fingerprints.get(fingerprint)
+
+    def __len__(self):
+        return len(self.keys)
+
+    # ----------------------------------------------------------
+    # Estado para checkpoints del simulador
+    # ----------------------------------------------------------
+    def snapshot(self):
+        return {"keys": list(self.keys), "inits": list(self.inits), "names": dict(self.names)}
+
+    def restore(self, state):
+        self.keys = list(state["keys"])
+        self.inits = list(state["inits"])
+        self.names = dict(state.get("names", {}))
+        self._fingerprints = None
+
     # ----------------------------------------------------------
     # Función principal de firmado seguro
     # ----------------------------------------------------------
@@ -71,6 +167,14 @@ class Vault:
         Salida:
           - Lista de 4 palabras (S0..S3) firmadas con la llave privada
         """
+        return self.sign_stream(key_idx, data_blocks)
+
+    def sign_stream(self, key_idx, data_blocks):
+        """
+        Igual que sign_block, pero para cualquier numero de bloques: los
+        bloques (iterable de enteros de 64 bits) se procesan a medida que
+        llegan y solo se devuelve la firma final (usado por vsignn).
+        """
         if not (0 <= key_idx < len(self.keys)):
             return [0, 0, 0, 0]
 
@@ -82,7 +186,7 @@ class Vault:
         C = self.inits[2] if self.inits[2] else 0x0011223344556677
         D = self.inits[3] if self.inits[3] else 0x8899AABBCCDDEEFF
 
-        # Procesar los 4 bloques secuencialmente
+        # Procesar los bloques secuencialmente
         for blk in data_blocks:
             A, B, C, D = toy_mdma_hash_block(blk, A, B, C, D)
 
@@ -114,3 +218,53 @@ class Vault:
             return [0, 0, 0, 0]
         K = self.keys[key_idx]
         return [ (c ^ K) & 0xFFFFFFFFFFFFFFFF for c in components ]
+
+
+# ----------------------------------------------------------
+# Archivo de keystore
+# ----------------------------------------------------------
+def save_keystore(vault, path):
+    """Guarda llaves, valores iniciales y nombres de `vault` (escritura atomica)."""
+    keys = array('Q', vault.keys)
+    inits = array('Q', vault.inits)
+    if sys.byteorder != 'little':
+        keys.byteswap()
+        inits.byteswap()
+    names = json.dumps(vault.names, separators=(',', ':')).encode('utf-8') if vault.names else b''
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(_KEYSTORE_HEADER.pack(KEYSTORE_MAGIC, KEYSTORE_VERSION, 0, len(keys), len(names)))
+        f.write(inits.tobytes())
+        f.write(keys.tobytes())
+        f.write(names)
+    os.replace(tmp_path, path)
+
+
+def load_keystore(path):
+    """Crea una Vault con el contenido de un archivo de keystore."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if len(data) < _KEYSTORE_HEADER.size + 32:
+        raise ValueError("Archivo de keystore demasiado pequeno")
+    magic, version, _, num_keys, names_size = _KEYSTORE_HEADER.unpack_from(data)
+    if magic != KEYSTORE_MAGIC:
+        raise ValueError("No es un archivo de keystore de la boveda")
+    if version != KEYSTORE_VERSION:
+        raise ValueError(f"Version de keystore no soportada: {version}")
+    keys_start = _KEYSTORE_HEADER.size + 32
+    names_start = keys_start + 8 * num_keys
+    if len(data) != names_start + names_size or not 0 < num_keys <= MAX_KEYS:
+        raise ValueError("Archivo de keystore corrupto")
+
+    # Las llaves se leen de una vez como arreglo de u64 (sin un unpack por llave)
+    inits = array('Q', data[_KEYSTORE_HEADER.size:keys_start])
+    keys = array('Q', data[keys_start:names_start])
+    if sys.byteorder != 'little':
+        keys.byteswap()
+        inits.byteswap()
+    vault = Vault(1)
+    vault.keys = keys.tolist()
+    vault.inits = inits.tolist()
+    if names_size:
+        vault.names = json.loads(data[names_start:].decode('utf-8'))
+    return vault
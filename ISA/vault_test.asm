@@ -1,5 +1,5 @@
 # vault_test.asm
-# Prueba de la bóveda Vault ISA: vwr, vinit, vsign
+# Prueba de la bóveda Vault ISA: li64, vwrx, vinitx, vsign
 # Objetivo: Escribir llave privada en la bóveda, inicializar A/B/C/D,
 # preparar 4 bloques de datos en memoria y ejecutar vsign.
 #
@@ -8,18 +8,32 @@
 #   vwr rd, imm      -> rd (número de registro) indica índice de key (0..3)
 #                      imm es la llave (inmediato) o se acepta vwr rd, rs1
 #   vinit rd, imm    -> rd indica índice init (0..3), imm es valor inicial
+#   vinitx rs1, rs2  -> como vinit, con índice x[rs1] y valor de 64 bits x[rs2]
 #   vsign rd, rs1, rs2 -> firma usando key index en rs1 (valor en registro),
 #                         datos a firmar empiezan en dirección contenida en rs2.
 #
 
-# --- Carga llave privada K0 directamente (vwr admite inmediato) ---
-vwr x0, 0x123456789ABCDEF0   # escribe llave privada K0 en slot 0
+# --- Carga llave privada K0 ---
+# vwr solo admite un inmediato de 31 bits: la llave completa de 64 bits se
+# arma con li64 (lli + lhi) y se escribe con vwrx (indice en x0 = 0).
+li64 x7, 0x123456789ABCDEF0   # x7 = llave privada K0 (dos instrucciones)
 
 # --- Inicializa valores A,B,C,D en la bóveda ---
-vinit x0, 0x0123456789ABCDEF  # init A  -> index 0 (rd = x0 -> 0)
-vinit x1, 0x0F0E0D0C0B0A0908  # init B  -> index 1 (rd = x1 -> 1)
-vinit x2, 0x0011223344556677  # init C  -> index 2 (rd = x2 -> 2)
-vinit x3, 0x8899AABBCCDDEEFF  # init D  -> index 3 (rd = x3 -> 3)
+# vinit tambien se limita a 31 bits: los valores se arman con li64 y se
+# escriben con vinitx (indice y valor en registros).
+li64 x8, 0x0123456789ABCDEF   # valor inicial A
+li64 x9, 0x0F0E0D0C0B0A0908   # valor inicial B
+li64 x10, 0x0011223344556677  # valor inicial C
+li64 x11, 0x8899AABBCCDDEEFF  # valor inicial D
+addi x12, x0, 1               # indices 1..3 (el 0 es x0)
+addi x13, x0, 2
+addi x14, x0, 3
+vinitx x0, x8                 # init A  -> index 0
+vinitx x12, x9                # init B  -> index 1
+vinitx x13, x10               # init C  -> index 2
+vinitx x14, x11               # init D  -> index 3
+
+vwrx x0, x7                   # escribe K0 en el slot 0 (lhi ya hizo WB)
 
 # --- Prepara dirección base donde estarán los 4 bloques (en memoria) ---
 # Usamos un registro para contener la dirección base de los 4 bloques a firmar.
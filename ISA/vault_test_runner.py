@@ -3,9 +3,11 @@
 # Ensambla, carga datos en memoria, ejecuta pipeline y muestra resultados
 
 import os
+import tempfile
 import time
 from assembler import Assembler
 from simple_pipeline import Simple_Pipeline
+from vault import Vault, load_keystore, save_keystore
 
 ASM_PATH = os.path.join(os.path.dirname(__file__), "vault_test.asm")
 
@@ -29,10 +31,41 @@ def write_blocks_to_memory(mem, base_addr, blocks):
         addr = base_addr + i*8
         mem[addr:addr+8] = int.to_bytes(blk & 0xFFFFFFFFFFFFFFFF, 8, 'little')
 
+def check_keystore_round_trip():
+    """save_keystore -> load_keystore conserva llaves, inits y nombres."""
+    vault = Vault()
+    vault.inits = [0x0123456789ABCDEF, 0x0F0E0D0C0B0A0908, 0x0011223344556677, 0x8899AABBCCDDEEFF]
+    vault.write_key(0, 0xFFFFFFFFFFFFFFFF)
+    for i in range(3000):
+        vault.add_key((i * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF, name=f"llave-{i}" if i % 7 == 0 else None)
+    vault.name_key(2, "contraseña")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "boveda.vkst")
+        save_keystore(vault, path)
+        loaded = load_keystore(path)
+        leftovers = os.listdir(tmp)
+        # Un keystore truncado se rechaza en lugar de cargar llaves a medias
+        with open(path, 'rb') as f:
+            data = f.read()
+        with open(path, 'wb') as f:
+            f.write(data[:-5])
+        try:
+            load_keystore(path)
+            truncated_rejected = False
+        except ValueError:
+            truncated_rejected = True
+    return (loaded.keys == vault.keys and loaded.inits == vault.inits and loaded.names == vault.names
+            and loaded.index_of("contraseña") == 2
+            and loaded.index_for_fingerprint(vault.key_fingerprint(2999)) == 2999
+            and leftovers == ["boveda.vkst"] and truncated_rejected)
+
 def main():
     print("Vault ISA test runner")
     print("=====================")
 
+    keystore_ok = check_keystore_round_trip()
+    print(f"Keystore ida y vuelta: {'OK' if keystore_ok else 'FALLO'}")
+
     # 1) Leer archivo de prueba ASM
     if not os.path.exists(ASM_PATH):
         print(f"ERROR: No se encuentra {ASM_PATH}")
@@ -114,7 +147,7 @@ def main():
         print("Firma esperada:")
         for i, val in enumerate(expected_signature):
             print(f"  S{i}: 0x{val:016X}")
-        print("Coincide?", "SI" if signature == expected_signature else "NO")
+        print("Coincide?", "SI" if signature == expected_signature and keystore_ok else "NO")
     else:
         print("No se pudo leer la key desde pipeline (estructura diferente). "
               "Verifica implementación de bóveda en simple_pipeline.py")
@@ -2,11 +2,14 @@ from isa_pipeline_hash import ISAPipelineHashProcessor
 from vault import Vault
 
 class VerificadorBoveda:
-    def __init__(self, pipeline_processor: ISAPipelineHashProcessor = None):
+    def __init__(self, pipeline_processor: ISAPipelineHashProcessor = None, cache=None):
         if pipeline_processor is None:
             self.processor = ISAPipelineHashProcessor()
         else:
             self.processor = pipeline_processor
+        # Optional VerificationCache: unchanged files are not re-verified
+        if cache is not None:
+            self.processor.verification_cache = cache
         # Ensure a vault exists on the processor pipeline
         if not hasattr(self.processor.pipeline, 'vault') or self.processor.pipeline.vault is None:
             self.processor.pipeline.vault = Vault()
@@ -26,6 +29,19 @@ class VerificadorBoveda:
         result = self.processor.verify_signed_file(signed_file, key={'use_vault': True, 'vault_index': vault_index})
         return result
 
+    def verify_detached_with_vault(self, original_file, sig_path=None, vault_index=None):
+        """Verify `original_file` against its detached .sig using a vault key.
+
+        Without `vault_index`, the key index recorded in the .sig file is used.
+        """
+        key = None if vault_index is None else {'use_vault': True, 'vault_index': vault_index}
+        return self.processor.verify_detached_signature(original_file, sig_path, key=key)
+
     def recover_components_from_signature_with_key(self, signature, key):
         """Given a signature and a key, recover the original A,B,C,D by XOR'ing with key."""
         return tuple(s ^ key for s in signature)
+
+    def cache_stats(self):
+        """Hit/miss statistics of the verification cache (None when no cache is attached)."""
+        cache = self.processor.verification_cache
+        return cache.stats() if cache is not None else None
@@ -0,0 +1,209 @@
+# verification_cache.py
+# ----------------------------------------------------------
+# Cache persistente de veredictos de verificacion (SQLite)
+#
+# La clave es la identidad del archivo firmado (ruta, tamano, mtime_ns,
+# inodo) junto con el indice de la boveda y la huella de la llave usada. Un
+# acierto devuelve el resultado anterior solo con os.stat, sin leer el
+# contenido. Si el archivo cambia (tamano, mtime o inodo) o la llave cambia
+# (otra huella), la entrada deja de coincidir y se vuelve a verificar.
+#
+# Solo se guarda el veredicto y campos no secretos (_CACHED_FIELDS): nunca la
+# llave, la firma ni A..D, de los que se deduce la llave (K = S0 ^ A).
+#
+# Expulsion: LRU cuando se supera max_entries y TTL opcional en segundos. Los
+# accesos (last_used) se acumulan en memoria y se escriben por lotes.
+# ----------------------------------------------------------
+
+import json
+import os
+import sqlite3
+import time
+
+DEFAULT_CACHE_PATH = os.environ.get(
+    'ISA_VERIFY_CACHE',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '.verify_cache.sqlite'))
+DEFAULT_MAX_ENTRIES = 10000
+
+# Indice usado cuando la verificacion no usa la boveda (llave local o explicita)
+NO_VAULT_INDEX = -1
+
+# Campos del resultado que se guardan en la cache
+_CACHED_FIELDS = ("valid", "document_size", "mode", "vault_verification")
+
+# Version del esquema (PRAGMA user_version); la 0 guardaba el resultado completo
+_SCHEMA_VERSION = 1
+
+# Accesos pendientes a partir de los cuales se escriben los last_used
+_TOUCH_BATCH = 256
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS verdicts (
+    path TEXT NOT NULL,
+    vault_index INTEGER NOT NULL,
+    key_fingerprint TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    inode INTEGER NOT NULL,
+    valid INTEGER NOT NULL,
+    result TEXT NOT NULL,
+    created REAL NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (path, vault_index, key_fingerprint)
+)
+"""
+
+
+def file_identity(path):
+    """(ruta absoluta, tamano, mtime_ns, inodo) de `path` sin leer su contenido."""
+    st = os.stat(path)
+    return os.path.abspath(path), st.st_size, st.st_mtime_ns, st.st_ino
+
+
+class VerificationCache:
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_entries=DEFAULT_MAX_ENTRIES, ttl=None):
+        """
+        Args:
+            path: Archivo SQLite de la cache (':memory:' para una cache temporal)
+            max_entries: Entradas maximas antes de expulsar las menos usadas
+            ttl: Segundos de validez de un veredicto (None = sin caducidad)
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path)
+        self._db.execute(_SCHEMA)
+        if self._db.execute("PRAGMA user_version").fetchone()[0] < _SCHEMA_VERSION:
+            # Las entradas de la version 0 incluian la llave y la firma: se descartan
+            self._db.execute("DELETE FROM verdicts")
+            self._db.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+            self._db.commit()
+            self._db.execute("VACUUM")
+        self._db.commit()
+        # Accesos aun no escritos: (ruta, indice, huella) -> last_used
+        self._touched = {}
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+    def get(self, signed_file, vault_index, key_fingerprint):
+        """Resultado guardado para el archivo y la llave, o None si no hay uno vigente."""
+        try:
+            path, size, mtime_ns, inode = file_identity(signed_file)
+        except OSError:
+            self.misses += 1
+            return None
+        row = self._db.execute(
+            "SELECT size, mtime_ns, inode, result, created FROM verdicts"
+            " WHERE path = ? AND vault_index = ? AND key_fingerprint = ?",
+            (path, vault_index, key_fingerprint)).fetchone()
+        now = time.time()
+        if row is None or row[:3] != (size, mtime_ns, inode) or self._expired(row[4], now):
+            if row is not None:
+                self._delete(path, vault_index, key_fingerprint)
+                self.evictions += 1
+            self.misses += 1
+            return None
+        self._touched[(path, vault_index, key_fingerprint)] = now
+        if len(self._touched) >= _TOUCH_BATCH:
+            self._flush_touches()
+            self._db.commit()
+        self.hits += 1
+        return json.loads(row[3])
+
+    def put(self, signed_file, vault_index, key_fingerprint, result, identity=None):
+        """
+        Guarda el resultado de verificar `signed_file` con la llave indicada.
+
+        `identity` es file_identity() tomada antes de verificar. Si el archivo
+        cambio mientras se verificaba, el veredicto no se guarda y se
+        devuelve False.
+        """
+        try:
+            current = file_identity(signed_file)
+        except OSError:
+            return False
+        if identity is not None and tuple(identity) != current:
+            return False
+        path, size, mtime_ns, inode = current
+        stored = {k: result[k] for k in _CACHED_FIELDS if k in result}
+        now = time.time()
+        self._db.execute(
+            "INSERT OR REPLACE INTO verdicts VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (path, vault_index, key_fingerprint, size, mtime_ns, inode,
+             int(bool(result.get("valid"))), json.dumps(stored), now, now))
+        self.stores += 1
+        self._evict(now)
+        self._db.commit()
+        return True
+
+    def _flush_touches(self):
+        if self._touched:
+            self._db.executemany(
+                "UPDATE verdicts SET last_used = ? WHERE path = ? AND vault_index = ? AND key_fingerprint = ?",
+                [(now, *key) for key, now in self._touched.items()])
+            self._touched.clear()
+
+    def _expired(self, created, now):
+        return self.ttl is not None and now - created > self.ttl
+
+    def _delete(self, path, vault_index, key_fingerprint):
+        self._db.execute(
+            "DELETE FROM verdicts WHERE path = ? AND vault_index = ? AND key_fingerprint = ?",
+            (path, vault_index, key_fingerprint))
+        self._db.commit()
+
+    def _evict(self, now):
+        self._flush_touches()
+        if self.ttl is not None:
+            cursor = self._db.execute("DELETE FROM verdicts WHERE created < ?", (now - self.ttl,))
+            self.evictions += max(0, cursor.rowcount)
+        excess = len(self) - self.max_entries
+        if excess > 0:
+            cursor = self._db.execute(
+                "DELETE FROM verdicts WHERE rowid IN"
+                " (SELECT rowid FROM verdicts ORDER BY last_used LIMIT ?)", (excess,))
+            self.evictions += max(0, cursor.rowcount)
+
+    def invalidate_key(self, vault_index=None, key_fingerprint=None):
+        """
+        Borra los veredictos de un indice de boveda y/o de una huella de llave
+        (sin argumentos borra todo). Las llaves nuevas ya no coinciden por su
+        huella; esto solo libera antes las entradas viejas.
+        """
+        clauses, params = [], []
+        if vault_index is not None:
+            clauses.append("vault_index = ?")
+            params.append(vault_index)
+        if key_fingerprint is not None:
+            clauses.append("key_fingerprint = ?")
+            params.append(key_fingerprint)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        cursor = self._db.execute(f"DELETE FROM verdicts{where}", params)
+        self._db.commit()
+        return cursor.rowcount
+
+    def clear(self):
+        self.invalidate_key()
+
+    def __len__(self):
+        return self._db.execute("SELECT COUNT(*) FROM verdicts").fetchone()[0]
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "stores": self.stores,
+            "evictions": self.evictions,
+        }
+
+    def close(self):
+        self._flush_touches()
+        self._db.commit()
+        self._db.close()
@@ -0,0 +1,172 @@
+# verification_cache_test_runner.py
+# Runner de prueba para VerificationCache (aciertos, invalidacion y expulsion)
+
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from isa_pipeline_hash import ISAPipelineHashProcessor
+from verification_cache import NO_VAULT_INDEX, VerificationCache, file_identity
+
+KEY = 0x0F1E2D3C4B5A6978
+FINGERPRINT = "huella"
+RESULT = {"valid": True, "document_size": 10, "mode": "rehash", "vault_verification": False}
+
+
+def make_file(directory, name, data=b"documento de prueba"):
+    path = os.path.join(directory, name)
+    with open(path, 'wb') as f:
+        f.write(data)
+    return path
+
+
+def check_hit_without_secrets():
+    # El segundo verify es un acierto y la cache no guarda llave, firma ni A..D
+    with tempfile.TemporaryDirectory() as tmp:
+        document = make_file(tmp, "doc.bin", os.urandom(3000))
+        processor = ISAPipelineHashProcessor()
+        signed = processor.create_signed_file(document, document + "_signed.bin", KEY)["signed_file"]
+        processor.verification_cache = cache = VerificationCache(os.path.join(tmp, "cache.sqlite"))
+        first = processor.verify_signed_file(signed, KEY)
+        second = processor.verify_signed_file(signed, KEY)
+        stored = cache._db.execute("SELECT result FROM verdicts").fetchone()[0]
+        cache.close()
+        return (first["valid"] and not first["cached"] and second["valid"] and second["cached"]
+                and cache.hits == 1 and cache.misses == 1
+                and set(json.loads(stored)) <= {"valid", "document_size", "mode", "vault_verification"})
+
+
+def check_invalidation():
+    # Cambiar tamano, mtime o inodo (o la llave) invalida el veredicto
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = VerificationCache(':memory:')
+        path = make_file(tmp, "firmado.bin")
+        outcomes = []
+
+        def stale_after(change):
+            cache.put(path, NO_VAULT_INDEX, FINGERPRINT, RESULT)
+            if cache.get(path, NO_VAULT_INDEX, FINGERPRINT) is None:
+                return False
+            change()
+            return cache.get(path, NO_VAULT_INDEX, FINGERPRINT) is None
+
+        def grow():
+            with open(path, 'ab') as f:
+                f.write(b'!')
+
+        def touch():
+            st = os.stat(path)
+            os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1000))
+
+        def replace():
+            # Mismo tamano y mtime, otro inodo
+            copy = path + ".nuevo"
+            shutil.copy2(path, copy)
+            os.replace(copy, path)
+
+        for change in (grow, touch, replace):
+            outcomes.append(stale_after(change))
+        cache.put(path, NO_VAULT_INDEX, FINGERPRINT, RESULT)
+        outcomes.append(cache.get(path, NO_VAULT_INDEX, "otra huella") is None)
+        outcomes.append(cache.get(path, 0, FINGERPRINT) is None)
+        cache.close()
+        return all(outcomes)
+
+
+def check_changed_during_verify():
+    # Identidad tomada antes de verificar: si el archivo cambio no se guarda
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = VerificationCache(':memory:')
+        path = make_file(tmp, "firmado.bin")
+        identity = file_identity(path)
+        with open(path, 'ab') as f:
+            f.write(b'!')
+        stored = cache.put(path, NO_VAULT_INDEX, FINGERPRINT, RESULT, identity)
+        ok = not stored and len(cache) == 0
+        cache.close()
+        return ok
+
+
+def check_ttl():
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = VerificationCache(':memory:', ttl=0.05)
+        path = make_file(tmp, "firmado.bin")
+        cache.put(path, NO_VAULT_INDEX, FINGERPRINT, RESULT)
+        fresh = cache.get(path, NO_VAULT_INDEX, FINGERPRINT) is not None
+        time.sleep(0.1)
+        expired = cache.get(path, NO_VAULT_INDEX, FINGERPRINT) is None
+        ok = fresh and expired and len(cache) == 0 and cache.evictions == 1
+        cache.close()
+        return ok
+
+
+def check_lru():
+    # Con max_entries=2, la entrada menos usada sale al guardar una tercera
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = VerificationCache(':memory:', max_entries=2)
+        a, b, c = (make_file(tmp, name) for name in ("a", "b", "c"))
+        cache.put(a, NO_VAULT_INDEX, FINGERPRINT, RESULT)
+        time.sleep(0.01)
+        cache.put(b, NO_VAULT_INDEX, FINGERPRINT, RESULT)
+        time.sleep(0.01)
+        cache.get(a, NO_VAULT_INDEX, FINGERPRINT)  # a pasa a ser la mas reciente
+        time.sleep(0.01)
+        cache.put(c, NO_VAULT_INDEX, FINGERPRINT, RESULT)
+        present = [cache.get(p, NO_VAULT_INDEX, FINGERPRINT) is not None for p in (a, b, c)]
+        ok = present == [True, False, True] and len(cache) == 2 and cache.evictions == 1
+        cache.close()
+        return ok
+
+
+def check_schema_upgrade():
+    # Una cache de la version 0 (con llave y firma en `result`) se vacia al abrirla
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "cache.sqlite")
+        path = make_file(tmp, "firmado.bin")
+        cache = VerificationCache(db_path)
+        cache.put(path, NO_VAULT_INDEX, FINGERPRINT, RESULT)
+        cache.close()
+        db = sqlite3.connect(db_path)
+        db.execute("UPDATE verdicts SET result = ?", (json.dumps(dict(RESULT, used_key=KEY)),))
+        db.execute("PRAGMA user_version = 0")
+        db.commit()
+        db.close()
+
+        cache = VerificationCache(db_path)
+        version = cache._db.execute("PRAGMA user_version").fetchone()[0]
+        ok = len(cache) == 0 and version == 1 and cache.get(path, NO_VAULT_INDEX, FINGERPRINT) is None
+        cache.close()
+        with open(db_path, 'rb') as f:
+            return ok and str(KEY).encode() not in f.read()
+
+
+CASES = [
+    ("acierto sin secretos", check_hit_without_secrets),
+    ("invalidacion por tamano, mtime, inodo y llave", check_invalidation),
+    ("archivo cambiado durante la verificacion", check_changed_during_verify),
+    ("caducidad (TTL)", check_ttl),
+    ("expulsion LRU", check_lru),
+    ("esquema v0 -> v1", check_schema_upgrade),
+]
+
+
+def main():
+    print("VerificationCache test runner")
+    print("=============================")
+
+    failures = 0
+    for name, check in CASES:
+        ok = check()
+        print(f"  {name}: {'OK' if ok else 'FALLO'}")
+        if not ok:
+            failures += 1
+
+    print("Coincide?", "SI" if failures == 0 else f"NO ({failures} fallos)")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())